@@ -5,17 +5,33 @@ Main application entry point for the Adaptive Multi-Agent Chatbot System.
 import uvicorn
 import asyncio
 import os
-from src.api import create_app
-from src.config import API_HOST, API_PORT
+import uuid
+from src.utils.startup import LAUNCH_ID_ENV, reset_startup_markers
+from src.config import API_HOST, API_PORT, API_WORKERS, CONVERSATION_BACKEND
 
 def main():
     """Run the FastAPI application."""
-    # Create the FastAPI app
-    app = create_app()
-    
-    # Run the app with uvicorn
     print(f"Starting Adaptive Multi-Agent Chatbot System on {API_HOST}:{API_PORT}")
-    uvicorn.run(app, host=API_HOST, port=API_PORT)
+    
+    if API_WORKERS > 1:
+        if CONVERSATION_BACKEND == "memory":
+            print("Warning: conversations are not shared between workers; set CONVERSATION_BACKEND=sqlite")
+        
+        # Workers inherit the launch ID and use it to run startup tasks only once
+        reset_startup_markers()
+        os.environ[LAUNCH_ID_ENV] = str(uuid.uuid4())
+        
+        # Multiple workers need the app as an import string; each worker builds its
+        # own app, so the coordinator is not built in this supervisor process
+        uvicorn.run("src.api.app:create_app", factory=True, host=API_HOST, port=API_PORT, workers=API_WORKERS)
+    else:
+        from src.api import create_app
+        
+        # Create the FastAPI app
+        app = create_app()
+        
+        # Run the app with uvicorn
+        uvicorn.run(app, host=API_HOST, port=API_PORT)
 
 if __name__ == "__main__":
     main()
@@ -2,11 +2,17 @@
 Initialization file for the agents module.
 """
 
-from .base_agent import BaseAgent
-from .general_agent import GeneralAgent
-from .concordia_cs_agent import ConcordiaCSAgent
-from .ai_agent import AIAgent
-from .coordinator import MultiAgentCoordinator
+import importlib
+
+# Submodules are imported on first access, so importing the package does not
+# load LangChain and the knowledge sources for components that are not used
+_LAZY_IMPORTS = {
+    'BaseAgent': '.base_agent',
+    'GeneralAgent': '.general_agent',
+    'ConcordiaCSAgent': '.concordia_cs_agent',
+    'AIAgent': '.ai_agent',
+    'MultiAgentCoordinator': '.coordinator'
+}
 
 __all__ = [
     'BaseAgent',
@@ -15,3 +21,11 @@ __all__ = [
     'AIAgent',
     'MultiAgentCoordinator'
 ]
+
+def __getattr__(name):
+    """Import a re-exported name from its submodule on first access."""
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
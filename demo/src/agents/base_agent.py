@@ -3,14 +3,27 @@ Base agent class for the multi-agent chatbot system using LangChain.
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import time
 from langchain_ollama import OllamaLLM
-from langchain_community.vectorstores import Chroma
-from langchain_ollama import OllamaEmbeddings
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from langchain_core.runnables import RunnableWithMessageHistory
-from ..config import OLLAMA_BASE_URL
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
+from ..config import (
+    OLLAMA_BASE_URL,
+    PROMPT_CACHE_MODE,
+    PROMPT_CONTEXT_MAX_TOKENS,
+    DEADLINE_BUDGETS,
+    MODEL_CASCADE,
+    CASCADE_POLICY
+)
+from ..utils.metrics import metrics
+from ..utils.deadline import Deadline, DeadlineExceeded
+from ..utils.conversation import TurnHistory, estimate_tokens
+from ..utils.tracing import tracer
+from ..utils.ollama_pool import ollama_pool, with_base_url
+from ..utils.memory import LANGCHAIN_MESSAGE_BYTES, CONTEXT_TOKEN_BYTES, text_bytes
+from .cascade import CascadePolicy, SMALL_TIER, LARGE_TIER
 
 class MessageStore:
     """A simple message store for conversation history."""
@@ -18,6 +31,7 @@ class MessageStore:
     def __init__(self):
         """Initialize the message store."""
         self.messages: Dict[str, List[BaseMessage]] = {}
+        self.session_bytes: Dict[str, int] = {}  # Approximate memory held per session
     
     def get_messages(self, session_id: str) -> List[BaseMessage]:
         """Get messages for a session synchronously."""
@@ -30,13 +44,104 @@ class MessageStore:
         """Save messages for a session synchronously."""
         # Make sure we're storing a list of BaseMessage objects
         self.messages[session_id] = list(messages)
+        self.session_bytes[session_id] = sum(self._message_bytes(message) for message in messages)
+    
+    def append_messages(self, session_id: str, messages: List[BaseMessage]) -> None:
+        """Append messages to a session, counting only the new ones."""
+        self.get_messages(session_id).extend(messages)
+        self.session_bytes[session_id] = self.session_bytes.get(session_id, 0) + sum(self._message_bytes(message) for message in messages)
+    
+    def memory_stats(self) -> Dict[str, int]:
+        """Get the number of sessions and messages, and their approximate memory."""
+        return {
+            "entries": len(self.messages),
+            "messages": sum(len(messages) for messages in self.messages.values()),
+            "bytes": sum(self.session_bytes.values())
+        }
+    
+    @staticmethod
+    def _message_bytes(message: BaseMessage) -> int:
+        """Approximate the memory held by a message."""
+        return LANGCHAIN_MESSAGE_BYTES + (text_bytes(message.content) if isinstance(message.content, str) else 0)
+
+class PromptContextStore:
+    """
+    Per-conversation token contexts returned by Ollama.
+    
+    Passing a conversation's previous context back to Ollama lets it continue
+    from the cached prompt prefix instead of re-prefilling the whole history.
+    """
+    
+    def __init__(self, max_tokens: int = PROMPT_CONTEXT_MAX_TOKENS):
+        """
+        Initialize the context store.
+        
+        Args:
+            max_tokens: Contexts longer than this are discarded so the prompt stays within the context window
+        """
+        self.max_tokens = max_tokens
+        self.contexts: Dict[str, Dict[str, Any]] = {}
+        self.bytes = 0  # Approximate memory held by the contexts
+    
+    def get_context(self, session_id: str, last_response: Optional[str]) -> Optional[List[int]]:
+        """
+        Get the reusable context for a session.
+        
+        The context is only valid if this agent produced the last response in
+        the conversation; otherwise turns are missing from it.
+        
+        Args:
+            session_id: The conversation ID
+            last_response: The last assistant response in the conversation history
+            
+        Returns:
+            The token context, or None if the full prompt must be sent
+        """
+        entry = self.contexts.get(session_id)
+        if entry is None:
+            return None
+        
+        if entry["last_response"] != last_response or len(entry["context"]) > self.max_tokens:
+            self._remove(session_id)
+            return None
+        
+        return entry["context"]
+    
+    def save_context(self, session_id: str, context: Optional[List[int]], response: str) -> None:
+        """
+        Save the context returned for a session's latest turn.
+        
+        Args:
+            session_id: The conversation ID
+            context: Token context returned by Ollama
+            response: The response generated for the turn
+        """
+        if context:
+            self._remove(session_id)
+            self.contexts[session_id] = {"context": list(context), "last_response": response}
+            self.bytes += self._entry_bytes(self.contexts[session_id])
+    
+    def memory_stats(self) -> Dict[str, int]:
+        """Get the number of contexts and their approximate memory."""
+        return {"entries": len(self.contexts), "bytes": self.bytes}
+    
+    def _remove(self, session_id: str) -> None:
+        """Drop a session's context, if any."""
+        entry = self.contexts.pop(session_id, None)
+        if entry is not None:
+            self.bytes -= self._entry_bytes(entry)
+    
+    @staticmethod
+    def _entry_bytes(entry: Dict[str, Any]) -> int:
+        """Approximate the memory held by a context entry."""
+        return len(entry["context"]) * CONTEXT_TOKEN_BYTES + text_bytes(entry["last_response"])
 
 class BaseAgent(ABC):
     """
     Abstract base class for all agents in the system.
     """
     
-    def __init__(self, name: str, description: str, model: str):
+    def __init__(self, name: str, description: str, model: str, small_model: Optional[str] = None):
         """
         Initialize the base agent.
         
@@ -44,6 +149,7 @@ class BaseAgent(ABC):
             name: The name of the agent
             description: A description of the agent's capabilities
             model: The Ollama model to use for this agent
+            small_model: Optional smaller model that answers first in the model cascade
         """
         self.name = name
         self.description = description
@@ -62,49 +168,89 @@ class BaseAgent(ABC):
             num_gpu=0  # Force CPU mode to avoid CUDA errors
         )
         
-        # Initialize embeddings
-        self.embeddings = OllamaEmbeddings(
-            base_url=OLLAMA_BASE_URL,
-            model=model
-        )
-        
-        # Initialize vector store
-        self.vector_store = Chroma(
-            collection_name=f"{name.lower().replace(' ', '_')}",
-            embedding_function=self.embeddings
-        )
+        # Model tiers: the small model answers first when the cascade is enabled
+        self.llms = {LARGE_TIER: self.llm}
+        if MODEL_CASCADE and small_model and small_model != model:
+            self.llms[SMALL_TIER] = self.llm.model_copy(update={
+                "model": small_model,
+                "temperature": CASCADE_POLICY["small_temperature"]
+            })
+        self.cascade_policy = CascadePolicy()
+        self.large_latency_ms: Optional[float] = None  # Running average used to estimate latency saved
         
-        # Create chat prompt template
-        self.prompt = ChatPromptTemplate.from_messages([
+        # Create chat prompt templates. The prefix (persona and completed turns)
+        # only grows by appending, so Ollama can reuse its cached KV state; the
+        # per-request knowledge and query go in the suffix.
+        self.prefix_prompt = ChatPromptTemplate.from_messages([
             ("system", "You are a specialized assistant named {name}. {description}"),
-            MessagesPlaceholder(variable_name="history"),
+            MessagesPlaceholder(variable_name="history")
+        ])
+        self.suffix_prompt = ChatPromptTemplate.from_messages([
             ("system", "Relevant Information:\n{knowledge}"),
             ("human", "{input}")
         ])
-        
-        # Create the chain
-        self.chain = self.prompt | self.llm
+        self.prompt = self.prefix_prompt + self.suffix_prompt
         
         # Initialize message store
         self.message_store = MessageStore()
+        
+        # Initialize per-conversation prompt contexts, one store per model tier
+        # since a context is only valid for the model that produced it
+        self.context_stores = {tier: PromptContextStore() for tier in self.llms}
+        
+        # Copies of the tier models bound to each Ollama backend of the pool
+        self.backend_llms: Dict[Tuple[str, str], OllamaLLM] = {}
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        Get the approximate memory held by the agent's per-conversation stores.
+        
+        Returns:
+            Dictionary of store name to its entry and byte counts
+        """
+        return {
+            "message_store": self.message_store.memory_stats(),
+            "prompt_contexts": {tier: store.memory_stats() for tier, store in self.context_stores.items()},
+            "backend_llms": {"entries": len(self.backend_llms)}
+        }
     
     @abstractmethod
-    async def process_query(self, query: str, conversation_history: Optional[List[Dict[str, Any]]] = None) -> str:
+    async def process_query(self, query: str, conversation_history: Optional[List[Dict[str, Any]]] = None, conversation_id: Optional[str] = None, knowledge: Optional[Dict[str, Any]] = None, deadline: Optional[Deadline] = None) -> str:
         """
         Process a user query and return a response.
         
         Args:
             query: The user's query text
             conversation_history: Optional conversation history for context
+            conversation_id: Optional conversation ID for prompt context reuse
+            knowledge: Optional knowledge already retrieved for the query
+            deadline: Optional deadline of the request
             
         Returns:
             The agent's response to the query
         """
         pass
     
-    async def invoke(self, query: str, name: str, description: str, knowledge: str, conversation_history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    async def retrieve_knowledge(self, query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
-        Invoke the conversation chain with the given inputs.
+        Retrieve knowledge for a query from this agent's knowledge sources.
+        
+        Args:
+            query: The user's query text
+            deadline: Optional deadline of the request
+            
+        Returns:
+            Dictionary containing retrieved knowledge
+        """
+        return await self.knowledge_enhancer.enhance_query(query, top_k=3, deadline=deadline)
+    
+    def close(self) -> None:
+        """Release resources shared with other agents."""
+        self.knowledge_enhancer.close()
+    
+    async def invoke(self, query: str, name: str, description: str, knowledge: str, conversation_history: Optional[List[Dict[str, Any]]] = None, conversation_id: Optional[str] = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Invoke the LLM with the given inputs.
         
         Args:
             query: The user's query
@@ -112,37 +258,260 @@ class BaseAgent(ABC):
             description: The agent's description
             knowledge: The knowledge context
             conversation_history: Optional conversation history for context
+            conversation_id: Optional conversation ID used to reuse the prompt context
+            deadline: Optional deadline; generation is capped when little time remains
             
         Returns:
             Dictionary containing the response and metadata
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes before the response is generated
+            CircuitOpenError: If Ollama's circuit breaker is open for the large model
         """
-        # Convert conversation history to LangChain messages if provided
+        # Convert completed turns to LangChain messages, unless the conversation
+        # manager already keeps them (TurnHistory). The current query has no
+        # answer yet and is sent in the suffix instead.
         history = []
-        if conversation_history:
+        last_response = None
+        if isinstance(conversation_history, TurnHistory):
+            # Copied since the conversation may move on while this request awaits
+            history = list(conversation_history.messages)
+            last_response = conversation_history.last_response
+        elif conversation_history:
             for turn in conversation_history:
-                if "user" in turn:
-                    history.append(HumanMessage(content=turn["user"]))
-                if "agent" in turn:
-                    history.append(AIMessage(content=turn["agent"]))
-        
-        # Invoke the chain with all parameters including history
-        response = await self.chain.ainvoke({
-            "input": query,
-            "name": name,
-            "description": description,
-            "knowledge": knowledge,
-            "history": history
-        })
-        
-        # Extract the content from the response
-        response_content = response.content if hasattr(response, 'content') else str(response)
+                if "summary" in turn:
+                    history.append(SystemMessage(content=f"Summary of the earlier conversation:\n{turn['summary']}"))
+                    continue
+                if not turn.get("agent"):
+                    continue
+                history.append(HumanMessage(content=turn.get("user", "")))
+                history.append(AIMessage(content=turn["agent"]))
+                last_response = turn["agent"]
+        
+        # Answer with the small model first unless the query calls for the large one
+        tier, reason = LARGE_TIER, None
+        if SMALL_TIER in self.llms:
+            tier, reason = self.cascade_policy.choose_tier(query, conversation_history)
+        
+        started = time.perf_counter()
+        try:
+            generation = await self._generate(tier, query, name, description, knowledge, history, last_response, conversation_id, deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if tier != SMALL_TIER:
+                raise
+            # The small model is missing or failing; answer with the large one instead
+            print(f"Small model of {self.name} failed, using the large model: {str(e)}")
+            metrics.increment(f"cascade.small_failures.{self.name.lower().replace(' ', '_')}")
+            tier, reason = LARGE_TIER, "small_failed"
+            generation = await self._generate(tier, query, name, description, knowledge, history, last_response, conversation_id, deadline)
+        
+        # Escalate unsure small-model answers, if there is time left for it
+        if tier == SMALL_TIER and not self.cascade_policy.is_confident(generation["response"]):
+            if deadline is not None and deadline.remaining() < DEADLINE_BUDGETS["full_generation_min_seconds"]:
+                deadline.degrade("skip_escalation")
+            else:
+                tier, reason = LARGE_TIER, "low_confidence"
+                generation = await self._generate(tier, query, name, description, knowledge, history, last_response, conversation_id, deadline)
+        
+        self._record_cascade_metrics(tier, reason, (time.perf_counter() - started) * 1000)
         
         return {
-            "response": response_content,
+            "response": generation["response"],
             "agent_type": self.name,
-            "conversation_id": "default"
+            "conversation_id": conversation_id or "default",
+            "prefill_tokens_saved": generation["prefill_tokens_saved"],
+            "model_tier": tier
         }
     
+    async def _generate(self, tier: str, query: str, name: str, description: str, knowledge: str, history: List[BaseMessage], last_response: Optional[str], conversation_id: Optional[str], deadline: Optional[Deadline]) -> Dict[str, Any]:
+        """
+        Generate a response with one model tier.
+        
+        Args:
+            tier: Model tier to use
+            query: The user's query
+            name: The agent's name
+            description: The agent's description
+            knowledge: The knowledge context
+            history: Completed turns as LangChain messages
+            last_response: The last assistant response in the history
+            conversation_id: Optional conversation ID used to reuse the prompt context
+            deadline: Optional deadline of the request
+            
+        Returns:
+            Dictionary with the response and the prompt tokens saved by context reuse
+        """
+        span_attributes = {"chatbot.agent.name": self.name, "chatbot.model.tier": tier}
+        
+        with tracer.start_as_current_span("prompt.assemble", attributes=span_attributes) as span:
+            # Continue from the conversation's previous context when possible,
+            # otherwise send the full prompt
+            context = None
+            context_store = self.context_stores[tier]
+            if PROMPT_CACHE_MODE == "context" and conversation_id:
+                context = context_store.get_context(conversation_id, last_response)
+            
+            if context is not None:
+                prompt_text = self.suffix_prompt.format(knowledge=knowledge, input=query)
+                generate_kwargs = {"context": context}
+            else:
+                prompt_text = self.prompt.format(
+                    input=query,
+                    name=name,
+                    description=description,
+                    knowledge=knowledge,
+                    history=history
+                )
+                generate_kwargs = {}
+            
+            span.set_attribute("chatbot.prompt.context_reused", context is not None)
+            span.set_attribute("chatbot.prompt.history_messages", len(history))
+            span.set_attribute("chatbot.prompt.estimated_tokens", estimate_tokens(prompt_text))
+        
+        with tracer.start_as_current_span("llm.generate", attributes=span_attributes) as span:
+            async with ollama_pool.lease(self.llms[tier].model) as backend:
+                # Cap the generation length to what fits in the remaining time
+                llm, timeout = self._llm_for_deadline(self._llm_for_backend(tier, backend.url), deadline)
+                
+                span.set_attribute("gen_ai.system", "ollama")
+                span.set_attribute("gen_ai.request.model", llm.model)
+                span.set_attribute("server.address", backend.url)
+                if llm.num_predict is not None:
+                    span.set_attribute("gen_ai.request.max_tokens", llm.num_predict)
+                try:
+                    result = await asyncio.wait_for(
+                        backend.breaker.call(llm.agenerate, [prompt_text], **generate_kwargs),
+                        timeout=timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"{self.name} did not respond before the request deadline")
+                
+                generation = result.generations[0][0]
+                response_content = generation.text
+                generation_info = generation.generation_info or {}
+                ollama_pool.record_generation(backend, llm.model, generation_info)
+                prefill_tokens_saved = self._record_prefill_metrics(generation_info, context is not None)
+                
+            span.set_attribute("gen_ai.usage.input_tokens", generation_info.get("prompt_eval_count") or 0)
+            span.set_attribute("gen_ai.usage.output_tokens", generation_info.get("eval_count") or 0)
+            span.set_attribute("chatbot.prompt.cache_hit", context is not None)
+            span.set_attribute("chatbot.prompt.prefill_tokens_saved", prefill_tokens_saved)
+        
+        if PROMPT_CACHE_MODE == "context" and conversation_id:
+            context_store.save_context(conversation_id, generation_info.get("context"), response_content)
+        
+        return {
+            "response": response_content,
+            "prefill_tokens_saved": prefill_tokens_saved
+        }
+    
+    def _llm_for_backend(self, tier: str, base_url: str) -> OllamaLLM:
+        """
+        Get a tier's LLM bound to an Ollama backend.
+        
+        Args:
+            tier: Model tier
+            base_url: URL of the backend
+            
+        Returns:
+            The LLM sending its requests to the backend
+        """
+        key = (tier, base_url)
+        if key not in self.backend_llms:
+            self.backend_llms[key] = with_base_url(self.llms[tier], base_url)
+        return self.backend_llms[key]
+    
+    def _llm_for_deadline(self, llm: OllamaLLM, deadline: Optional[Deadline]) -> Tuple[OllamaLLM, Optional[float]]:
+        """
+        Get the LLM and timeout to use for a generation within a deadline.
+        
+        Args:
+            llm: The LLM of the model tier
+            deadline: Optional deadline of the request
+            
+        Returns:
+            Tuple of (LLM, timeout in seconds or None)
+            
+        Raises:
+            DeadlineExceeded: If the deadline has already passed
+        """
+        if deadline is None:
+            return llm, None
+        
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Request deadline passed before {self.name} could respond")
+        
+        if remaining >= DEADLINE_BUDGETS["full_generation_min_seconds"]:
+            return llm, remaining
+        
+        num_predict = max(
+            int(remaining * DEADLINE_BUDGETS["generation_tokens_per_second"]),
+            DEADLINE_BUDGETS["min_generation_tokens"]
+        )
+        if llm.num_predict is not None and llm.num_predict <= num_predict:
+            return llm, remaining
+        
+        deadline.degrade("cap_generation")
+        return llm.model_copy(update={"num_predict": num_predict}), remaining
+    
+    def _record_cascade_metrics(self, tier: str, reason: Optional[str], latency_ms: float) -> None:
+        """
+        Record which tier served a request and the latency saved by the cascade.
+        
+        Latency saved is estimated against the running average latency of
+        requests answered directly by the large model; escalated requests
+        count the time spent on the small model as negative savings.
+        
+        Args:
+            tier: The tier that produced the final response
+            reason: Why the large tier was used, or None
+            latency_ms: Total generation latency of the request
+        """
+        agent_label = self.name.lower().replace(' ', '_')
+        metrics.increment(f"cascade.served.{tier}")
+        metrics.observe(f"cascade.latency_ms.{tier}", latency_ms)
+        if reason:
+            metrics.increment(f"cascade.escalations.{reason}")
+        
+        if SMALL_TIER not in self.llms:
+            return
+        
+        if tier == LARGE_TIER and reason != "low_confidence":
+            previous = self.large_latency_ms
+            self.large_latency_ms = latency_ms if previous is None else 0.9 * previous + 0.1 * latency_ms
+        elif self.large_latency_ms is not None:
+            metrics.observe(f"cascade.latency_saved_ms.{agent_label}", self.large_latency_ms - latency_ms)
+    
+    def _record_prefill_metrics(self, generation_info: Dict[str, Any], reused_context: bool) -> int:
+        """
+        Record how many prompt tokens Ollama did not have to prefill.
+        
+        Ollama's returned context holds the prompt and generated tokens, while
+        prompt_eval_count only counts the prompt tokens it actually evaluated.
+        
+        Args:
+            generation_info: Final response fields returned by Ollama
+            reused_context: Whether the previous context was passed in
+            
+        Returns:
+            Number of prompt tokens served from cache
+        """
+        context = generation_info.get("context") or []
+        eval_count = generation_info.get("eval_count") or 0
+        prompt_tokens = max(len(context) - eval_count, 0)
+        prompt_eval_count = generation_info.get("prompt_eval_count") or 0
+        saved = max(prompt_tokens - prompt_eval_count, 0)
+        
+        agent_label = self.name.lower().replace(' ', '_')
+        metrics.observe(f"llm.prompt_tokens.{agent_label}", prompt_tokens)
+        metrics.observe(f"llm.prefill_tokens_saved.{agent_label}", saved)
+        metrics.increment(f"llm.context_reuse.{'hit' if reused_context else 'miss'}")
+        
+        return saved
+    
     async def add_to_history(self, user_query: str, agent_response: str) -> None:
         """
         Add a conversation turn to the history.
@@ -151,17 +520,11 @@ class BaseAgent(ABC):
             user_query: The user's query
             agent_response: The agent's response
         """
-        # Get existing messages
-        existing_messages = self.message_store.get_messages("default")
-        
-        # Add new messages
-        new_messages = existing_messages + [
+        # Append the new messages in place, counting only them
+        self.message_store.append_messages("default", [
             HumanMessage(content=user_query),
             AIMessage(content=agent_response)
-        ]
-        
-        # Save updated messages
-        self.message_store.save_messages("default", new_messages)
+        ])
     
     def get_history(self, max_length: Optional[int] = None) -> List[Dict[str, str]]:
         """
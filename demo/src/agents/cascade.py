@@ -0,0 +1,78 @@
+"""
+Model cascade policy: which model tier answers a query, and when to escalate.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+
+from ..config import CASCADE_POLICY
+from ..utils.conversation import estimate_tokens
+
+# The coordinator appends retrieved knowledge to the query after this marker;
+# only the user's own text is considered when choosing a tier
+EXTERNAL_KNOWLEDGE_MARKER = "[EXTERNAL KNOWLEDGE:"
+
+SMALL_TIER = "small"
+LARGE_TIER = "large"
+
+class CascadePolicy:
+    """
+    Decides whether a query can be answered by the small model tier.
+    """
+
+    def __init__(self, policy: Dict[str, Any] = CASCADE_POLICY):
+        """
+        Initialize the cascade policy.
+
+        Args:
+            policy: Policy settings (see CASCADE_POLICY in the config)
+        """
+        self.max_query_tokens = policy["max_query_tokens"]
+        self.complex_keywords = policy["complex_keywords"]
+        self.follow_up_phrases = policy["follow_up_phrases"]
+        self.min_response_chars = policy["min_response_chars"]
+        self.uncertain_phrases = policy["uncertain_phrases"]
+
+    def choose_tier(self, query: str, conversation_history: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, Optional[str]]:
+        """
+        Choose the tier that answers a query first.
+
+        Args:
+            query: The query sent to the agent
+            conversation_history: Optional conversation history for context
+
+        Returns:
+            Tuple of (tier, reason for going straight to the large tier or None)
+        """
+        user_query = query.split(EXTERNAL_KNOWLEDGE_MARKER)[0].strip().lower()
+
+        if estimate_tokens(user_query) > self.max_query_tokens:
+            return LARGE_TIER, "long_query"
+
+        if any(keyword in user_query for keyword in self.complex_keywords):
+            return LARGE_TIER, "complex_query"
+
+        # A follow-up questioning the previous answer deserves the stronger model
+        has_previous_answer = any(turn.get("agent") for turn in conversation_history or [])
+        if has_previous_answer and any(phrase in user_query for phrase in self.follow_up_phrases):
+            return LARGE_TIER, "follow_up"
+
+        return SMALL_TIER, None
+
+    def is_confident(self, response: str) -> bool:
+        """
+        Check whether a small-tier answer can be returned without escalating.
+
+        Ollama does not return token probabilities, so confidence is judged
+        from the answer itself: empty or very short answers and answers that
+        hedge are escalated.
+
+        Args:
+            response: The small model's response
+
+        Returns:
+            True if the response can be returned as is
+        """
+        text = response.strip().lower()
+        if len(text) < self.min_response_chars:
+            return False
+        return not any(phrase in text for phrase in self.uncertain_phrases)
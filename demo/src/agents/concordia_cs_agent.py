@@ -4,6 +4,7 @@ Concordia CS Admissions agent implementation using LangChain.
 
 from typing import List, Dict, Any, Optional
 from .base_agent import BaseAgent
+from ..utils.deadline import Deadline
 from ..knowledge.enhancer import KnowledgeEnhancer
 
 class ConcordiaCSAgent(BaseAgent):
@@ -11,7 +12,7 @@ class ConcordiaCSAgent(BaseAgent):
     Agent that specializes in Concordia University Computer Science program admissions.
     """
     
-    def __init__(self, name: str, description: str, model: str = "mistral"):
+    def __init__(self, name: str, description: str, model: str = "mistral", small_model: Optional[str] = None):
         """
         Initialize the Concordia CS Agent.
         
@@ -19,28 +20,33 @@ class ConcordiaCSAgent(BaseAgent):
             name: Name of the agent
             description: Description of the agent's role
             model: Name of the model to use (default: mistral)
+            small_model: Optional smaller model that answers first in the model cascade
         """
-        super().__init__(name, description, model)
+        super().__init__(name, description, model, small_model)
         
         # Initialize knowledge enhancer with only vector store
         self.knowledge_enhancer = KnowledgeEnhancer(use_wikipedia=False, use_vector_store=True)
     
-    async def process_query(self, query: str, conversation_history: Optional[List[Dict[str, Any]]] = None) -> str:
+    async def process_query(self, query: str, conversation_history: Optional[List[Dict[str, Any]]] = None, conversation_id: Optional[str] = None, knowledge: Optional[Dict[str, Any]] = None, deadline: Optional[Deadline] = None) -> str:
         """
         Process queries related to Concordia University CS admissions using LangChain.
         
         Args:
             query: The user's query text
             conversation_history: Optional conversation history for context
+            conversation_id: Optional conversation ID for prompt context reuse
+            knowledge: Optional knowledge already retrieved for the query
+            deadline: Optional deadline of the request
             
         Returns:
             The agent's response to the query
         """
-        # Enhance the query with relevant knowledge from vector store
-        enhanced_knowledge = await self.knowledge_enhancer.enhance_query(query, top_k=3)
+        # Enhance the query with relevant knowledge unless it was prefetched
+        if knowledge is None:
+            knowledge = await self.retrieve_knowledge(query, deadline)
         
         # Format knowledge for the prompt using the enhancer's formatter
-        knowledge_context = self.knowledge_enhancer.format_knowledge_for_prompt(enhanced_knowledge)
+        knowledge_context = self.knowledge_enhancer.format_knowledge_for_prompt(knowledge)
         
         # Process the query using LangChain
         response_dict = await self.invoke(
@@ -48,7 +54,9 @@ class ConcordiaCSAgent(BaseAgent):
             name=self.name,
             description=self.description,
             knowledge=knowledge_context,
-            conversation_history=conversation_history
+            conversation_history=conversation_history,
+            conversation_id=conversation_id,
+            deadline=deadline
         )
         
         response_content = response_dict["response"]
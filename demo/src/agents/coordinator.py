@@ -2,13 +2,37 @@
 Implementation of the multi-agent coordinator for routing queries to appropriate agents.
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
 import re
+import time
+
+from opentelemetry import trace
 
 from ..agents import GeneralAgent, ConcordiaCSAgent, AIAgent
-from ..config import AGENTS
-from ..utils.conversation import ConversationManager
-from ..knowledge import KnowledgeEnhancer
+from ..config import AGENTS, SPECULATIVE_RETRIEVAL, SPECULATIVE_MAX_CANDIDATES, FAQ_FAST_PATH, ROUTING_STICKY_AGENT, ROUTING_SWITCH_MARGIN
+from ..utils.conversation import ConversationManager, TurnHistory
+from ..utils.summarizer import ConversationSummarizer
+from ..utils.metrics import metrics
+from ..utils.deadline import Deadline
+from ..utils.startup_profile import startup_profiler
+from ..utils.profiling import stage
+from ..utils.tracing import tracer
+from ..knowledge import KnowledgeEnhancer, FAQIndex
+
+# Keywords used to route queries to the specialized agents
+CONCORDIA_KEYWORDS = [
+    "concordia", "university", "admission", "computer science", "cs program",
+    "application", "requirements", "gpa", "deadline", "tuition", "courses",
+    "prerequisites", "department", "faculty", "undergraduate", "graduate"
+]
+
+AI_KEYWORDS = [
+    "artificial intelligence", "machine learning", "deep learning", "neural network",
+    "nlp", "natural language processing", "computer vision", "reinforcement learning",
+    "ai model", "transformer", "gpt", "llm", "large language model", "bert", "training",
+    "dataset", "supervised", "unsupervised", "algorithm"
+]
 
 class MultiAgentCoordinator:
     """
@@ -17,51 +41,105 @@ class MultiAgentCoordinator:
     
     def __init__(self):
         """Initialize the multi-agent coordinator."""
-        # Initialize conversation manager
-        self.conversation_manager = ConversationManager()
+        # Initialize conversation manager, tracking each conversation's topic for routing
+        with startup_profiler.component("coordinator.conversation_manager"):
+            self.conversation_manager = ConversationManager(topic_scorer=self._score_keywords)
+        
+        # Initialize background history compaction
+        with startup_profiler.component("coordinator.summarizer"):
+            self.summarizer = ConversationSummarizer(self.conversation_manager)
         
         # Initialize knowledge enhancer
-        self.knowledge_enhancer = KnowledgeEnhancer()
+        with startup_profiler.component("coordinator.knowledge_enhancer"):
+            self.knowledge_enhancer = KnowledgeEnhancer()
+        
+        # Load the FAQ fast path index built with the admissions data
+        self.faq_index = None
+        if FAQ_FAST_PATH:
+            with startup_profiler.component("coordinator.faq_index"):
+                self.faq_index = FAQIndex.load()
+            if self.faq_index is None:
+                print("FAQ index not built; FAQ fast path disabled")
         
         # Initialize agents
-        self.agents = {
-            "general": GeneralAgent(
-                name=AGENTS["general"]["name"],
-                description=AGENTS["general"]["description"],
-                model=AGENTS["general"]["model"]
-            ),
-            "concordia_cs": ConcordiaCSAgent(
-                name=AGENTS["concordia_cs"]["name"],
-                description=AGENTS["concordia_cs"]["description"],
-                model=AGENTS["concordia_cs"]["model"]
-            ),
-            "ai": AIAgent(
-                name=AGENTS["ai"]["name"],
-                description=AGENTS["ai"]["description"],
-                model=AGENTS["ai"]["model"]
-            )
+        agent_classes = {
+            "general": GeneralAgent,
+            "concordia_cs": ConcordiaCSAgent,
+            "ai": AIAgent
+        }
+        self.agents = {}
+        for agent_type, agent_class in agent_classes.items():
+            with startup_profiler.component(f"coordinator.agent.{agent_type}"):
+                self.agents[agent_type] = agent_class(
+                    name=AGENTS[agent_type]["name"],
+                    description=AGENTS[agent_type]["description"],
+                    model=AGENTS[agent_type]["model"],
+                    small_model=AGENTS[agent_type].get("small_model")
+                )
+    
+    def close(self) -> None:
+        """Release the knowledge sources held by the coordinator and its agents."""
+        self.knowledge_enhancer.close()
+        for agent in self.agents.values():
+            agent.close()
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        Get the approximate memory held by the coordinator's in-process stores.
+        
+        Each store keeps its counts up to date as it changes, so this is cheap
+        enough to call on every stats request.
+        
+        Returns:
+            Dictionary of store name to its entry and byte counts
+        """
+        return {
+            "conversations": self.conversation_manager.memory_stats(),
+            "agents": {agent_type: agent.memory_stats() for agent_type, agent in self.agents.items()},
+            "summarizer": {"entries": len(self.summarizer.pending)},
+            "faq_index": self.faq_index.memory_stats() if self.faq_index is not None else {"entries": 0, "bytes": 0}
         }
     
-    async def route_query(self, query: str, conversation_id: Optional[str] = None) -> Dict[str, Any]:
+    async def route_query(self, query: str, conversation_id: Optional[str] = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Route a query to the appropriate agent.
         
         Args:
             query: The user's query
             conversation_id: Optional conversation ID for context
+            deadline: Optional deadline of the request (the configured default if not given)
             
         Returns:
-            Dictionary containing the response and metadata
+            Dictionary containing the response and metadata, including the
+            degradations applied to meet the deadline
         """
+        if deadline is None:
+            deadline = Deadline()
+        
         # Create a new conversation if needed
-        if conversation_id is None or conversation_id not in self.conversation_manager.conversations:
+        if conversation_id is None or not self.conversation_manager.has_conversation(conversation_id):
             conversation_id = self.conversation_manager.create_conversation(conversation_id)
         
         # Add user message to conversation history
         self.conversation_manager.add_message(conversation_id, "user", query)
         
-        # Determine which agent should handle the query
-        agent_type = self._determine_agent_type(query, conversation_id)
+        # Common questions are answered from the FAQ index without retrieval or generation
+        if self.faq_index is not None:
+            with stage("faq"):
+                faq_match = self.faq_index.match(query)
+            if faq_match is not None:
+                return self._answer_from_faq(faq_match[0], faq_match[1], conversation_id, deadline)
+            metrics.increment("faq.misses")
+        
+        # Determine which agent should handle the query, retrieving knowledge
+        # for the query and the selected agent
+        with stage("route_and_retrieve"):
+            if SPECULATIVE_RETRIEVAL:
+                agent_type, knowledge, agent_knowledge = await self._route_and_retrieve_speculative(query, conversation_id, deadline)
+            else:
+                agent_type = self._route(query, conversation_id)
+                knowledge = await self.knowledge_enhancer.enhance_query(query, deadline=deadline)
+                agent_knowledge = await self.agents[agent_type].retrieve_knowledge(query, deadline)
         
         # Get the appropriate agent
         agent = self.agents[agent_type]
@@ -69,9 +147,6 @@ class MultiAgentCoordinator:
         # Get conversation history
         history = self._format_history_for_agent(conversation_id)
         
-        # Enhance the query with external knowledge
-        knowledge = await self.knowledge_enhancer.enhance_query(query)
-        
         # Format the knowledge for inclusion in the prompt
         knowledge_text = self.knowledge_enhancer.format_knowledge_for_prompt(knowledge)
         
@@ -81,50 +156,197 @@ class MultiAgentCoordinator:
             augmented_query = f"{query}\n\n[EXTERNAL KNOWLEDGE: {knowledge_text}]"
         
         # Process the query with the selected agent
-        response = await agent.process_query(augmented_query, history)
+        with stage("generation"):
+            response = await agent.process_query(augmented_query, history, conversation_id, knowledge=agent_knowledge, deadline=deadline)
         
         # Add agent response to conversation history
         self.conversation_manager.add_message(conversation_id, "assistant", response)
         
+        # Compact older turns in the background if the history has grown too large
+        self.summarizer.maybe_schedule(conversation_id)
+        
+        # Tag the request span
+        request_span = trace.get_current_span()
+        request_span.set_attribute("chatbot.agent.type", agent_type)
+        request_span.set_attribute("chatbot.conversation.id", conversation_id)
+        request_span.set_attribute("chatbot.degradations", list(deadline.degradations))
+        request_span.set_attribute("chatbot.fast_path", False)
+        
         # Return the response with metadata
         return {
             "response": response,
             "agent_type": agent_type,
-            "conversation_id": conversation_id
+            "conversation_id": conversation_id,
+            "degradations": list(deadline.degradations),
+            "fast_path": False,
+            "sources": []
         }
     
-    def _determine_agent_type(self, query: str, conversation_id: str) -> str:
+    def _answer_from_faq(self, entry: Dict[str, Any], score: float, conversation_id: str, deadline: Deadline) -> Dict[str, Any]:
         """
-        Determine which agent should handle the query.
+        Answer a query with a precomputed FAQ answer.
+        
+        Args:
+            entry: The matched FAQ entry
+            score: Similarity of the query to the entry
+            conversation_id: Conversation ID
+            deadline: Deadline of the request
+            
+        Returns:
+            Dictionary containing the response and metadata, like route_query
+        """
+        metrics.increment("faq.hits")
+        metrics.increment(f"faq.hits.{entry['id']}")
+        
+        # The answer is part of the conversation like any other
+        self.conversation_manager.set_routed_agent(conversation_id, "concordia_cs")
+        self.conversation_manager.add_message(conversation_id, "assistant", entry["answer"])
+        self.summarizer.maybe_schedule(conversation_id)
+        
+        # Tag the request span
+        request_span = trace.get_current_span()
+        request_span.set_attribute("chatbot.agent.type", "concordia_cs")
+        request_span.set_attribute("chatbot.conversation.id", conversation_id)
+        request_span.set_attribute("chatbot.fast_path", True)
+        request_span.set_attribute("chatbot.faq.entry", entry["id"])
+        request_span.set_attribute("chatbot.faq.score", score)
+        
+        return {
+            "response": entry["answer"],
+            "agent_type": "concordia_cs",
+            "conversation_id": conversation_id,
+            "degradations": list(deadline.degradations),
+            "fast_path": True,
+            "sources": entry["sources"]
+        }
+    
+    async def _route_and_retrieve_speculative(self, query: str, conversation_id: str, deadline: Optional[Deadline] = None) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        """
+        Route a query while retrieval for the likely agents already runs.
+        
+        Retrieval for the coordinator and for each candidate agent starts before
+        routing; once the route is decided the other candidates are cancelled.
         
         Args:
             query: The user's query
             conversation_id: Conversation ID for context
+            deadline: Optional deadline of the request
             
         Returns:
-            Agent type (general, concordia_cs, or ai)
+            Tuple of (agent type, coordinator knowledge, agent knowledge)
+        """
+        started_at: Dict[str, float] = {}
+        finished_at: Dict[str, float] = {}
+        
+        def start(name: str, coroutine) -> asyncio.Task:
+            started_at[name] = time.perf_counter()
+            task = asyncio.create_task(coroutine)
+            task.add_done_callback(lambda _: finished_at.setdefault(name, time.perf_counter()))
+            return task
+        
+        coordinator_task = start("coordinator", self.knowledge_enhancer.enhance_query(query, deadline=deadline))
+        candidates = self._candidate_agent_types(query, conversation_id)
+        agent_tasks = {
+            candidate: start(candidate, self.agents[candidate].retrieve_knowledge(query, deadline))
+            for candidate in candidates
+        }
+        
+        agent_type = self._route(query, conversation_id)
+        routed_at = time.perf_counter()
+        
+        # Cancel the losing candidates; start retrieval now if the prediction missed
+        for candidate, task in agent_tasks.items():
+            if candidate != agent_type:
+                task.cancel()
+                metrics.increment("speculation.cancelled")
+        if agent_type in agent_tasks:
+            metrics.increment("speculation.hits")
+            agent_task = agent_tasks[agent_type]
+        else:
+            metrics.increment("speculation.misses")
+            agent_task = start(agent_type, self.agents[agent_type].retrieve_knowledge(query, deadline))
+        
+        knowledge, agent_knowledge = await asyncio.gather(coordinator_task, agent_task)
+        
+        # Latency hidden: retrieval time spent before routing finished plus the
+        # overlap between the coordinator and agent retrievals
+        done = time.perf_counter()
+        sequential_ms = sum(finished_at[name] - started_at[name] for name in ("coordinator", agent_type)) * 1000
+        waited_ms = (done - routed_at) * 1000
+        metrics.observe("speculation.retrieval_ms", sequential_ms)
+        metrics.observe("speculation.hidden_ms", max(sequential_ms - waited_ms, 0.0))
+        
+        return agent_type, knowledge, agent_knowledge
+    
+    def _candidate_agent_types(self, query: str, conversation_id: str) -> List[str]:
+        """
+        Predict which agents are likely to handle a query.
+        
+        Args:
+            query: The user's query
+            conversation_id: Conversation ID for context
+            
+        Returns:
+            Up to SPECULATIVE_MAX_CANDIDATES agent types, most likely first
         """
-        # Convert query to lowercase for easier matching
-        query_lower = query.lower()
+        scores = self._score_keywords(query.lower())
+        ranked = sorted((agent_type for agent_type in scores if scores[agent_type] > 0), key=lambda agent_type: -scores[agent_type])
         
-        # Check for Concordia CS admissions related keywords
-        concordia_keywords = [
-            "concordia", "university", "admission", "computer science", "cs program",
-            "application", "requirements", "gpa", "deadline", "tuition", "courses",
-            "prerequisites", "department", "faculty", "undergraduate", "graduate"
-        ]
+        # A clear keyword winner is what routing will pick
+        if len(ranked) == 1 or (len(ranked) > 1 and scores[ranked[0]] > scores[ranked[1]]):
+            return ranked[:1]
+        
+        # Ambiguous queries fall back to the conversation's topic, which is cheap to look up
+        context_agent_type = self._context_agent_type(conversation_id)
+        return list(dict.fromkeys([context_agent_type] + ranked + ["general"]))[:SPECULATIVE_MAX_CANDIDATES]
+    
+    def _score_keywords(self, text: str) -> Dict[str, int]:
+        """
+        Count routing keyword matches in lowercased text.
+        
+        Args:
+            text: Lowercased text to score
+            
+        Returns:
+            Dictionary of agent type to number of keyword matches
+        """
+        return {
+            "concordia_cs": sum(1 for keyword in CONCORDIA_KEYWORDS if keyword in text),
+            "ai": sum(1 for keyword in AI_KEYWORDS if keyword in text)
+        }
+    
+    def _route(self, query: str, conversation_id: str) -> str:
+        """
+        Determine the agent type of a query within a routing span.
         
-        # Check for AI related keywords
-        ai_keywords = [
-            "artificial intelligence", "machine learning", "deep learning", "neural network",
-            "nlp", "natural language processing", "computer vision", "reinforcement learning",
-            "ai model", "transformer", "gpt", "llm", "large language model", "bert", "training",
-            "dataset", "supervised", "unsupervised", "algorithm"
-        ]
+        Args:
+            query: The user's query
+            conversation_id: Conversation ID for context
+            
+        Returns:
+            Agent type (general, concordia_cs, or ai)
+        """
+        with tracer.start_as_current_span("routing") as span:
+            agent_type = self._determine_agent_type(query, conversation_id)
+            self.conversation_manager.set_routed_agent(conversation_id, agent_type)
+            span.set_attribute("chatbot.agent.type", agent_type)
+            return agent_type
+    
+    def _determine_agent_type(self, query: str, conversation_id: str) -> str:
+        """
+        Determine which agent should handle the query.
         
+        Args:
+            query: The user's query
+            conversation_id: Conversation ID for context
+            
+        Returns:
+            Agent type (general, concordia_cs, or ai)
+        """
         # Count matches for each category
-        concordia_matches = sum(1 for keyword in concordia_keywords if keyword in query_lower)
-        ai_matches = sum(1 for keyword in ai_keywords if keyword in query_lower)
+        scores = self._score_keywords(query.lower())
+        concordia_matches = scores["concordia_cs"]
+        ai_matches = scores["ai"]
         
         # Determine agent type based on keyword matches
         if concordia_matches > ai_matches and concordia_matches > 0:
@@ -132,52 +354,48 @@ class MultiAgentCoordinator:
         elif ai_matches > concordia_matches and ai_matches > 0:
             return "ai"
         else:
-            # Check conversation history for context
-            history = self.conversation_manager.get_history(conversation_id)
-            if history:
-                # Look at the last few messages to determine context
-                recent_messages = history[-4:] if len(history) >= 4 else history
-                recent_text = " ".join([msg["content"].lower() for msg in recent_messages])
-                
-                concordia_context_matches = sum(1 for keyword in concordia_keywords if keyword in recent_text)
-                ai_context_matches = sum(1 for keyword in ai_keywords if keyword in recent_text)
-                
-                if concordia_context_matches > ai_context_matches and concordia_context_matches > 0:
-                    return "concordia_cs"
-                elif ai_context_matches > concordia_context_matches and ai_context_matches > 0:
-                    return "ai"
+            # Follow the topic of the conversation for context
+            return self._context_agent_type(conversation_id)
+    
+    def _context_agent_type(self, conversation_id: str) -> str:
+        """
+        Determine the agent type of a conversation's topic, for queries without keywords.
+        
+        Args:
+            conversation_id: Conversation ID
             
-            # Default to general agent if no clear category is detected
-            return "general"
+        Returns:
+            Agent type (general, concordia_cs, or ai)
+        """
+        topic_scores, routed_agent = self.conversation_manager.get_topic_state(conversation_id)
+        concordia_score = topic_scores.get("concordia_cs", 0.0)
+        ai_score = topic_scores.get("ai", 0.0)
+        
+        # Default to general agent if no clear category is detected
+        if concordia_score > ai_score and concordia_score > 0:
+            agent_type = "concordia_cs"
+        elif ai_score > concordia_score and ai_score > 0:
+            agent_type = "ai"
+        else:
+            agent_type = "general"
+        
+        # Keep the conversation with its current agent unless another one clearly leads
+        if ROUTING_STICKY_AGENT and routed_agent is not None and routed_agent != agent_type:
+            if topic_scores.get(agent_type, 0.0) - topic_scores.get(routed_agent, 0.0) < ROUTING_SWITCH_MARGIN:
+                return routed_agent
+        return agent_type
     
-    def _format_history_for_agent(self, conversation_id: str) -> List[Dict[str, str]]:
+    def _format_history_for_agent(self, conversation_id: str) -> TurnHistory:
         """
         Format conversation history for agent consumption.
         
+        The conversation manager keeps the formatted history up to date as
+        messages are added, so this does not depend on the conversation length.
+        
         Args:
             conversation_id: Conversation ID
             
         Returns:
             Formatted history for agent
         """
-        history = self.conversation_manager.get_history(conversation_id)
-        formatted_history = []
-        
-        # Convert from role-based format to user/agent format
-        current_turn = {}
-        for message in history:
-            if message["role"] == "user":
-                if current_turn:
-                    formatted_history.append(current_turn)
-                current_turn = {"user": message["content"], "agent": ""}
-            elif message["role"] == "assistant":
-                if current_turn:
-                    current_turn["agent"] = message["content"]
-                    formatted_history.append(current_turn)
-                    current_turn = {}
-        
-        # Add the last turn if it's incomplete
-        if current_turn:
-            formatted_history.append(current_turn)
-        
-        return formatted_history
+        return self.conversation_manager.get_turns(conversation_id)
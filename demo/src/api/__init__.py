@@ -2,10 +2,24 @@
 Initialization file for the API module.
 """
 
-from .router import router
-from .app import create_app
+import importlib
+
+# Submodules are imported on first access, so importing the package does not
+# load the agents for components that are not used
+_LAZY_IMPORTS = {
+    'router': '.router',
+    'create_app': '.app'
+}
 
 __all__ = [
     'router',
     'create_app'
 ]
+
+def __getattr__(name):
+    """Import a re-exported name from its submodule on first access."""
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
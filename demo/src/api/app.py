@@ -2,10 +2,18 @@
 FastAPI application factory for the chatbot API.
 """
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .router import router
+from .router import router, coordinator
+from ..config import TRAFFIC_CAPTURE
+from ..knowledge.ingestion import ingestion_worker
+from ..utils.startup import run_startup_tasks
+from ..utils.ollama_pool import ollama_pool
+from ..utils.tracing import setup_tracing, shutdown_tracing
+from ..utils.traffic_capture import TrafficCaptureMiddleware, traffic_capture
 
 def create_app() -> FastAPI:
     """
@@ -30,7 +38,33 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Record chat traffic for replaying against other builds
+    if TRAFFIC_CAPTURE:
+        app.add_middleware(TrafficCaptureMiddleware)
+        app.add_event_handler("shutdown", traffic_capture.close)
+    
     # Include routers
     app.include_router(router)
     
+    # Trace requests; pipeline spans become children of the request span
+    if setup_tracing(app):
+        app.add_event_handler("shutdown", shutdown_tracing)
+    
+    # Warm indexes and models once per launch, off the event loop
+    async def warm_up():
+        await asyncio.to_thread(run_startup_tasks)
+    app.add_event_handler("startup", warm_up)
+    
+    # Health-check the Ollama backends generations are balanced across
+    app.add_event_handler("startup", ollama_pool.start)
+    app.add_event_handler("shutdown", ollama_pool.stop)
+    
+    # Compress idle conversations in the background
+    app.add_event_handler("startup", coordinator.conversation_manager.start)
+    app.add_event_handler("shutdown", coordinator.conversation_manager.stop)
+    
+    # Finish the running ingestion job, then release shared vector stores on shutdown
+    app.add_event_handler("shutdown", ingestion_worker.stop)
+    app.add_event_handler("shutdown", coordinator.close)
+    
     return app
@@ -2,13 +2,27 @@
 API router for the chatbot endpoints.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
-from typing import Dict, Optional
+import asyncio
+import hmac
+import math
+import os
+import queue
+import uuid
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import HTMLResponse, FileResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 
 from ..agents import MultiAgentCoordinator
-from ..config import AGENTS
+from ..config import AGENTS, ADMIN_TOKEN, ADMIN_API_OPEN, INGESTION_MAX_DOCUMENTS
+from ..knowledge.ingestion import ingestion_worker
+from ..knowledge.vector_store import vector_store_registry
+from ..utils.metrics import metrics
+from ..utils.deadline import Deadline, DeadlineExceeded
+from ..utils.circuit_breaker import CircuitOpenError
+from ..utils.profiling import request_profiler
+from ..utils.memory import memory_tracker, process_memory, total_bytes
 
 router = APIRouter(prefix="/api", tags=["chatbot"])
 
@@ -24,10 +38,57 @@ class ChatResponse(BaseModel):
     response: str
     agent_type: str
     conversation_id: str
+    degradations: List[str] = []  # Degradations applied to meet the request deadline
+    profile_id: Optional[str] = None  # Set when the request was profiled
+    fast_path: bool = False  # Answered from the FAQ index without generation
+    sources: List[str] = []  # Facts a fast path answer is based on
+
+class IngestDocument(BaseModel):
+    """Document to add to a knowledge collection."""
+    text: str = Field(..., min_length=1)
+    metadata: Dict[str, Any] = {}
+    id: Optional[str] = None
+
+class IngestRequest(BaseModel):
+    """Ingestion request model."""
+    collection: str = Field("external_knowledge", pattern=r"^[A-Za-z0-9_-]{1,64}$")
+    documents: List[IngestDocument] = Field(..., min_length=1, max_length=INGESTION_MAX_DOCUMENTS)
 
 # Initialize the multi-agent coordinator
 coordinator = MultiAgentCoordinator()
 
+def is_admin(x_admin_token: Optional[str]) -> bool:
+    """
+    Check whether a request carries a valid admin token.
+    
+    Args:
+        x_admin_token: Value of the X-Admin-Token header
+        
+    Returns:
+        True if the token matches ADMIN_TOKEN, or if no token is configured
+        and the admin API is explicitly opened with ADMIN_API_OPEN
+    """
+    if not ADMIN_TOKEN:
+        return ADMIN_API_OPEN
+    return hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Check the admin token. Admin endpoints are disabled unless ADMIN_TOKEN is
+    configured, or explicitly opened with ADMIN_API_OPEN.
+    
+    Args:
+        x_admin_token: Value of the X-Admin-Token header
+        
+    Raises:
+        HTTPException: 403 if no admin token is configured, 401 if the token is wrong
+    """
+    if is_admin(x_admin_token):
+        return
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    raise HTTPException(status_code=401, detail="Invalid admin token")
+
 @router.get("/", response_class=HTMLResponse)
 async def root():
     """Serve the welcome page."""
@@ -83,34 +144,83 @@ async def root():
                 <p>Get information about available agents.</p>
             </div>
             
+            <div class="endpoint">
+                <h3>Metrics Endpoint</h3>
+                <p><code>GET /api/metrics</code></p>
+                <p>Get performance counters and latency summaries.</p>
+            </div>
+            
+            <div class="endpoint">
+                <h3>Request Profiles Endpoint</h3>
+                <p><code>GET /api/admin/profiles</code></p>
+                <p>List recent request profiles. Send <code>X-Profile: 1</code> and the admin token with a chat request to profile it, and download a profile from <code>GET /api/admin/profiles/{profile_id}</code>.</p>
+            </div>
+            
+            <div class="endpoint">
+                <h3>Memory Stats Endpoint</h3>
+                <p><code>GET /api/admin/stats</code></p>
+                <p>Get approximate entry and byte counts of the in-process stores. Add <code>?tracemalloc=diff</code> to see the allocation sites that grew since the previous diff, and <code>?tracemalloc=stop</code> to stop tracing.</p>
+            </div>
+            
+            <div class="endpoint">
+                <h3>Knowledge Ingestion Endpoint</h3>
+                <p><code>POST /api/knowledge/ingest</code></p>
+                <p>Queue documents to be embedded and indexed in the background. Returns a job ID; <code>GET /api/knowledge/ingest/{job_id}</code> reports its progress and throughput.</p>
+            </div>
+            
             <p>For more information, visit the <a href="/docs">API documentation</a>.</p>
         </body>
     </html>
     """
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, x_request_timeout: Optional[str] = Header(None), x_profile: Optional[str] = Header(None), x_admin_token: Optional[str] = Header(None)):
     """
     Process a chat message and return a response.
     
     Args:
         request: Chat request containing message and optional agent type
+        x_request_timeout: Optional X-Request-Timeout header with a shorter request deadline in seconds
+        x_profile: Optional X-Profile header; "1" or "true" profiles the request
+            (only honored with a valid X-Admin-Token)
+        x_admin_token: Optional X-Admin-Token header
         
     Returns:
         Chat response
     """
+    # Start the deadline clock as soon as the request arrives
+    deadline = Deadline.from_header(x_request_timeout)
+    
     try:
         # If agent_type is specified, we'll use it as a hint for the coordinator
         # Otherwise, the coordinator will determine the best agent automatically
         
-        # Process the query through the coordinator
-        result = await coordinator.route_query(request.message, request.conversation_id)
+        # Process the query through the coordinator, under the profiler if requested
+        # by an admin or sampled; anyone else could load the server by profiling
+        profile_id = None
+        profile_requested = (x_profile or "").lower() in ("1", "true") and is_admin(x_admin_token)
+        if request_profiler.should_profile(profile_requested):
+            result, profile_id = await request_profiler.profile(
+                coordinator.route_query, request.message, request.conversation_id, deadline
+            )
+        else:
+            result = await coordinator.route_query(request.message, request.conversation_id, deadline)
         
         return ChatResponse(
             response=result["response"],
             agent_type=result["agent_type"],
-            conversation_id=result["conversation_id"]
+            conversation_id=result["conversation_id"],
+            degradations=result["degradations"],
+            profile_id=profile_id,
+            fast_path=result["fast_path"],
+            sources=result["sources"]
         )
+    except CircuitOpenError as e:
+        # Ollama is down: tell the client when to retry instead of waiting on it
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    except DeadlineExceeded as e:
+        metrics.increment("deadline.exceeded")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
@@ -129,3 +239,117 @@ async def list_agents():
         }
         for agent_type, config in AGENTS.items()
     }
+
+@router.get("/metrics", response_model=Dict[str, Any])
+async def get_metrics():
+    """
+    Get a snapshot of the in-process metrics.
+    
+    Returns:
+        Dictionary of counters, gauges and summaries
+    """
+    return metrics.snapshot()
+
+@router.get("/admin/profiles", response_model=List[Dict[str, Any]], dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    List the saved request profiles, newest first.
+    
+    Returns:
+        Metadata of each profile (conversation ID, stage timings, size, ...)
+    """
+    return request_profiler.spool.list()
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: str):
+    """
+    Download a saved request profile.
+    
+    Args:
+        profile_id: ID of the profile
+        
+    Returns:
+        The profile file
+    """
+    path = request_profiler.spool.get_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return FileResponse(path, filename=os.path.basename(path))
+
+@router.get("/admin/stats", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def get_admin_stats(tracemalloc: Optional[str] = Query(None, pattern="^(diff|stop)$")):
+    """
+    Get the approximate memory held by each in-process store.
+    
+    Args:
+        tracemalloc: "diff" to start tracing allocations (on the first call)
+            and report what grew since the previous diff, "stop" to stop tracing
+        
+    Returns:
+        Entry and byte counts per store, the process's resident memory and the tracing status
+    """
+    stores = {
+        **coordinator.memory_stats(),
+        "vector_stores": vector_store_registry.stats(),
+        "ingestion_jobs": ingestion_worker.memory_stats(),
+        "metrics": metrics.memory_stats()
+    }
+    stats = {
+        "process": process_memory(),
+        "accounted_bytes": total_bytes(stores),
+        "stores": stores
+    }
+    
+    # Snapshots take a while on a large heap, so they are taken off the event loop
+    if tracemalloc == "diff":
+        stats["tracemalloc"] = await asyncio.to_thread(memory_tracker.diff)
+    elif tracemalloc == "stop":
+        stats["tracemalloc"] = memory_tracker.stop()
+    else:
+        stats["tracemalloc"] = memory_tracker.status()
+    return stats
+
+@router.post("/knowledge/ingest", status_code=202, response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def ingest_documents(request: IngestRequest):
+    """
+    Queue documents to be added to a knowledge collection.
+    
+    Queries keep being served from the collection's current snapshot while
+    the documents are embedded and indexed in the background.
+    
+    Args:
+        request: Ingestion request with the collection and documents
+        
+    Returns:
+        The queued job's status, including its ID
+    """
+    try:
+        job = ingestion_worker.submit(
+            request.collection,
+            [document.text for document in request.documents],
+            [document.metadata for document in request.documents],
+            [document.id or str(uuid.uuid4()) for document in request.documents]
+        )
+    except queue.Full:
+        metrics.increment("ingestion.rejected")
+        raise HTTPException(status_code=503, detail="Too many ingestion jobs queued", headers={"Retry-After": "5"})
+    return job.to_dict()
+
+@router.get("/knowledge/ingest/{job_id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def get_ingestion_job(job_id: str):
+    """
+    Get the status, progress and throughput of an ingestion job.
+    
+    Jobs accepted by other worker processes are reported from their status
+    files, as of their last batch.
+    
+    Args:
+        job_id: ID of the job
+        
+    Returns:
+        The job's status
+    """
+    status = ingestion_worker.get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    return status
@@ -4,24 +4,154 @@ Initialization file for the config module.
 
 from .config import (
     OLLAMA_BASE_URL,
+    OLLAMA_BASE_URLS,
+    OLLAMA_HEALTH_CHECK_INTERVAL,
+    OLLAMA_HEALTH_CHECK_TIMEOUT,
+    OLLAMA_MODEL_LOAD_PENALTY,
     OLLAMA_MODEL,
+    OLLAMA_SMALL_MODEL,
     VECTOR_DB_TYPE,
     VECTOR_DB_PATH,
+    EMBEDDING_MODEL,
+    VECTOR_STORE_WORKERS,
+    VECTOR_STORE_BATCH_SIZE,
+    INGESTION_MAX_DOCUMENTS,
+    INGESTION_QUEUE_SIZE,
+    INGESTION_MAX_JOBS,
+    INGESTION_JOBS_DIR,
+    VECTOR_INDEX_MMAP,
+    VECTOR_SNAPSHOT_DTYPE,
+    VECTOR_STORE_REFRESH_SECONDS,
+    VECTOR_SEARCH_BATCHING,
+    VECTOR_SEARCH_BATCH_WINDOW_MS,
+    VECTOR_SEARCH_MAX_BATCH_SIZE,
+    FAISS_INDEX_CONFIG,
     API_HOST,
     API_PORT,
+    API_WORKERS,
+    STARTUP_DIR,
+    ADMIN_TOKEN,
+    ADMIN_API_OPEN,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_MODE,
+    PROFILE_DIR,
+    PROFILE_SPOOL_MAX_FILES,
+    PROFILE_SPOOL_MAX_BYTES,
+    TRACEMALLOC_FRAMES,
+    TRACEMALLOC_TOP_STATS,
+    TRAFFIC_CAPTURE,
+    TRAFFIC_CAPTURE_PATH,
+    TRAFFIC_CAPTURE_SAMPLE_RATE,
+    TRAFFIC_CAPTURE_MAX_BYTES,
+    TRACING_EXPORTER,
+    TRACE_SAMPLE_RATIO,
+    TRACE_FILE_PATH,
+    CONVERSATION_BACKEND,
+    CONVERSATION_DB_PATH,
+    CONVERSATION_VIEW_CACHE_SIZE,
+    CONVERSATION_COLD_STORAGE,
+    CONVERSATION_COLD_AFTER_SECONDS,
+    CONVERSATION_COLD_SWEEP_SECONDS,
+    CONVERSATION_COMPRESSION_LEVEL,
     AGENTS,
+    MODEL_CASCADE,
+    CASCADE_POLICY,
     KNOWLEDGE_SOURCES,
-    MAX_HISTORY_LENGTH
+    CIRCUIT_BREAKERS,
+    HEDGED_REQUESTS,
+    HEDGING,
+    SPECULATIVE_RETRIEVAL,
+    SPECULATIVE_MAX_CANDIDATES,
+    ROUTING_TOPIC_DECAY,
+    ROUTING_STICKY_AGENT,
+    ROUTING_SWITCH_MARGIN,
+    FAQ_FAST_PATH,
+    FAQ_INDEX_PATH,
+    FAQ_MIN_SCORE,
+    FAQ_MIN_MARGIN,
+    REQUEST_DEADLINE_SECONDS,
+    DEADLINE_BUDGETS,
+    MAX_HISTORY_LENGTH,
+    PROMPT_CACHE_MODE,
+    PROMPT_CONTEXT_MAX_TOKENS,
+    HISTORY_SUMMARY_MODEL,
+    HISTORY_SUMMARY_TOKEN_THRESHOLD,
+    HISTORY_RECENT_TURNS
 )
 
 __all__ = [
     'OLLAMA_BASE_URL',
+    'OLLAMA_BASE_URLS',
+    'OLLAMA_HEALTH_CHECK_INTERVAL',
+    'OLLAMA_HEALTH_CHECK_TIMEOUT',
+    'OLLAMA_MODEL_LOAD_PENALTY',
     'OLLAMA_MODEL',
+    'OLLAMA_SMALL_MODEL',
     'VECTOR_DB_TYPE',
     'VECTOR_DB_PATH',
+    'EMBEDDING_MODEL',
+    'VECTOR_STORE_WORKERS',
+    'VECTOR_STORE_BATCH_SIZE',
+    'INGESTION_MAX_DOCUMENTS',
+    'INGESTION_QUEUE_SIZE',
+    'INGESTION_MAX_JOBS',
+    'INGESTION_JOBS_DIR',
+    'VECTOR_INDEX_MMAP',
+    'VECTOR_SNAPSHOT_DTYPE',
+    'VECTOR_STORE_REFRESH_SECONDS',
+    'VECTOR_SEARCH_BATCHING',
+    'VECTOR_SEARCH_BATCH_WINDOW_MS',
+    'VECTOR_SEARCH_MAX_BATCH_SIZE',
+    'FAISS_INDEX_CONFIG',
     'API_HOST',
     'API_PORT',
+    'API_WORKERS',
+    'STARTUP_DIR',
+    'ADMIN_TOKEN',
+    'ADMIN_API_OPEN',
+    'PROFILE_SAMPLE_RATE',
+    'PROFILE_MODE',
+    'PROFILE_DIR',
+    'PROFILE_SPOOL_MAX_FILES',
+    'PROFILE_SPOOL_MAX_BYTES',
+    'TRACEMALLOC_FRAMES',
+    'TRACEMALLOC_TOP_STATS',
+    'TRAFFIC_CAPTURE',
+    'TRAFFIC_CAPTURE_PATH',
+    'TRAFFIC_CAPTURE_SAMPLE_RATE',
+    'TRAFFIC_CAPTURE_MAX_BYTES',
+    'TRACING_EXPORTER',
+    'TRACE_SAMPLE_RATIO',
+    'TRACE_FILE_PATH',
+    'CONVERSATION_BACKEND',
+    'CONVERSATION_DB_PATH',
+    'CONVERSATION_VIEW_CACHE_SIZE',
+    'CONVERSATION_COLD_STORAGE',
+    'CONVERSATION_COLD_AFTER_SECONDS',
+    'CONVERSATION_COLD_SWEEP_SECONDS',
+    'CONVERSATION_COMPRESSION_LEVEL',
     'AGENTS',
+    'MODEL_CASCADE',
+    'CASCADE_POLICY',
     'KNOWLEDGE_SOURCES',
-    'MAX_HISTORY_LENGTH'
+    'CIRCUIT_BREAKERS',
+    'HEDGED_REQUESTS',
+    'HEDGING',
+    'SPECULATIVE_RETRIEVAL',
+    'SPECULATIVE_MAX_CANDIDATES',
+    'ROUTING_TOPIC_DECAY',
+    'ROUTING_STICKY_AGENT',
+    'ROUTING_SWITCH_MARGIN',
+    'FAQ_FAST_PATH',
+    'FAQ_INDEX_PATH',
+    'FAQ_MIN_SCORE',
+    'FAQ_MIN_MARGIN',
+    'REQUEST_DEADLINE_SECONDS',
+    'DEADLINE_BUDGETS',
+    'MAX_HISTORY_LENGTH',
+    'PROMPT_CACHE_MODE',
+    'PROMPT_CONTEXT_MAX_TOKENS',
+    'HISTORY_SUMMARY_MODEL',
+    'HISTORY_SUMMARY_TOKEN_THRESHOLD',
+    'HISTORY_RECENT_TURNS'
 ]
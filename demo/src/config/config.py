@@ -11,14 +11,105 @@ load_dotenv()
 # Ollama settings
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+OLLAMA_SMALL_MODEL = os.getenv("OLLAMA_SMALL_MODEL", "llama3.2:1b")  # Small tier of the model cascade
+
+# Ollama backend pool: generations go to the least-loaded healthy backend,
+# preferring one that already has the model loaded. OLLAMA_BASE_URLS is a
+# comma-separated list; it defaults to OLLAMA_BASE_URL alone.
+OLLAMA_BASE_URLS = [url.strip() for url in os.getenv("OLLAMA_BASE_URLS", OLLAMA_BASE_URL).split(",") if url.strip()]
+OLLAMA_HEALTH_CHECK_INTERVAL = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", "10"))  # Seconds between active health checks
+OLLAMA_HEALTH_CHECK_TIMEOUT = 2.0  # Seconds before a health check counts as failed
+OLLAMA_MODEL_LOAD_PENALTY = 1.0  # In-flight requests a backend without the model loaded counts as having in addition
 
 # Vector database settings
 VECTOR_DB_TYPE = "faiss"  # Options: "chroma", "faiss"
 VECTOR_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "vector_db")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", OLLAMA_MODEL)
+VECTOR_STORE_WORKERS = int(os.getenv("VECTOR_STORE_WORKERS", "4"))  # Threads for embedding and index operations
+VECTOR_STORE_BATCH_SIZE = 64  # Texts embedded and indexed per batch when adding
+INGESTION_MAX_DOCUMENTS = int(os.getenv("INGESTION_MAX_DOCUMENTS", "10000"))  # Documents accepted per ingestion request
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", "16"))  # Ingestion jobs waiting before requests are refused
+INGESTION_MAX_JOBS = 100  # Finished ingestion jobs whose status is kept
+# Job status files, so any API worker process can report a job another one accepted
+INGESTION_JOBS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "ingestion_jobs")
+VECTOR_INDEX_MMAP = os.getenv("VECTOR_INDEX_MMAP", "true").lower() == "true"  # Memory-map shared read-only indexes
+VECTOR_SNAPSHOT_DTYPE = os.getenv("VECTOR_SNAPSHOT_DTYPE", "float32")  # Storage type of the embeddings in collection snapshots: "float32" or "float16"
+VECTOR_STORE_REFRESH_SECONDS = float(os.getenv("VECTOR_STORE_REFRESH_SECONDS", "2"))  # How often shared stores check for collections saved by other workers
+
+# Micro-batching of concurrent similarity searches into one embedding call and one index search
+VECTOR_SEARCH_BATCHING = os.getenv("VECTOR_SEARCH_BATCHING", "true").lower() == "true"
+VECTOR_SEARCH_BATCH_WINDOW_MS = float(os.getenv("VECTOR_SEARCH_BATCH_WINDOW_MS", "5"))  # Max wait for a batch to fill
+VECTOR_SEARCH_MAX_BATCH_SIZE = 32  # Queries that trigger an immediate flush
+
+# FAISS index settings per collection. Collections that are not listed use the
+# "default" entry; listed collections only need to override the keys they change.
+# Index types: "flat" (exact), "ivf_flat", "hnsw", "ivf_pq"
+FAISS_INDEX_CONFIG = {
+    "default": {
+        "type": os.getenv("FAISS_INDEX_TYPE", "flat"),
+        "nlist": 100,            # IVF: number of inverted lists (clusters)
+        "nprobe": 8,             # IVF: lists visited per query
+        "hnsw_m": 32,            # HNSW: neighbours per node
+        "ef_construction": 200,  # HNSW: candidate list size while building
+        "ef_search": 64,         # HNSW: candidate list size while searching
+        "pq_m": 16,              # PQ: sub-quantizers (must divide the dimension)
+        "pq_nbits": 8,           # PQ: bits per sub-quantizer code
+        "train_size": 10000,     # Vectors sampled to train IVF/PQ indexes
+    },
+    "concordia_admissions": {
+        "type": "flat",
+    },
+}
 
 # API settings
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))  # Worker processes; >1 needs a shared conversation backend
+STARTUP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "startup")  # Locks coordinating worker startup
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # Admin endpoints require it in the X-Admin-Token header; without it they are disabled
+ADMIN_API_OPEN = os.getenv("ADMIN_API_OPEN", "false").lower() == "true"  # Opens admin endpoints without a token (local development only)
+
+# Per-request profiling: a chat request is profiled when it sends "X-Profile: 1"
+# with a valid X-Admin-Token, or is sampled at PROFILE_SAMPLE_RATE. Profiles are
+# kept in a bounded spool.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "deterministic")  # "deterministic" (cProfile) or "sampling" (pyinstrument, if installed)
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "profiles")
+PROFILE_SPOOL_MAX_FILES = 50
+PROFILE_SPOOL_MAX_BYTES = 50 * 1024 * 1024
+
+# Memory accounting: /api/admin/stats?tracemalloc=diff starts tracemalloc and
+# reports the allocation sites that grew most between successive calls
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "1"))  # Stack frames recorded per allocation
+TRACEMALLOC_TOP_STATS = 20  # Allocation sites reported per diff
+
+# Traffic capture: sanitized chat requests (message, pseudonymized conversation
+# ID, timestamp) are appended to a JSONL log that `python -m src.utils.replay`
+# plays back against builds to compare their performance
+TRAFFIC_CAPTURE = os.getenv("TRAFFIC_CAPTURE", "false").lower() == "true"
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "capture", "chat.jsonl"))
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))  # Share of conversations captured
+TRAFFIC_CAPTURE_MAX_BYTES = 100 * 1024 * 1024  # Capture stops once the log reaches this size
+
+# Tracing: OpenTelemetry spans for routing, knowledge retrieval, prompt assembly and
+# generation, children of the FastAPI request span. Exporters: "none", "file" (OTLP/JSON
+# lines at TRACE_FILE_PATH) or "otlp" (gRPC to OTEL_EXPORTER_OTLP_ENDPOINT). New traces are
+# sampled at TRACE_SAMPLE_RATIO; requests carrying a traceparent follow the caller's decision.
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0.1"))
+TRACE_FILE_PATH = os.getenv("TRACE_FILE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "traces", "spans.jsonl"))
+
+# Conversation storage: "memory" (per process) or "sqlite" (shared by all workers on the host)
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "memory")
+CONVERSATION_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "conversations.sqlite3")
+CONVERSATION_VIEW_CACHE_SIZE = 1000  # Conversations whose agent-ready history each process keeps up to date
+# Cold storage (memory backend): the messages of conversations idle for
+# CONVERSATION_COLD_AFTER_SECONDS are zstd-compressed by a sweep every
+# CONVERSATION_COLD_SWEEP_SECONDS and decompressed on their next access
+CONVERSATION_COLD_STORAGE = os.getenv("CONVERSATION_COLD_STORAGE", "true").lower() == "true"
+CONVERSATION_COLD_AFTER_SECONDS = float(os.getenv("CONVERSATION_COLD_AFTER_SECONDS", "300"))
+CONVERSATION_COLD_SWEEP_SECONDS = 30
+CONVERSATION_COMPRESSION_LEVEL = 3  # zstd level; higher compresses better but slower
 
 # Agent settings
 AGENTS = {
@@ -26,25 +117,150 @@ AGENTS = {
         "name": "General Questions Agent",
         "description": "Handles general knowledge questions on various topics",
         "model": OLLAMA_MODEL,
+        "small_model": OLLAMA_SMALL_MODEL,
     },
     "concordia_cs": {
         "name": "Concordia CS Admissions Agent",
         "description": "Specializes in Concordia University Computer Science program admissions",
         "model": OLLAMA_MODEL,
+        "small_model": OLLAMA_SMALL_MODEL,
     },
     "ai": {
         "name": "AI Knowledge Agent",
         "description": "Specializes in artificial intelligence related questions",
         "model": OLLAMA_MODEL,
+        "small_model": OLLAMA_SMALL_MODEL,
     }
 }
 
+# Model cascade: agents with a "small_model" answer with it first and escalate to
+# their "model" for long or complex queries, explicit user follow-ups, or when the
+# small model's answer looks unsure, or when the small model fails. Agents without a
+# small model use "model" only. Off by default, since the small model must be pulled too.
+MODEL_CASCADE = os.getenv("MODEL_CASCADE", "false").lower() == "true"
+CASCADE_POLICY = {
+    "small_temperature": 0.3,  # Lookups answered by the small model need little sampling variety
+    "max_query_tokens": 60,  # Longer queries go straight to the large model
+    "complex_keywords": [
+        "explain", "compare", "why", "how does", "how do", "difference between",
+        "step by step", "analyze", "pros and cons", "in detail"
+    ],
+    "follow_up_phrases": [
+        "that's wrong", "that is wrong", "not what i asked", "more detail", "elaborate",
+        "explain further", "try again", "are you sure", "that doesn't", "that does not"
+    ],
+    "min_response_chars": 20,  # Shorter small-model answers are escalated
+    "uncertain_phrases": [
+        "i'm not sure", "i am not sure", "i don't know", "i do not know", "not certain",
+        "i cannot answer", "i can't answer", "i don't have information", "unclear"
+    ],
+}
+
 # External knowledge sources
 KNOWLEDGE_SOURCES = {
     "wikipedia": {
         "enabled": True,
+        "api_url": os.getenv("WIKIPEDIA_API_URL"),  # Override the MediaWiki API endpoint (e.g. a local fake server)
+        # "online" queries the MediaWiki API; "offline" searches a local index built
+        # from an abstracts dump with `python -m src.knowledge.local_wikipedia`
+        "mode": os.getenv("WIKIPEDIA_MODE", "online"),
+        "local_index_path": os.getenv("WIKIPEDIA_INDEX_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "wikipedia", "abstracts.sqlite")),
     }
 }
 
+# Circuit breakers around external dependencies, per dependency. Dependencies that
+# are not listed use the "default" entry. A breaker opens once the failure rate over
+# the last `window` calls (at least `min_calls`) reaches the threshold, rejects calls
+# for `open_seconds`, then lets `half_open_calls` probe calls through to test recovery.
+CIRCUIT_BREAKERS = {
+    "default": {
+        "failure_rate_threshold": 0.5,
+        "window": 20,
+        "min_calls": 5,
+        "open_seconds": 30,
+        "half_open_calls": 1,
+        "call_timeout_seconds": None,  # Calls slower than this count as failures
+    },
+    "wikipedia": {
+        "call_timeout_seconds": 10,
+    },
+    "ollama": {
+        "open_seconds": 15,
+    },
+}
+
+# Hedged requests: a call still running after the given percentile of its
+# recent latency is duplicated and the first attempt to return wins. Each
+# call earns `budget` hedges (saved up to `burst`), capping the extra load at
+# about that share of calls. Only idempotent reads are hedged.
+HEDGED_REQUESTS = os.getenv("HEDGED_REQUESTS", "false").lower() == "true"
+HEDGING = {
+    "default": {
+        "percentile": 95,
+        "budget": 0.05,
+        "burst": 10,
+        "min_samples": 20,  # Calls observed before hedging starts
+        "window": 200,  # Recent calls the percentile is computed over
+        "min_delay_ms": 0,
+    },
+    "wikipedia": {
+        "min_delay_ms": 200,
+    },
+    "embeddings": {
+        "percentile": 99,
+        "budget": 0.02,
+    },
+}
+
+# Routing settings
+# Retrieve for the likely agents while routing ambiguous queries. Off by default,
+# since the losing candidates' retrievals (including live Wikipedia lookups) are
+# real requests whose results are thrown away.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+SPECULATIVE_MAX_CANDIDATES = 2  # Agents retrieved for speculatively when routing is ambiguous
+# Follow-ups without routing keywords go to the agent whose topic the
+# conversation has been about: each message's keyword matches are added to
+# per-agent scores that decay by ROUTING_TOPIC_DECAY per message. With
+# ROUTING_STICKY_AGENT, another agent only takes over a follow-up when its
+# score leads the current agent's by ROUTING_SWITCH_MARGIN.
+ROUTING_TOPIC_DECAY = 0.5
+ROUTING_STICKY_AGENT = os.getenv("ROUTING_STICKY_AGENT", "true").lower() == "true"
+ROUTING_SWITCH_MARGIN = 1.0
+
+# FAQ fast path: common admissions questions are answered from an index built
+# by load_admissions, without retrieval or generation, when a query matches
+# one entry with at least FAQ_MIN_SCORE cosine similarity and a lead of
+# FAQ_MIN_MARGIN over the next entry
+FAQ_FAST_PATH = os.getenv("FAQ_FAST_PATH", "true").lower() == "true"
+FAQ_INDEX_PATH = os.getenv("FAQ_INDEX_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "faq", "index.json"))
+FAQ_MIN_SCORE = 0.75
+FAQ_MIN_MARGIN = 0.1
+
+# Request deadlines: each chat request gets REQUEST_DEADLINE_SECONDS unless the
+# client sends a shorter X-Request-Timeout header (longer ones are capped). As the
+# remaining time runs short the pipeline degrades in order: skip Wikipedia, reduce
+# top_k, cap generation length.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))
+DEADLINE_BUDGETS = {
+    "retrieval_fraction": 0.3,  # Share of the remaining time a retrieval may use
+    "wikipedia_min_seconds": 30,  # Skip Wikipedia when less time than this remains
+    "full_top_k_min_seconds": 20,  # Reduce top_k when less time than this remains
+    "reduced_top_k": 1,
+    "full_generation_min_seconds": 15,  # Cap generation length when less time than this remains
+    "generation_tokens_per_second": 8,  # Expected generation speed, used to size the cap
+    "min_generation_tokens": 32
+}
+
 # Context settings
 MAX_HISTORY_LENGTH = 10  # Maximum number of conversation turns to keep in memory
+
+# Prompt caching: "context" continues each conversation from the token context
+# Ollama returned on the previous turn, "stateless" re-sends the full prompt
+PROMPT_CACHE_MODE = os.getenv("PROMPT_CACHE_MODE", "context")
+PROMPT_CONTEXT_MAX_TOKENS = 3072  # Start a fresh context once the reused one grows past this
+
+# History compaction: once a conversation's history passes the token threshold,
+# older turns are summarized in the background into a rolling summary
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", OLLAMA_MODEL)
+HISTORY_SUMMARY_TOKEN_THRESHOLD = 1500  # Estimated history tokens that trigger compaction
+HISTORY_RECENT_TURNS = 3  # Turns kept verbatim after compaction
@@ -2,12 +2,38 @@
 Initialization file for the knowledge module.
 """
 
-from .wikipedia_source import WikipediaSource
-from .vector_store import VectorStore
-from .enhancer import KnowledgeEnhancer
+import importlib
+
+# Submodules are imported on first access, so importing the package does not
+# load LangChain, FAISS or the Wikipedia client for components that are not used
+_LAZY_IMPORTS = {
+    'WikipediaSource': '.wikipedia_source',
+    'LocalWikipediaSource': '.local_wikipedia',
+    'VectorStore': '.vector_store',
+    'VectorStoreRegistry': '.vector_store',
+    'vector_store_registry': '.vector_store',
+    'KnowledgeEnhancer': '.enhancer',
+    'FAQIndex': '.faq',
+    'IngestionWorker': '.ingestion',
+    'ingestion_worker': '.ingestion'
+}
 
 __all__ = [
     'WikipediaSource',
+    'LocalWikipediaSource',
     'VectorStore',
-    'KnowledgeEnhancer'
+    'VectorStoreRegistry',
+    'vector_store_registry',
+    'KnowledgeEnhancer',
+    'FAQIndex',
+    'IngestionWorker',
+    'ingestion_worker'
 ]
+
+def __getattr__(name):
+    """Import a re-exported name from its submodule on first access."""
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
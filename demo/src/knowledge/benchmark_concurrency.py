@@ -0,0 +1,136 @@
+"""
+Measure chat latency while a large ingestion runs in the same process.
+
+Runs a chat load against the coordinator twice, first on its own and then
+while texts are being added to a scratch collection, and reports chat
+latency and event loop lag for both phases. With vector store operations on
+their own thread pool, the p99 of both should stay flat during ingestion.
+
+Usage (from the demo directory, with Ollama running):
+    python -m src.knowledge.benchmark_concurrency --requests 100 --ingest 5000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict
+
+from ..agents import MultiAgentCoordinator
+from ..utils.metrics import Summary
+from .vector_store import VectorStore
+
+QUERIES = [
+    "What is the GPA requirement for the Concordia computer science program?",
+    "When is the application deadline for Concordia undergraduate admission?",
+    "How does a neural network learn during training?",
+    "What is the difference between supervised and unsupervised learning?",
+]
+
+
+async def measure_loop_lag(summary: Summary, stop: asyncio.Event, interval: float = 0.01) -> None:
+    """
+    Record how late the event loop wakes up from short sleeps.
+
+    Args:
+        summary: Summary receiving the lag in milliseconds
+        stop: Event that ends the measurement
+        interval: Sleep interval in seconds
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        summary.observe(max((time.perf_counter() - start - interval) * 1000, 0.0))
+
+
+async def run_chat_load(coordinator: MultiAgentCoordinator, n_requests: int, concurrency: int) -> Summary:
+    """
+    Send chat queries through the coordinator and record their latency.
+
+    Args:
+        coordinator: The multi-agent coordinator
+        n_requests: Total number of queries
+        concurrency: Number of queries in flight at once
+
+    Returns:
+        Summary of request latencies in milliseconds
+    """
+    latencies = Summary(window=n_requests)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await coordinator.route_query(QUERIES[i % len(QUERIES)])
+            latencies.observe((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one_request(i) for i in range(n_requests)))
+    return latencies
+
+
+async def run_phase(coordinator: MultiAgentCoordinator, args: argparse.Namespace, ingest: bool) -> Dict[str, Summary]:
+    """
+    Run one phase of the benchmark.
+
+    Args:
+        coordinator: The multi-agent coordinator
+        args: Parsed command line arguments
+        ingest: Whether to run an ingestion alongside the chat load
+
+    Returns:
+        Dictionary with the chat latency and loop lag summaries
+    """
+    loop_lag = Summary(window=100000)
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(loop_lag, stop))
+
+    ingest_task = None
+    if ingest:
+        store = VectorStore(collection_name=args.collection)
+        texts = [f"Synthetic ingestion document {i} about topic {i % 97}." for i in range(args.ingest)]
+        ingest_task = asyncio.create_task(store.add_texts(texts))
+
+    chat = await run_chat_load(coordinator, args.requests, args.concurrency)
+
+    # Stop the ingestion if the chat load finished first
+    if ingest_task is not None:
+        ingest_task.cancel()
+        await asyncio.gather(ingest_task, return_exceptions=True)
+
+    stop.set()
+    await lag_task
+    return {"chat": chat, "loop_lag": loop_lag}
+
+
+def format_summary(name: str, summary: Summary) -> str:
+    """Format one latency summary as a report line."""
+    stats = summary.to_dict()
+    return f"  {name:<14} p50 {stats['p50'] or 0:>9.1f} ms   p99 {stats['p99'] or 0:>9.1f} ms   max {stats['max'] or 0:>9.1f} ms"
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    """Run both phases and print the report."""
+    coordinator = MultiAgentCoordinator()
+
+    results: Dict[str, Dict[str, Summary]] = {}
+    for phase, ingest in (("baseline", False), ("with ingestion", True)):
+        results[phase] = await run_phase(coordinator, args, ingest)
+
+    print(f"{args.requests} chat requests, concurrency {args.concurrency}, ingestion of {args.ingest} texts")
+    for phase, summaries in results.items():
+        print(f"{phase}:")
+        print(format_summary("chat latency", summaries["chat"]))
+        print(format_summary("loop lag", summaries["loop_lag"]))
+
+
+def main():
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description="Chat latency during concurrent ingestion")
+    parser.add_argument("--requests", type=int, default=100, help="Chat requests per phase")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chat requests in flight at once")
+    parser.add_argument("--ingest", type=int, default=5000, help="Texts to ingest during the second phase")
+    parser.add_argument("--collection", default="benchmark_ingestion", help="Scratch collection for the ingestion")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark the configured FAISS index types against exact (Flat) search.
+
+For each index type this reports recall@k against IndexFlatL2, build time,
+per-query latency and the memory footprint of the index.
+
+Usage (from the demo directory):
+    python -m src.knowledge.benchmark_index --collection external_knowledge
+    python -m src.knowledge.benchmark_index --synthetic 100000 --dim 768 --k 10
+"""
+
+import argparse
+import os
+import pickle
+import time
+from typing import Dict, Any, List
+
+import faiss
+import numpy as np
+
+from ..config import FAISS_INDEX_CONFIG
+from .faiss_index import INDEX_TYPES, get_index_params, create_index, train_index, apply_search_params, index_memory_bytes
+from .snapshot import collection_paths, load_snapshot
+
+
+def load_collection_vectors(collection_name: str) -> np.ndarray:
+    """
+    Load the vectors of an existing FAISS collection.
+
+    Vectors come from the collection's snapshot, or are reconstructed from a
+    Flat index; otherwise the stored texts are re-embedded.
+
+    Args:
+        collection_name: Name of the collection
+
+    Returns:
+        Float32 array of shape (n, dim)
+    """
+    paths = collection_paths(collection_name)
+    if os.path.exists(paths["snapshot"]):
+        snapshot = load_snapshot(paths["snapshot"])
+        # PQ snapshots hold decoded approximations, so only exact ones are used
+        if snapshot["embeddings"] is not None and get_index_params(FAISS_INDEX_CONFIG, collection_name)["type"] != "ivf_pq":
+            return np.asarray(snapshot["embeddings"], dtype=np.float32)
+        texts = list(snapshot["texts"])
+    else:
+        index = faiss.read_index(paths["index"])
+        if isinstance(index, faiss.IndexFlat):
+            return index.reconstruct_n(0, index.ntotal)
+        with open(paths["pickle"], 'rb') as f:
+            texts = pickle.load(f)["texts"]
+
+    from .vector_store import VectorStore
+
+    return VectorStore(collection_name=collection_name)._embed(texts)
+
+
+def benchmark_index_type(params: Dict[str, Any], vectors: np.ndarray, queries: np.ndarray, ground_truth: np.ndarray, k: int) -> Dict[str, Any]:
+    """
+    Build one index type and measure it against the exact results.
+
+    Args:
+        params: Index parameters from get_index_params
+        vectors: Database vectors
+        queries: Query vectors
+        ground_truth: Exact top-k neighbour ids for each query
+        k: Number of neighbours
+
+    Returns:
+        Dictionary of benchmark measurements
+    """
+    start = time.perf_counter()
+    index = create_index(vectors.shape[1], params, len(vectors))
+    train_index(index, vectors, params)
+    index.add(vectors)
+    apply_search_params(index, params)
+    build_seconds = time.perf_counter() - start
+
+    # Search one query at a time to match the request path
+    latencies = []
+    hits = 0
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, found = index.search(queries[i:i + 1], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(found[0]) & set(ground_truth[i]))
+
+    latencies = np.array(latencies)
+    return {
+        "type": params["type"],
+        "recall": hits / (len(queries) * k),
+        "build_s": build_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "memory_mb": index_memory_bytes(index) / (1024 * 1024),
+    }
+
+
+def run_benchmark(vectors: np.ndarray, collection_name: str, index_types: List[str], n_queries: int, k: int) -> List[Dict[str, Any]]:
+    """
+    Benchmark each index type on the given vectors.
+
+    Args:
+        vectors: Database vectors
+        collection_name: Collection whose configured parameters are used
+        index_types: Index types to compare
+        n_queries: Number of queries to run
+        k: Number of neighbours
+
+    Returns:
+        List of benchmark measurements, one per index type
+    """
+    rng = np.random.default_rng(0)
+    k = min(k, len(vectors))
+
+    # Perturbed database vectors stand in for real queries
+    queries = vectors[rng.choice(len(vectors), n_queries)]
+    queries = queries + rng.normal(scale=float(vectors.std()) * 0.1, size=queries.shape).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        params = get_index_params(FAISS_INDEX_CONFIG, collection_name)
+        params["type"] = index_type
+        results.append(benchmark_index_type(params, vectors, queries, ground_truth, k))
+    return results
+
+
+def main():
+    """Parse arguments, run the benchmark and print a report."""
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types against exact search")
+    parser.add_argument("--collection", default="external_knowledge", help="Collection to load vectors and index parameters from")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many random vectors instead of a collection")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension of synthetic vectors")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES, help="Index types to compare")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("-k", "--k", type=int, default=10, help="Neighbours per query (recall@k)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = np.random.default_rng(0).standard_normal((args.synthetic, args.dim), dtype=np.float32)
+    else:
+        vectors = load_collection_vectors(args.collection)
+
+    print(f"Benchmarking {len(vectors)} vectors of dimension {vectors.shape[1]}, {args.queries} queries, k={args.k}")
+    print(f"{'type':<10} {'recall@k':>9} {'build s':>9} {'p50 ms':>9} {'p99 ms':>9} {'memory MB':>10}")
+    for result in run_benchmark(vectors, args.collection, args.types, args.queries, args.k):
+        print(f"{result['type']:<10} {result['recall']:>9.3f} {result['build_s']:>9.2f} "
+              f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} {result['memory_mb']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,14 @@
 Integration of external knowledge sources with agents.
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import asyncio
 
-from ..knowledge import WikipediaSource, VectorStore
-from ..config import KNOWLEDGE_SOURCES
+from ..knowledge import WikipediaSource, LocalWikipediaSource, vector_store_registry
+from ..config import KNOWLEDGE_SOURCES, DEADLINE_BUDGETS
+from ..utils.deadline import Deadline
+from ..utils.metrics import metrics
+from ..utils.tracing import tracer
 
 class KnowledgeEnhancer:
     """
@@ -23,22 +27,80 @@ class KnowledgeEnhancer:
         # Initialize knowledge sources
         self.sources = {}
         
-        if use_wikipedia and KNOWLEDGE_SOURCES.get("wikipedia", {}).get("enabled", False):
-            self.sources["wikipedia"] = WikipediaSource()
+        wikipedia_config = KNOWLEDGE_SOURCES.get("wikipedia", {})
+        self.local_wikipedia = wikipedia_config.get("mode") == "offline"
+        if use_wikipedia and wikipedia_config.get("enabled", False):
+            if self.local_wikipedia:
+                try:
+                    self.sources["wikipedia"] = LocalWikipediaSource()
+                except FileNotFoundError as e:
+                    # Offline means no network, so answer without Wikipedia
+                    print(f"Wikipedia disabled: {e}")
+            else:
+                self.sources["wikipedia"] = WikipediaSource()
         
-        # Initialize vector store if needed
+        # Use the shared vector store if needed
         if use_vector_store:
-            self.vector_store = VectorStore(collection_name="external_knowledge")
+            self.vector_store = vector_store_registry.acquire("external_knowledge")
         else:
             self.vector_store = None
     
-    async def enhance_query(self, query: str, top_k: int = 3) -> Dict[str, Any]:
+    def close(self) -> None:
+        """Release the shared vector store held by this enhancer."""
+        if self.vector_store:
+            vector_store_registry.release(self.vector_store)
+            self.vector_store = None
+    
+    async def enhance_query(self, query: str, top_k: int = 3, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Enhance a query with external knowledge.
         
+        With a deadline, Wikipedia is skipped and then top_k reduced as the
+        remaining time runs short, and retrieval gets a share of the remaining
+        time; if it runs out, no knowledge is returned. If the vector store
+        fails (e.g. Ollama's breaker is open for the query embedding), the
+        query is answered without its results.
+        
         Args:
             query: The user's query
             top_k: Number of most similar results to return
+            deadline: Optional deadline of the request
+            
+        Returns:
+            Dictionary containing retrieved knowledge
+        """
+        if deadline is None:
+            return await self._retrieve(query, top_k, use_wikipedia=True, deadline=None)
+        
+        # Degrade in order as the remaining time shrinks; local Wikipedia
+        # lookups take milliseconds and are never skipped
+        use_wikipedia = "wikipedia" in self.sources
+        if use_wikipedia and not self.local_wikipedia and deadline.remaining() < DEADLINE_BUDGETS["wikipedia_min_seconds"]:
+            use_wikipedia = False
+            deadline.degrade("skip_wikipedia")
+        
+        reduced_top_k = DEADLINE_BUDGETS["reduced_top_k"]
+        if self.vector_store and top_k > reduced_top_k and deadline.remaining() < DEADLINE_BUDGETS["full_top_k_min_seconds"]:
+            top_k = reduced_top_k
+            deadline.degrade("reduce_top_k")
+        
+        # Leave the rest of the budget for generation
+        budget = deadline.remaining() * DEADLINE_BUDGETS["retrieval_fraction"]
+        try:
+            return await asyncio.wait_for(self._retrieve(query, top_k, use_wikipedia, deadline), timeout=budget)
+        except asyncio.TimeoutError:
+            deadline.degrade("retrieval_timeout")
+            return {}
+    
+    async def _retrieve(self, query: str, top_k: int, use_wikipedia: bool, deadline: Optional[Deadline]) -> Dict[str, Any]:
+        """
+        Retrieve knowledge from the enabled sources.
+        
+        Args:
+            query: The user's query
+            top_k: Number of most similar results to return
+            use_wikipedia: Whether to search Wikipedia if it is enabled
+            deadline: Deadline of the request, if any, to record degradations on
             
         Returns:
             Dictionary containing retrieved knowledge
@@ -47,30 +109,44 @@ class KnowledgeEnhancer:
         
         # Search vector store if enabled
         if self.vector_store:
-            vector_results = await self.vector_store.similarity_search(query, k=top_k)
+            with tracer.start_as_current_span("knowledge.vector_store") as span:
+                span.set_attribute("chatbot.knowledge.collection", self.vector_store.collection_name)
+                span.set_attribute("chatbot.knowledge.top_k", top_k)
+                try:
+                    vector_results = await self.vector_store.similarity_search(query, k=top_k)
+                except Exception as e:
+                    # Embedding or search failed (e.g. Ollama's breaker is open); answer without it
+                    print(f"Vector store search failed, continuing without it: {e}")
+                    metrics.increment("knowledge.vector_store.errors")
+                    if deadline is not None:
+                        deadline.degrade("vector_store_unavailable")
+                    vector_results = []
+                span.set_attribute("chatbot.knowledge.results", len(vector_results))
             if vector_results:
                 results["vector_store"] = vector_results
         
         # Search Wikipedia if enabled
-        if "wikipedia" in self.sources:
+        if use_wikipedia and "wikipedia" in self.sources:
             wiki_source = self.sources["wikipedia"]
             
-            # Search for relevant Wikipedia pages
-            wiki_titles = await wiki_source.search(query)
-            
-            if wiki_titles:
-                # Get summaries for the top results
-                summaries = []
-                for title in wiki_titles[:2]:  # Limit to top 2 results
-                    summary = await wiki_source.get_summary(title)
-                    if not summary.startswith("Error") and not summary.startswith("No Wikipedia"):
-                        summaries.append({
-                            "title": title,
-                            "summary": summary
-                        })
+            with tracer.start_as_current_span("knowledge.wikipedia") as span:
+                # Search for relevant Wikipedia pages
+                wiki_titles = await wiki_source.search(query)
                 
-                if summaries:
-                    results["wikipedia"] = summaries
+                summaries = []
+                if wiki_titles:
+                    # Get summaries for the top results
+                    for title in wiki_titles[:2]:  # Limit to top 2 results
+                        summary = await wiki_source.get_summary(title)
+                        if not summary.startswith("Error") and not summary.startswith("No Wikipedia"):
+                            summaries.append({
+                                "title": title,
+                                "summary": summary
+                            })
+                span.set_attribute("chatbot.knowledge.results", len(summaries))
+            
+            if summaries:
+                results["wikipedia"] = summaries
         
         return results
     
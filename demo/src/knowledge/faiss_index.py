@@ -0,0 +1,139 @@
+"""
+FAISS index construction and tuning helpers for the vector store.
+"""
+
+from typing import Dict, Any
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+
+def get_index_params(index_config: Dict[str, Dict[str, Any]], collection_name: str) -> Dict[str, Any]:
+    """
+    Resolve the index parameters for a collection.
+
+    Args:
+        index_config: Per-collection index configuration (see FAISS_INDEX_CONFIG)
+        collection_name: Name of the collection
+
+    Returns:
+        The "default" parameters updated with the collection's overrides
+    """
+    params = dict(index_config.get("default", {}))
+    params.update(index_config.get(collection_name, {}))
+
+    index_type = params.get("type", "flat").lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported FAISS index type: {index_type}")
+    params["type"] = index_type
+
+    return params
+
+
+def create_index(dim: int, params: Dict[str, Any], n_train: int) -> faiss.Index:
+    """
+    Create an (untrained) FAISS index for the configured type.
+
+    IVF indexes need at least one training vector per list and PQ needs at
+    least 2**pq_nbits training vectors, so small collections are scaled down
+    (fewer lists) or fall back to a simpler index rather than failing.
+
+    Args:
+        dim: Dimension of the vectors
+        params: Index parameters from get_index_params
+        n_train: Number of vectors available for training
+
+    Returns:
+        A FAISS index using L2 distance
+    """
+    index_type = params["type"]
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["hnsw_m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        return index
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+
+    # Both IVF variants cluster the training sample into nlist lists
+    nlist = min(params["nlist"], max(1, n_train))
+    if nlist < params["nlist"]:
+        print(f"Only {n_train} training vectors available, using nlist={nlist} instead of {params['nlist']}")
+    quantizer = faiss.IndexFlatL2(dim)
+
+    if index_type == "ivf_pq":
+        if dim % params["pq_m"] != 0:
+            raise ValueError(f"pq_m={params['pq_m']} must divide the vector dimension {dim}")
+        if n_train >= 2 ** params["pq_nbits"]:
+            return faiss.IndexIVFPQ(quantizer, dim, nlist, params["pq_m"], params["pq_nbits"])
+        print(f"Only {n_train} training vectors available, too few for PQ; falling back to ivf_flat")
+
+    return faiss.IndexIVFFlat(quantizer, dim, nlist)
+
+
+def train_index(index: faiss.Index, vectors: np.ndarray, params: Dict[str, Any]) -> None:
+    """
+    Train an index on a random sample of vectors if it needs training.
+
+    Args:
+        index: The FAISS index
+        vectors: Float32 array of shape (n, dim)
+        params: Index parameters from get_index_params
+    """
+    if index.is_trained:
+        return
+
+    n_sample = min(params["train_size"], len(vectors))
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), n_sample, replace=False)]
+    index.train(sample)
+
+
+def apply_search_params(index: faiss.Index, params: Dict[str, Any]) -> None:
+    """
+    Apply query-time tuning parameters (nprobe, efSearch) to an index.
+
+    Args:
+        index: The FAISS index
+        params: Index parameters from get_index_params
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = params["ef_search"]
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(params["nprobe"], index.nlist)
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """
+    Approximate the memory held by an index from its serialized size.
+
+    Args:
+        index: The FAISS index
+
+    Returns:
+        Size of the serialized index in bytes
+    """
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def index_vectors(index: faiss.Index) -> np.ndarray:
+    """
+    Reconstruct the vectors stored in an index.
+
+    Flat and HNSW indexes return the exact vectors; IVF indexes get a direct
+    map first, and PQ indexes return their (lossy) decoded codes.
+
+    Args:
+        index: The FAISS index
+
+    Returns:
+        Float32 array of shape (ntotal, dim)
+    """
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    if isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.NoMap:
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
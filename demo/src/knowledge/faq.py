@@ -0,0 +1,342 @@
+"""
+FAQ fast path: precomputed answers to the most common admissions questions.
+
+The FAQ index is built when the admissions data is loaded. Each entry maps a
+few canonical phrasings of a question to an answer templated from the
+admission facts it is based on. A query that closely matches one entry, and
+only one, is answered from the index in well under a millisecond instead of
+going through retrieval and generation; anything else falls through to the
+normal pipeline.
+
+Matching compares TF-IDF weighted word vectors of the query and each question
+variant by cosine similarity, so it needs no model and is deterministic.
+
+Rebuilding the index without reloading the vector store (from the
+repository root, like load_admissions):
+    python -m demo.src.knowledge.faq
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+import argparse
+import json
+import math
+import os
+import re
+import time
+
+from ..config import FAQ_INDEX_PATH, FAQ_MIN_SCORE, FAQ_MIN_MARGIN
+from ..utils.memory import text_bytes
+
+# Questions answered from the index; "facts" are the numbers of the admission
+# facts (as numbered in load_admissions) the answer is templated from
+FAQ_ENTRIES = [
+    {
+        "id": "deadlines",
+        "questions": [
+            "What are the application deadlines?",
+            "When is the deadline to apply?",
+            "When do I need to apply by?",
+            "What is the admission deadline for computer science?",
+            "When are applications due?"
+        ],
+        "facts": [7, 8],
+        "answer": "Application deadlines for the Bachelor of Computer Science: {facts}"
+    },
+    {
+        "id": "fall_deadline",
+        "questions": [
+            "What is the deadline for fall entry?",
+            "When is the fall application deadline?",
+            "When should I apply for the fall term?"
+        ],
+        "facts": [7],
+        "answer": "{facts}"
+    },
+    {
+        "id": "winter_deadline",
+        "questions": [
+            "What is the deadline for winter entry?",
+            "When is the winter application deadline?",
+            "When should I apply for the winter term?"
+        ],
+        "facts": [8],
+        "answer": "{facts}"
+    },
+    {
+        "id": "grade_requirements",
+        "questions": [
+            "What GPA do I need?",
+            "What GPA do I need to get into computer science?",
+            "What is the GPA requirement?",
+            "What is the minimum GPA for admission?",
+            "What grades do I need to be admitted?",
+            "What are the grade requirements for computer science?"
+        ],
+        "facts": [3, 4],
+        "answer": "Grade requirements for the Bachelor of Computer Science: {facts}"
+    },
+    {
+        "id": "graduate_requirements",
+        "questions": [
+            "What GPA do I need for a master's degree?",
+            "What are the admission requirements for graduate programs?",
+            "What is the minimum GPA for graduate studies?"
+        ],
+        "facts": [16],
+        "answer": "{facts}"
+    },
+    {
+        "id": "application_fee",
+        "questions": [
+            "What is the application fee?",
+            "How much does it cost to apply?",
+            "How much is the application fee?",
+            "Is the application fee refundable?"
+        ],
+        "facts": [24],
+        "answer": "{facts}"
+    },
+    {
+        "id": "english_proficiency",
+        "questions": [
+            "Do I need to take TOEFL or IELTS?",
+            "Is TOEFL required?",
+            "Is IELTS required?",
+            "What are the English language requirements?",
+            "Is an English proficiency test required?"
+        ],
+        "facts": [117, 118],
+        "answer": "{facts}"
+    },
+    {
+        "id": "reference_letters",
+        "questions": [
+            "How many letters of reference do I need?",
+            "How many recommendation letters are required?"
+        ],
+        "facts": [18],
+        "answer": "{facts}"
+    },
+    {
+        "id": "sat_act",
+        "questions": [
+            "Do I need SAT or ACT scores?",
+            "Are SAT scores required?",
+            "Is the ACT required for international students?"
+        ],
+        "facts": [5, 30],
+        "answer": "{facts}"
+    },
+    {
+        "id": "study_permit",
+        "questions": [
+            "Do I need a study permit?",
+            "Do international students need a CAQ?",
+            "What immigration documents do I need?"
+        ],
+        "facts": [119, 121],
+        "answer": "{facts}"
+    }
+]
+
+# Words that carry no meaning for matching questions
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "tell", "that", "the", "this",
+    "to", "was", "what", "when", "where", "which", "who", "why", "with", "you", "about",
+    "need", "should", "get", "into", "concordia", "please"
+}
+
+WORD_PATTERN = re.compile(r"\w+")
+FACT_NUMBER_PATTERN = re.compile(r"^(\d+)\.\s*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercased, lightly stemmed significant words.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of words
+    """
+    words = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        # Single letters are mostly split contractions ("what's")
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        # Fold plurals so "deadlines" matches "deadline"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def build_faq_index(facts: List[str], entries: List[Dict[str, Any]] = FAQ_ENTRIES) -> Dict[str, Any]:
+    """
+    Build the FAQ index from numbered admission facts.
+
+    Args:
+        facts: Admission fact texts, each starting with its number ("7. ...")
+        entries: FAQ entries to answer
+
+    Returns:
+        The FAQ index, ready to save or load into an FAQIndex
+
+    Raises:
+        KeyError: If an entry refers to a fact that does not exist
+    """
+    facts_by_number = {}
+    for fact in facts:
+        match = FACT_NUMBER_PATTERN.match(fact) if isinstance(fact, str) else None
+        if match:
+            facts_by_number[int(match.group(1))] = fact[match.end():]
+
+    built_entries = []
+    for entry in entries:
+        sources = [facts_by_number[number] for number in entry["facts"]]
+        built_entries.append({
+            "id": entry["id"],
+            "questions": entry["questions"],
+            "answer": entry["answer"].format(facts=" ".join(sources)),
+            "sources": sources
+        })
+
+    return {"version": 1, "created_at": time.time(), "entries": built_entries}
+
+
+def save_faq_index(index: Dict[str, Any], path: str = FAQ_INDEX_PATH) -> None:
+    """
+    Save an FAQ index, replacing the previous one atomically.
+
+    Args:
+        index: Index built by build_faq_index
+        path: Path of the index file
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging_path = f"{path}.{os.getpid()}.tmp"
+    with open(staging_path, "w") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(staging_path, path)
+
+
+class FAQIndex:
+    """
+    Matches queries against the question variants of a built FAQ index.
+    """
+
+    def __init__(self, index: Dict[str, Any], min_score: float = FAQ_MIN_SCORE, min_margin: float = FAQ_MIN_MARGIN):
+        """
+        Initialize the matcher.
+
+        Args:
+            index: Index built by build_faq_index
+            min_score: Minimum cosine similarity of a match
+            min_margin: Minimum lead of the best entry over the next best one
+        """
+        self.entries = index["entries"]
+        self.min_score = min_score
+        self.min_margin = min_margin
+
+        # Inverse document frequency of each word over all question variants
+        variants = [(entry_index, tokenize(question)) for entry_index, entry in enumerate(self.entries) for question in entry["questions"]]
+        document_counts: Dict[str, int] = {}
+        for _, words in variants:
+            for word in set(words):
+                document_counts[word] = document_counts.get(word, 0) + 1
+        self.idf = {word: math.log((1 + len(variants)) / (1 + count)) + 1 for word, count in document_counts.items()}
+        # Words never seen in a question weigh the most, so off-topic queries score low
+        self.unknown_idf = math.log(1 + len(variants)) + 1
+
+        self.variants = [(entry_index, self._vector(words)) for entry_index, words in variants]
+
+        # The index never changes once built, so its size is computed once
+        self._memory_bytes = sum(
+            text_bytes(entry["answer"]) + sum(text_bytes(source) for source in entry["sources"]) + sum(text_bytes(question) for question in entry["questions"])
+            for entry in self.entries
+        ) + sum(100 * len(vector) for _, vector in self.variants)
+
+    @classmethod
+    def load(cls, path: str = FAQ_INDEX_PATH) -> Optional["FAQIndex"]:
+        """
+        Load a saved FAQ index.
+
+        Args:
+            path: Path of the index file
+
+        Returns:
+            The matcher, or None if no index has been built
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Get the number of entries and the approximate memory held by the index."""
+        return {"entries": len(self.entries), "bytes": self._memory_bytes}
+
+    def _vector(self, words: List[str]) -> Dict[str, float]:
+        """Get the unit-length TF-IDF vector of a list of words."""
+        vector: Dict[str, float] = {}
+        for word in words:
+            vector[word] = vector.get(word, 0.0) + self.idf.get(word, self.unknown_idf)
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {word: weight / norm for word, weight in vector.items()} if norm else {}
+
+    def match(self, query: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Find the FAQ entry a query asks, if the match is confident.
+
+        Args:
+            query: The user's query
+
+        Returns:
+            Tuple of (entry, score), or None if no entry matches confidently
+        """
+        query_vector = self._vector(tokenize(query))
+        if not query_vector:
+            return None
+
+        # Best score of each entry over its question variants
+        entry_scores: Dict[int, float] = {}
+        for entry_index, vector in self.variants:
+            score = sum(weight * vector.get(word, 0.0) for word, weight in query_vector.items())
+            if score > entry_scores.get(entry_index, 0.0):
+                entry_scores[entry_index] = score
+        if not entry_scores:
+            return None
+
+        ranked = sorted(entry_scores.items(), key=lambda item: -item[1])
+        best_index, best_score = ranked[0]
+        runner_up_score = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best_score < self.min_score or best_score - runner_up_score < self.min_margin:
+            return None
+        return self.entries[best_index], best_score
+
+
+def main():
+    """Build the FAQ index from the admissions data and match a few queries."""
+    from .load_admissions import admission_texts
+
+    parser = argparse.ArgumentParser(description="Build the FAQ fast path index from the admissions data")
+    parser.add_argument("--index", default=FAQ_INDEX_PATH, help="Path of the index to build")
+    parser.add_argument("--query", action="append", default=[], help="Query to match against the new index (repeatable)")
+    args = parser.parse_args()
+
+    index = build_faq_index(admission_texts)
+    save_faq_index(index, args.index)
+    print(f"Built FAQ index with {len(index['entries'])} entries: {args.index}")
+
+    faq_index = FAQIndex(index)
+    for query in args.query:
+        start = time.perf_counter()
+        match = faq_index.match(query)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        result = f"{match[0]['id']} (score {match[1]:.2f})" if match else "no match"
+        print(f"  {query!r}: {result} ({elapsed_ms:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
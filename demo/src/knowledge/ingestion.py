@@ -0,0 +1,318 @@
+"""
+Background ingestion of documents into vector store collections.
+
+Documents submitted through the API become ingestion jobs, processed one at a
+time by a worker thread that embeds and indexes them in batches. The worker
+writes to its own copy of the collection and saves it when the job is done;
+the shared stores serving queries keep searching the previous snapshot until
+then and switch to the new one in a single swap, so ingestion never holds the
+index lock that searches take for longer than the swap itself.
+
+With several API worker processes, jobs on a FAISS collection hold the
+collection's file lock from loading it to saving it, so each job adds to the
+version saved by the previous one instead of overwriting it. Shared stores in
+the other workers pick the new version up on their next search. Each job's
+status is also written to a JSON file in INGESTION_JOBS_DIR whenever it
+changes, so a status request reaching any worker finds the job. Jobs are still
+processed by the worker that accepted them: if that process exits, its queued
+and running jobs are lost and their status files stop changing.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+import contextlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+
+from filelock import FileLock
+
+from ..config import VECTOR_DB_TYPE, INGESTION_QUEUE_SIZE, INGESTION_MAX_JOBS, INGESTION_JOBS_DIR
+from ..utils.metrics import metrics
+from ..utils.memory import text_bytes
+from .snapshot import collection_paths
+from .vector_store import VectorStore, vector_store_registry
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class IngestionJob:
+    """
+    Status and progress of one ingestion request.
+    """
+
+    def __init__(self, collection_name: str, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]):
+        """
+        Initialize a queued job.
+
+        Args:
+            collection_name: Collection the documents are added to
+            texts: Document texts
+            metadatas: Metadata dictionaries for the texts
+            ids: IDs for the texts
+        """
+        self.id = uuid.uuid4().hex
+        self.collection_name = collection_name
+        self.texts = texts
+        self.metadatas = metadatas
+        self.ids = ids
+        # Approximate memory held by the documents until the job is processed
+        self.bytes = sum(text_bytes(text) for text in texts) + sum(text_bytes(doc_id) for doc_id in ids)
+        self.status = "queued"
+        self.total = len(texts)
+        self.indexed = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the job's status, progress and throughput.
+
+        Returns:
+            Dictionary describing the job
+        """
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "collection": self.collection_name,
+            "status": self.status,
+            "total": self.total,
+            "indexed": self.indexed,
+            "progress": self.indexed / self.total if self.total else 1.0,
+            "elapsed_seconds": elapsed,
+            "documents_per_second": self.indexed / elapsed if elapsed else None,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "worker_pid": os.getpid()
+        }
+
+
+class IngestionWorker:
+    """
+    Queue of ingestion jobs processed by a single background thread.
+    """
+
+    def __init__(self, queue_size: int = INGESTION_QUEUE_SIZE, max_jobs: int = INGESTION_MAX_JOBS, jobs_dir: str = INGESTION_JOBS_DIR):
+        """
+        Initialize the worker; its thread starts with the first job.
+
+        Args:
+            queue_size: Maximum number of jobs waiting to be processed
+            max_jobs: Maximum number of jobs whose status is kept
+            jobs_dir: Directory of the job status files shared by worker processes
+        """
+        self.max_jobs = max_jobs
+        self.jobs_dir = jobs_dir
+        self._publish_lock = threading.Lock()
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: "queue.Queue[Optional[IngestionJob]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, collection_name: str, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None, ids: Optional[List[str]] = None) -> IngestionJob:
+        """
+        Queue documents to be added to a collection.
+
+        Args:
+            collection_name: Collection the documents are added to
+            texts: Document texts
+            metadatas: Optional list of metadata dictionaries
+            ids: Optional list of IDs for the texts
+
+        Returns:
+            The queued job
+
+        Raises:
+            queue.Full: If too many jobs are already waiting
+        """
+        # Generate IDs and metadata if not provided
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        if metadatas is None:
+            metadatas = [{} for _ in texts]
+
+        job = IngestionJob(collection_name, texts, metadatas, ids)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ingestion", daemon=True)
+                self._thread.start()
+            self._queue.put_nowait(job)
+            self.jobs[job.id] = job
+            self._evict()
+        self._publish(job)
+
+        metrics.increment("ingestion.jobs.queued")
+        metrics.set_gauge("ingestion.queue_depth", self._queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """
+        Get a job accepted by this process by ID.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            The job, or None if unknown or evicted
+        """
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of a job accepted by any worker process.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            The job's status as of its last change, or None if unknown or evicted
+        """
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(os.path.join(self.jobs_dir, f"{job_id}.json")) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Progress as of the last change, from the worker that has the job
+        if status["started_at"] is not None and status["finished_at"] is None:
+            status["elapsed_seconds"] = time.time() - status["started_at"]
+        return status
+
+    def stop(self) -> None:
+        """Finish the job in progress and stop the worker thread; queued jobs are dropped."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+
+        # Drop waiting jobs so the stop sentinel gets a slot
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job.status, job.error, job.finished_at = "failed", "Worker stopped", time.time()
+                self._publish(job)
+        self._queue.put(None)
+        thread.join()
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Get the number of jobs kept and the approximate memory held by their documents."""
+        with self._lock:
+            return {"entries": len(self.jobs), "bytes": sum(job.bytes for job in self.jobs.values())}
+
+    def _evict(self) -> None:
+        """Forget the oldest finished jobs beyond the bound, with their status files."""
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if self.jobs[job_id].status in ("succeeded", "failed"):
+                del self.jobs[job_id]
+                try:
+                    os.remove(os.path.join(self.jobs_dir, f"{job_id}.json"))
+                except FileNotFoundError:
+                    pass
+
+    def _publish(self, job: IngestionJob) -> None:
+        """
+        Write a job's status file for the other worker processes.
+
+        The file is replaced rather than rewritten, so readers never see a
+        partial one. Failing to write it does not fail the job.
+
+        Args:
+            job: The job whose status changed
+        """
+        path = os.path.join(self.jobs_dir, f"{job.id}.json")
+        staging_file = f"{path}.{os.getpid()}.tmp"
+        try:
+            # Serialized, so the last file written has the latest status
+            with self._publish_lock:
+                os.makedirs(self.jobs_dir, exist_ok=True)
+                with open(staging_file, "w") as f:
+                    json.dump(job.to_dict(), f)
+                os.replace(staging_file, path)
+        except OSError as e:
+            print(f"Could not write the status of ingestion job {job.id}: {e}")
+
+    def _run(self) -> None:
+        """Process queued jobs until stopped."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            metrics.set_gauge("ingestion.queue_depth", self._queue.qsize())
+            self._process(job)
+
+    def _process(self, job: IngestionJob) -> None:
+        """
+        Embed and index a job's documents, then publish the new snapshot.
+
+        Args:
+            job: The job to process
+        """
+        job.status = "running"
+        job.started_at = time.time()
+        self._publish(job)
+        store = None
+        try:
+            # Jobs in other worker processes wait until this one has saved
+            lock = contextlib.nullcontext()
+            if VECTOR_DB_TYPE.lower() == "faiss":
+                lock_file = collection_paths(job.collection_name)["lock"]
+                os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+                lock = FileLock(lock_file)
+            with lock:
+                # A private writable copy of the latest saved version; shared
+                # stores keep serving the saved snapshot
+                store = VectorStore(collection_name=job.collection_name)
+                try:
+                    for start, end in store._batch_bounds(job.total):
+                        store._add_batch(job.texts[start:end], job.metadatas[start:end], job.ids[start:end])
+                        job.indexed = end
+                        metrics.increment("ingestion.documents", end - start)
+                        self._publish(job)
+                finally:
+                    # Saved once per job; batches indexed before a failure are kept, as with add_texts
+                    store.save()
+
+            # Switch this process's shared store to the new snapshot
+            vector_store_registry.refresh(job.collection_name)
+            job.status = "succeeded"
+        except Exception as e:
+            print(f"Ingestion job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            # Release the texts; only the job's status is kept
+            job.texts = job.metadatas = job.ids = []
+            job.bytes = 0
+            if store is not None:
+                store.close()
+            self._publish(job)
+
+        metrics.increment(f"ingestion.jobs.{job.status}")
+        metrics.observe("ingestion.job_seconds", job.finished_at - job.started_at)
+        print(f"Ingestion job {job.id} {job.status}: {job.indexed}/{job.total} documents into {job.collection_name}")
+
+
+# Worker shared by the API in the process
+ingestion_worker = IngestionWorker()
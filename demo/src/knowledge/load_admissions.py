@@ -11,6 +11,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.append(project_root)
 
 from demo.src.knowledge.vector_store import VectorStore
+from demo.src.knowledge.faq import build_faq_index, save_faq_index
 
 # Admission information
 admission_texts = [
@@ -329,6 +330,11 @@ async def load_admissions_data():
     await admissions_store.add_texts(admission_texts, metadatas=metadatas)
     
     print(f"Successfully loaded {len(admission_texts)} admission entries into the vector database.")
+    
+    # Precompute the answers to the most common questions from the same facts
+    faq_index = build_faq_index(admission_texts)
+    save_faq_index(faq_index)
+    print(f"Built the FAQ index with {len(faq_index['entries'])} entries.")
 
 if __name__ == "__main__":
     asyncio.run(load_admissions_data()) 
\ No newline at end of file
@@ -0,0 +1,309 @@
+"""
+Local Wikipedia index: offline search over a Wikipedia abstracts dump.
+
+The index is a SQLite database holding one row per article (title, abstract,
+URL) and an FTS5 full-text index over titles and abstracts, ranked with BM25.
+LocalWikipediaSource has the same interface as WikipediaSource, so the
+knowledge enhancer uses it in place of live lookups when the Wikipedia source
+runs in "offline" mode.
+
+Building the index (from the demo directory) streams the dump, so memory use
+does not grow with its size:
+    python -m src.knowledge.local_wikipedia enwiki-latest-abstract.xml.gz
+
+Dumps are https://dumps.wikimedia.org/<wiki>/latest/<wiki>-latest-abstract.xml
+(plain, .gz or .bz2), or JSON lines with "title", "abstract" and optional "url".
+"""
+
+from typing import List, Optional, Iterator, Tuple
+import argparse
+import asyncio
+import bz2
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+
+from ..config import KNOWLEDGE_SOURCES
+
+SCHEMA = """
+CREATE TABLE articles (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    abstract TEXT NOT NULL,
+    url TEXT
+);
+CREATE VIRTUAL TABLE articles_fts USING fts5(
+    title, abstract, content='articles', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+# Title matches count more than abstract matches
+TITLE_WEIGHT = 10.0
+
+# Words too common to narrow a full-text search
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "me", "of", "on", "or", "tell", "that", "the", "this",
+    "to", "was", "what", "when", "where", "which", "who", "why", "with", "you", "about"
+}
+
+WORD_PATTERN = re.compile(r"\w+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Abstracts dump titles are prefixed with "Wikipedia: "
+DUMP_TITLE_PREFIX = "Wikipedia: "
+
+
+def open_dump(path: str):
+    """Open a plain, gzip or bzip2 compressed dump for streaming."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_abstracts(path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Stream (title, abstract, url) records from an abstracts dump.
+
+    Args:
+        path: Path of an abstracts XML dump or a JSON lines file
+
+    Yields:
+        Tuple of (title, abstract, URL or None) per article with an abstract
+    """
+    with open_dump(path) as f:
+        if ".json" in os.path.basename(path):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["title"], record["abstract"], record.get("url")
+            return
+
+        # Clear each <doc> once read so the parsed tree never holds the whole dump
+        for _, element in ElementTree.iterparse(f, events=("end",)):
+            if element.tag != "doc":
+                continue
+            title = element.findtext("title") or ""
+            abstract = (element.findtext("abstract") or "").strip()
+            url = element.findtext("url")
+            element.clear()
+            if title.startswith(DUMP_TITLE_PREFIX):
+                title = title[len(DUMP_TITLE_PREFIX):]
+            # Skip redirects, disambiguation stubs and section-only abstracts
+            if title and abstract and not abstract.startswith("|"):
+                yield title, abstract, url
+
+
+def build_index(dump_path: str, index_path: str, batch_size: int = 10000) -> int:
+    """
+    Build a local Wikipedia index from a dump.
+
+    The index is written next to the target and moved into place when
+    complete, so a running source keeps reading the previous index meanwhile.
+
+    Args:
+        dump_path: Path of the abstracts dump
+        index_path: Path of the SQLite index to create or replace
+        batch_size: Number of articles inserted per batch
+
+    Returns:
+        Number of articles indexed
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    build_path = f"{index_path}.building"
+    if os.path.exists(build_path):
+        os.remove(build_path)
+
+    connection = sqlite3.connect(build_path)
+    try:
+        # Nothing to recover if the build fails, so skip the journal
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+
+        batch: List[Tuple[str, str, Optional[str]]] = []
+        for record in iter_abstracts(dump_path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                connection.executemany("INSERT OR IGNORE INTO articles (title, abstract, url) VALUES (?, ?, ?)", batch)
+                batch.clear()
+        if batch:
+            connection.executemany("INSERT OR IGNORE INTO articles (title, abstract, url) VALUES (?, ?, ?)", batch)
+
+        # Index all rows in one pass, then merge the index segments
+        connection.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+        connection.execute("INSERT INTO articles_fts (articles_fts) VALUES ('optimize')")
+        connection.commit()
+        count = connection.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    finally:
+        connection.close()
+
+    os.replace(build_path, index_path)
+    return count
+
+
+def to_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query matching any of its significant words.
+
+    Args:
+        query: The search query
+
+    Returns:
+        The FTS5 MATCH expression, or None if the query has no significant words
+    """
+    words = [word for word in WORD_PATTERN.findall(query.lower()) if word not in STOPWORDS]
+    if not words:
+        return None
+    # Quoting keeps FTS5 operators and column filters in user text from being interpreted
+    return " OR ".join(f'"{word}"' for word in dict.fromkeys(words))
+
+
+class LocalWikipediaSource:
+    """
+    Knowledge source that retrieves Wikipedia abstracts from a local index.
+    """
+
+    def __init__(self, index_path: Optional[str] = None):
+        """
+        Initialize the local Wikipedia source.
+
+        Args:
+            index_path: Path of the SQLite index (the configured one if not given)
+
+        Raises:
+            FileNotFoundError: If the index has not been built
+        """
+        self.index_path = index_path or KNOWLEDGE_SOURCES["wikipedia"]["local_index_path"]
+        if not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"Local Wikipedia index not found: {self.index_path}")
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's read-only connection to the index."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.connection = connection
+        return connection
+
+    def search_sync(self, query: str, results_limit: int = 5) -> List[str]:
+        """
+        Search the index for relevant articles.
+
+        Args:
+            query: The search query
+            results_limit: Maximum number of search results to return
+
+        Returns:
+            List of article titles, best match first
+        """
+        match_query = to_match_query(query)
+        if match_query is None:
+            return []
+        rows = self._connection().execute(
+            "SELECT title FROM articles_fts WHERE articles_fts MATCH ? "
+            "ORDER BY bm25(articles_fts, ?, 1.0) LIMIT ?",
+            (match_query, TITLE_WEIGHT, results_limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_abstract(self, title: str) -> Optional[str]:
+        """
+        Get the abstract of an article.
+
+        Args:
+            title: Article title (case-insensitive)
+
+        Returns:
+            The abstract, or None if the article is not in the index
+        """
+        row = self._connection().execute("SELECT abstract FROM articles WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+
+    async def search(self, query: str, results_limit: int = 5) -> List[str]:
+        """
+        Search the index for relevant Wikipedia pages.
+
+        Args:
+            query: The search query
+            results_limit: Maximum number of search results to return
+
+        Returns:
+            List of page titles
+        """
+        try:
+            return await asyncio.to_thread(self.search_sync, query, results_limit)
+        except sqlite3.Error as e:
+            print(f"Error searching the local Wikipedia index: {e}")
+            return []
+
+    async def get_summary(self, title: str, sentences: int = 3) -> str:
+        """
+        Get a summary of a Wikipedia page.
+
+        Args:
+            title: The title of the Wikipedia page
+            sentences: Number of sentences to include in the summary
+
+        Returns:
+            Summary text
+        """
+        try:
+            abstract = await asyncio.to_thread(self.get_abstract, title)
+        except sqlite3.Error as e:
+            return f"Error retrieving Wikipedia summary: {e}"
+        if abstract is None:
+            return f"No Wikipedia page found for '{title}'"
+        return " ".join(SENTENCE_END.split(abstract)[:sentences])
+
+    async def get_content(self, title: str) -> str:
+        """
+        Get the content of a Wikipedia page; the index only holds abstracts.
+
+        Args:
+            title: The title of the Wikipedia page
+
+        Returns:
+            The page abstract
+        """
+        try:
+            abstract = await asyncio.to_thread(self.get_abstract, title)
+        except sqlite3.Error as e:
+            return f"Error retrieving Wikipedia content: {e}"
+        return abstract if abstract is not None else f"No Wikipedia page found for '{title}'"
+
+
+def main():
+    """Parse arguments, build the index and time a few lookups."""
+    parser = argparse.ArgumentParser(description="Build the local Wikipedia index from an abstracts dump")
+    parser.add_argument("dump", help="Abstracts dump (.xml, .xml.gz, .xml.bz2) or JSON lines file")
+    parser.add_argument("--index", default=KNOWLEDGE_SOURCES["wikipedia"]["local_index_path"], help="Path of the index to build")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Articles inserted per batch")
+    parser.add_argument("--query", action="append", default=[], help="Query to time against the new index (repeatable)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = build_index(args.dump, args.index, args.batch_size)
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(args.index) / (1024 * 1024)
+    print(f"Indexed {count} articles into {args.index} ({size_mb:.1f} MB) in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} articles/s)")
+
+    source = LocalWikipediaSource(args.index)
+    for query in args.query:
+        start = time.perf_counter()
+        titles = source.search_sync(query)
+        summaries = [source.get_abstract(title) for title in titles[:2]]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"  {query!r}: {titles} ({len(summaries)} summaries, {elapsed_ms:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Micro-batching of concurrent similarity searches.
+"""
+
+from typing import List, Dict, Any, Callable, Awaitable
+import asyncio
+import time
+
+from ..utils.metrics import metrics
+
+class SearchBatcher:
+    """
+    Collects similarity searches arriving within a short window and runs them
+    as one batch: one embedding call and one matrix search for all queries.
+    """
+
+    def __init__(self, search_batch: Callable[[List[str], List[int]], Awaitable[List[List[Dict[str, Any]]]]], window_ms: float, max_batch_size: int, name: str = "default"):
+        """
+        Initialize the search batcher.
+
+        Args:
+            search_batch: Coroutine function searching a list of queries with their k values
+            window_ms: How long the first query of a batch waits for others
+            max_batch_size: Batch size that triggers an immediate flush
+            name: Name used in metric names (usually the collection name)
+        """
+        self.search_batch = search_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self.pending: List[Dict[str, Any]] = []
+        self._flush_handle = None
+
+    async def search(self, query: str, k: int) -> List[Dict[str, Any]]:
+        """
+        Queue a search and wait for its batch to complete.
+
+        Args:
+            query: Query text
+            k: Number of results to return
+
+        Returns:
+            List of dictionaries containing text and metadata
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append({"query": query, "k": k, "future": future, "queued_at": time.perf_counter()})
+
+        if len(self.pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Start searching the pending batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        Search a batch and hand each caller its results.
+
+        Args:
+            batch: Pending searches
+        """
+        # Callers that were cancelled while queued are dropped from the batch
+        batch = [item for item in batch if not item["future"].done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        metrics.observe(f"search_batcher.batch_size.{self.name}", len(batch))
+        for item in batch:
+            metrics.observe(f"search_batcher.queue_delay_ms.{self.name}", (started - item["queued_at"]) * 1000)
+
+        try:
+            results = await self.search_batch([item["query"] for item in batch], [item["k"] for item in batch])
+        except Exception as e:
+            for item in batch:
+                if not item["future"].done():
+                    item["future"].set_exception(e)
+            return
+
+        for item, result in zip(batch, results):
+            if not item["future"].done():
+                item["future"].set_result(result)
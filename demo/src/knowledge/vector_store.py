@@ -3,29 +3,85 @@ Vector store implementation for storing and retrieving embeddings.
 """
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import uuid
-import sys
+import threading
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
-# Add the parent directory to the Python path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ..config import (
+    VECTOR_DB_TYPE,
+    VECTOR_DB_PATH,
+    OLLAMA_BASE_URL,
+    EMBEDDING_MODEL,
+    FAISS_INDEX_CONFIG,
+    VECTOR_STORE_WORKERS,
+    VECTOR_STORE_BATCH_SIZE,
+    VECTOR_INDEX_MMAP,
+    VECTOR_SNAPSHOT_DTYPE,
+    VECTOR_STORE_REFRESH_SECONDS,
+    VECTOR_SEARCH_BATCHING,
+    VECTOR_SEARCH_BATCH_WINDOW_MS,
+    VECTOR_SEARCH_MAX_BATCH_SIZE
+)
+from ..utils.metrics import metrics
+from ..utils.circuit_breaker import get_circuit_breaker
+from ..utils.hedging import get_hedger
+from .search_batcher import SearchBatcher
 
-# Import based on configured vector DB type
-from config import VECTOR_DB_TYPE, VECTOR_DB_PATH
+# Dedicated thread pool for embedding and index operations, so they never run
+# on the event loop thread or compete with the default executor
+_vector_executor = ThreadPoolExecutor(max_workers=VECTOR_STORE_WORKERS, thread_name_prefix="vector-store")
+
+async def run_in_vector_executor(func, *args):
+    """
+    Run a blocking vector store operation on the vector store thread pool.
+    
+    Cancelling the awaiting task stops waiting immediately; an operation that
+    has not started yet is dropped, one that is already running completes in
+    the background.
+    
+    Args:
+        func: The blocking function to run
+        *args: Arguments for the function
+        
+    Returns:
+        The function's result
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_vector_executor, functools.partial(func, *args))
 
 class VectorStore:
     """
     Vector database for storing and retrieving document embeddings.
     """
     
-    def __init__(self, collection_name: str = "default"):
+    def __init__(self, collection_name: str = "default", read_only: bool = False):
         """
         Initialize the vector store.
         
         Args:
             collection_name: Name of the collection to use
+            read_only: Whether adding texts is disallowed (for shared stores)
         """
         self.collection_name = collection_name
+        self.read_only = read_only
+        self._memory_bytes = None
+        self._index_lock = threading.Lock()
+        self._next_refresh_check = 0.0
+        self._unsaved = False  # Batches added since the collection was last saved
+        
+        # Concurrent unfiltered searches are collected into batches
+        self.search_batcher = None
+        if VECTOR_SEARCH_BATCHING:
+            self.search_batcher = SearchBatcher(
+                self._similarity_search_batch_async,
+                window_ms=VECTOR_SEARCH_BATCH_WINDOW_MS,
+                max_batch_size=VECTOR_SEARCH_MAX_BATCH_SIZE,
+                name=collection_name
+            )
         self.db = None
         self.collection = None
         
@@ -65,51 +121,303 @@ class VectorStore:
     def _init_faiss(self):
         """Initialize FAISS."""
         try:
-            import faiss
-            import pickle
+            from .faiss_index import get_index_params
+            from .snapshot import collection_paths
             
             self.faiss_dir = os.path.join(VECTOR_DB_PATH, "faiss")
             os.makedirs(self.faiss_dir, exist_ok=True)
             
-            self.index_file = os.path.join(self.faiss_dir, f"{self.collection_name}_index.faiss")
-            self.metadata_file = os.path.join(self.faiss_dir, f"{self.collection_name}_metadata.pkl")
+            paths = collection_paths(self.collection_name)
+            self.index_file = paths["index"]
+            self.snapshot_dir = paths["snapshot"]
+            self.metadata_file = paths["pickle"]
+            self.lock_file = paths["lock"]
+            self.index_params = get_index_params(FAISS_INDEX_CONFIG, self.collection_name)
+            self.embeddings = None
             
             # Load existing index or create new one
-            if os.path.exists(self.index_file) and os.path.exists(self.metadata_file):
-                self.index = faiss.read_index(self.index_file)
-                with open(self.metadata_file, 'rb') as f:
-                    self.metadata = pickle.load(f)
+            self.version = self._saved_version()
+            loaded = self._load_faiss_files()
+            if loaded is not None:
+                self.index, self.metadata = loaded
                 print(f"Loaded existing FAISS index: {self.collection_name}")
             else:
-                # Create a new index - using L2 distance
-                self.index = faiss.IndexFlatL2(1536)  # Default dimension for many embedding models
+                # The index is created on the first add, once the embedding
+                # dimension and a training sample are known
+                self.index = None
                 self.metadata = {"ids": [], "texts": [], "metadatas": []}
-                print(f"Created new FAISS index: {self.collection_name}")
+                print(f"Created new FAISS index: {self.collection_name} ({self.index_params['type']})")
         except Exception as e:
             print(f"Error initializing FAISS: {e}")
             raise
     
-    async def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None, ids: Optional[List[str]] = None) -> List[str]:
+    def _load_faiss_files(self) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """
+        Load the collection's FAISS index and metadata from disk.
+        
+        Returns:
+            Tuple of (index, metadata), or None if the collection has not been saved
+        """
+        import faiss
+        from .faiss_index import apply_search_params
+        from .snapshot import load_snapshot
+        
+        has_snapshot = os.path.exists(self.snapshot_dir)
+        if not os.path.exists(self.index_file) or not (has_snapshot or os.path.exists(self.metadata_file)):
+            return None
+        
+        if self.read_only and VECTOR_INDEX_MMAP:
+            # Shared stores map the index so worker processes share its pages
+            index = faiss.read_index(self.index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        else:
+            index = faiss.read_index(self.index_file)
+        apply_search_params(index, self.index_params)
+        
+        if has_snapshot:
+            # Records are decoded from the mapped snapshot as they are read
+            metadata = load_snapshot(self.snapshot_dir)
+        else:
+            # Collections saved before snapshots; rewritten as a snapshot on the next save
+            import pickle
+            with open(self.metadata_file, 'rb') as f:
+                metadata = pickle.load(f)
+        return index, metadata
+    
+    def reload(self) -> bool:
+        """
+        Switch to the collection's latest saved index and metadata.
+        
+        The new files are loaded first and swapped in under the index lock, so
+        searches keep using the previous snapshot until the swap and never see
+        a mix of the two.
+        
+        Returns:
+            True if a saved collection was loaded
+        """
+        if VECTOR_DB_TYPE.lower() != "faiss":
+            return False
+        
+        # Taken before loading: if the files change meanwhile, the next check reloads again
+        version = self._saved_version()
+        loaded = self._load_faiss_files()
+        if loaded is None:
+            return False
+        with self._index_lock:
+            self.index, self.metadata = loaded
+            self.version = version
+            self._memory_bytes = None
+        return True
+    
+    def _saved_version(self) -> Optional[Tuple[int, int]]:
+        """
+        Identify the collection's saved index file.
+        
+        The file is replaced, never rewritten, on each save, so its inode and
+        modification time change whenever any process saves the collection.
+        
+        Returns:
+            Tuple of (inode, modification time in ns), or None if not saved yet
+        """
+        try:
+            stat = os.stat(self.index_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+    
+    def _refresh_due(self) -> bool:
+        """Check whether a shared FAISS store should look for a newer saved version now."""
+        if not self.read_only or VECTOR_DB_TYPE.lower() != "faiss":
+            return False
+        now = time.monotonic()
+        if now < self._next_refresh_check:
+            return False
+        self._next_refresh_check = now + VECTOR_STORE_REFRESH_SECONDS
+        return True
+    
+    def refresh_if_changed(self) -> bool:
+        """
+        Reload the collection if it was saved since it was loaded, e.g. by an
+        ingestion job in another worker process.
+        
+        Returns:
+            True if a newer version was loaded
+        """
+        if self._saved_version() == self.version:
+            return False
+        if not self.reload():
+            return False
+        metrics.increment(f"vector_store.refreshes.{self.collection_name}")
+        print(f"Reloaded vector store collection {self.collection_name} saved by another process")
+        return True
+    
+    def _embed(self, texts: List[str], hedge: bool = False):
+        """
+        Embed texts for the FAISS index.
+        
+        Args:
+            texts: List of text strings to embed
+            hedge: Whether to hedge the call if it is slow (for query embeddings,
+                whose latency is comparable from call to call)
+            
+        Returns:
+            Float32 array of shape (len(texts), dim)
+        """
+        import numpy as np
+        
+        if self.embeddings is None:
+            from langchain_ollama import OllamaEmbeddings
+            self.embeddings = OllamaEmbeddings(base_url=OLLAMA_BASE_URL, model=EMBEDDING_MODEL)
+        
+        # Embedding goes through the Ollama server's breaker so searches fail fast while it is down
+        breaker = get_circuit_breaker(f"ollama:{self.embeddings.base_url}")
+        if hedge:
+            vectors = get_hedger("embeddings").call_sync(lambda: breaker.call_sync(self.embeddings.embed_documents, texts))
+        else:
+            vectors = breaker.call_sync(self.embeddings.embed_documents, texts)
+        return np.asarray(vectors, dtype=np.float32)
+    
+    def memory_bytes(self) -> int:
+        """
+        Approximate the memory held by this store's index and metadata.
+        
+        Returns:
+            Approximate size in bytes (0 for ChromaDB, which manages its own memory)
+        """
+        if VECTOR_DB_TYPE.lower() != "faiss" or self.index is None:
+            return 0
+        
+        # Computed once per change, since serializing a large index is not cheap
+        if self._memory_bytes is None:
+            from .faiss_index import index_memory_bytes
+            
+            from .snapshot import is_mapped
+            
+            if is_mapped(self.metadata):
+                # Mapped columns are shared through the page cache, not held per store
+                metadata_bytes = sum(self.metadata[column].nbytes for column in ("ids", "texts", "metadatas"))
+            else:
+                # Python str objects carry ~50 bytes of overhead on top of their text
+                text_bytes = sum(len(text) + 50 for text in self.metadata["texts"])
+                id_bytes = sum(len(doc_id) + 50 for doc_id in self.metadata["ids"])
+                metadata_bytes = text_bytes + id_bytes + sum(64 + 100 * len(metadata) for metadata in self.metadata["metadatas"])
+            self._memory_bytes = index_memory_bytes(self.index) + metadata_bytes
+        
+        return self._memory_bytes
+    
+    def close(self) -> None:
+        """Release the index and metadata held by this store."""
+        self.index = None
+        self._memory_bytes = None
+        self.metadata = {"ids": [], "texts": [], "metadatas": []}
+        self.collection = None
+        self.db = None
+    
+    def save(self) -> bool:
+        """
+        Persist the batches added since the last save.
+        
+        Each save rewrites the collection's whole snapshot, so callers adding
+        texts in several calls should save once, after the last one.
+        
+        Returns:
+            True if the collection was written (ChromaDB persists as it goes)
+        """
+        if VECTOR_DB_TYPE.lower() != "faiss" or not self._unsaved:
+            return False
+        self._save_faiss()
+        return True
+    
+    def _save_faiss(self):
+        """Persist the FAISS index and a snapshot of its vectors and metadata to disk."""
+        import faiss
+        from .faiss_index import index_vectors
+        from .snapshot import write_snapshot
+        
+        with self._index_lock:
+            # Files are replaced, never rewritten in place, since other stores
+            # may have them mapped. The snapshot goes first: records are only
+            # appended, so an older index still matches a newer snapshot.
+            write_snapshot(self.snapshot_dir, self.metadata, index_vectors(self.index), VECTOR_SNAPSHOT_DTYPE)
+            staging_file = f"{self.index_file}.{os.getpid()}.tmp"
+            faiss.write_index(self.index, staging_file)
+            os.replace(staging_file, self.index_file)
+            if os.path.exists(self.metadata_file):
+                os.remove(self.metadata_file)
+            self.version = self._saved_version()
+            self._unsaved = False
+    
+    async def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None, ids: Optional[List[str]] = None, save: bool = True) -> List[str]:
         """
         Add texts to the vector store.
         
+        Texts are embedded and indexed in batches on the vector store thread
+        pool, so a large ingestion does not block the event loop and can be
+        cancelled between batches. Batches added before a cancellation are kept.
+        
         Args:
             texts: List of text strings to add
             metadatas: Optional list of metadata dictionaries
             ids: Optional list of IDs for the texts
+            save: Whether to save the collection when done; pass False to
+                every call but the last when adding texts in several calls
             
         Returns:
             List of IDs for the added texts
         """
-        if VECTOR_DB_TYPE.lower() == "chroma":
-            # Generate IDs if not provided
-            if ids is None:
-                ids = [str(uuid.uuid4()) for _ in texts]
-            
-            # Ensure metadatas is a list of the same length as texts
-            if metadatas is None:
-                metadatas = [{} for _ in texts]
+        if self.read_only:
+            raise RuntimeError(f"Vector store collection {self.collection_name} is opened read-only")
+        
+        # Generate IDs if not provided
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        
+        # Ensure metadatas is a list of the same length as texts
+        if metadatas is None:
+            metadatas = [{} for _ in texts]
+        
+        try:
+            for start, end in self._batch_bounds(len(texts)):
+                await run_in_vector_executor(self._add_batch, texts[start:end], metadatas[start:end], ids[start:end])
+        finally:
+            if save:
+                await run_in_vector_executor(self.save)
+        
+        print(f"Added {len(texts)} texts to {VECTOR_DB_TYPE} collection: {self.collection_name}")
+        return ids
+    
+    def _batch_bounds(self, count: int) -> List[Tuple[int, int]]:
+        """
+        Split a number of texts to add into (start, end) batches.
+        
+        Args:
+            count: Number of texts to add
             
+        Returns:
+            List of (start, end) slice bounds
+        """
+        # The first batch into a new FAISS index also trains it, so it gets the whole training sample
+        batch_size = VECTOR_STORE_BATCH_SIZE
+        if VECTOR_DB_TYPE.lower() == "faiss" and self.index is None:
+            batch_size = max(batch_size, self.index_params["train_size"])
+        
+        bounds = []
+        start = 0
+        while start < count:
+            end = min(start + batch_size, count)
+            bounds.append((start, end))
+            start, batch_size = end, VECTOR_STORE_BATCH_SIZE
+        return bounds
+    
+    def _add_batch(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> None:
+        """
+        Add one batch of texts synchronously (runs on the vector store thread pool).
+        
+        Args:
+            texts: Text strings to add
+            metadatas: Metadata dictionaries for the texts
+            ids: IDs for the texts
+        """
+        if VECTOR_DB_TYPE.lower() == "chroma":
             # Add documents to ChromaDB
             self.collection.add(
                 documents=texts,
@@ -117,17 +425,40 @@ class VectorStore:
                 ids=ids
             )
             
-            print(f"Added {len(texts)} texts to ChromaDB collection: {self.collection_name}")
-            return ids
-            
         elif VECTOR_DB_TYPE.lower() == "faiss":
-            # FAISS implementation would go here
-            pass
+            from .faiss_index import create_index, train_index, apply_search_params
+            from .snapshot import is_mapped, materialize
+            
+            # Embed outside the lock so searches are not held up by it
+            vectors = self._embed(texts)
+            
+            with self._index_lock:
+                # A mapped snapshot is read-only; decode it once to append to it
+                if is_mapped(self.metadata):
+                    self.metadata = materialize(self.metadata)
+                
+                # Build and train the configured index type on the first batch
+                if self.index is None:
+                    self.index = create_index(vectors.shape[1], self.index_params, len(vectors))
+                    apply_search_params(self.index, self.index_params)
+                train_index(self.index, vectors, self.index_params)
+                
+                self.index.add(vectors)
+                self.metadata["ids"].extend(ids)
+                self.metadata["texts"].extend(texts)
+                self.metadata["metadatas"].extend(metadatas)
+                self._memory_bytes = None
+                self._unsaved = True
     
     async def similarity_search(self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Search for similar texts in the vector store.
         
+        The query embedding and search run on the vector store thread pool.
+        Unfiltered searches go through the micro-batcher when it is enabled.
+        Shared stores first check, at most every VECTOR_STORE_REFRESH_SECONDS,
+        whether another process saved a newer version of the collection.
+        
         Args:
             query: Query text
             k: Number of results to return
@@ -136,25 +467,210 @@ class VectorStore:
         Returns:
             List of dictionaries containing text and metadata
         """
+        # Pick up versions of the collection saved by other worker processes
+        if self._refresh_due():
+            await run_in_vector_executor(self.refresh_if_changed)
+        
+        if self.search_batcher is not None and where is None:
+            return await self.search_batcher.search(query, k)
+        
+        results = await run_in_vector_executor(self._similarity_search_batch, [query], [k], [where])
+        return results[0]
+    
+    async def _similarity_search_batch_async(self, queries: List[str], ks: List[int]) -> List[List[Dict[str, Any]]]:
+        """Search a batch of unfiltered queries on the vector store thread pool."""
+        return await run_in_vector_executor(self._similarity_search_batch, queries, ks, [None] * len(queries))
+    
+    def _similarity_search_batch(self, queries: List[str], ks: List[int], wheres: List[Optional[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """
+        Search for similar texts for several queries synchronously (runs on the vector store thread pool).
+        
+        All queries are embedded in one call and searched as one matrix.
+        
+        Args:
+            queries: Query texts
+            ks: Number of results to return for each query
+            wheres: Optional filter conditions for each query
+            
+        Returns:
+            List of results for each query
+        """
         if VECTOR_DB_TYPE.lower() == "chroma":
-            # Perform similarity search in ChromaDB
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=k,
-                where=where
-            )
+            # ChromaDB takes one filter per call, so only unfiltered queries share a call
+            if any(wheres):
+                return [self._query_chroma([query], k, where)[0] for query, k, where in zip(queries, ks, wheres)]
+            return [results[:k] for results, k in zip(self._query_chroma(queries, max(ks), None), ks)]
+            
+        elif VECTOR_DB_TYPE.lower() == "faiss":
+            if self.index is None or self.index.ntotal == 0:
+                return [[] for _ in queries]
+            
+            query_vectors = self._embed(queries, hedge=True)
+            
+            with self._index_lock:
+                # Over-fetch when filtering, since the filter is applied after the search
+                n_results = min(max(k * 4 if where else k for k, where in zip(ks, wheres)), self.index.ntotal)
+                distances, indices = self.index.search(query_vectors, n_results)
+                
+                return [
+                    self._format_faiss_results(distances[i], indices[i], ks[i], wheres[i])
+                    for i in range(len(queries))
+                ]
+    
+    def _query_chroma(self, queries: List[str], k: int, where: Optional[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Query ChromaDB and format the results.
+        
+        Args:
+            queries: Query texts
+            k: Number of results to return per query
+            where: Optional filter conditions for metadata
             
-            # Format results
+        Returns:
+            List of results for each query
+        """
+        # Perform similarity search in ChromaDB
+        results = self.collection.query(
+            query_texts=queries,
+            n_results=k,
+            where=where
+        )
+        
+        # Format results
+        all_results = []
+        for q in range(len(queries)):
             formatted_results = []
-            for i in range(len(results['ids'][0])):
+            for i in range(len(results['ids'][q])):
                 formatted_results.append({
-                    'text': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i]
+                    'text': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'distance': results['distances'][q][i]
                 })
+            all_results.append(formatted_results)
+        
+        return all_results
+    
+    def _format_faiss_results(self, distances, indices, k: int, where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Format one query's FAISS results, applying the metadata filter.
+        
+        Args:
+            distances: Distances returned for the query
+            indices: Index positions returned for the query
+            k: Number of results to return
+            where: Optional filter conditions for metadata
             
-            return formatted_results
+        Returns:
+            List of dictionaries containing text and metadata
+        """
+        formatted_results = []
+        for distance, idx in zip(distances, indices):
+            if idx < 0:
+                continue
+            metadata = self.metadata["metadatas"][idx]
+            if where and any(metadata.get(key) != value for key, value in where.items()):
+                continue
+            formatted_results.append({
+                'text': self.metadata["texts"][idx],
+                'metadata': metadata,
+                'distance': float(distance)
+            })
+            if len(formatted_results) >= k:
+                break
+        
+        return formatted_results
+
+class VectorStoreRegistry:
+    """
+    Process-wide registry that opens each collection once and shares it.
+    
+    Stores handed out by the registry are read-only and reference counted;
+    a collection is closed when its last reference is released.
+    """
+    
+    def __init__(self):
+        """Initialize the registry."""
+        self._lock = threading.Lock()
+        self.stores: Dict[str, VectorStore] = {}
+        self.ref_counts: Dict[str, int] = {}
+    
+    def acquire(self, collection_name: str) -> VectorStore:
+        """
+        Get the shared store for a collection, opening it on first use.
+        
+        Args:
+            collection_name: Name of the collection
             
-        elif VECTOR_DB_TYPE.lower() == "faiss":
-            # FAISS implementation would go here
-            pass
+        Returns:
+            The shared, read-only vector store
+        """
+        with self._lock:
+            if collection_name not in self.stores:
+                self.stores[collection_name] = VectorStore(collection_name=collection_name, read_only=True)
+                self.ref_counts[collection_name] = 0
+            self.ref_counts[collection_name] += 1
+            self._update_metrics(collection_name)
+            return self.stores[collection_name]
+    
+    def release(self, store: VectorStore) -> None:
+        """
+        Release a reference to a shared store, closing it if unreferenced.
+        
+        Args:
+            store: A store previously returned by acquire
+        """
+        with self._lock:
+            collection_name = store.collection_name
+            if self.stores.get(collection_name) is not store:
+                return
+            
+            self.ref_counts[collection_name] -= 1
+            if self.ref_counts[collection_name] <= 0:
+                store.close()
+                del self.stores[collection_name]
+                del self.ref_counts[collection_name]
+                print(f"Closed unreferenced vector store collection: {collection_name}")
+            self._update_metrics(collection_name)
+    
+    def refresh(self, collection_name: str) -> bool:
+        """
+        Switch the shared store of a collection, if open, to its latest saved state.
+        
+        Args:
+            collection_name: Name of the collection
+            
+        Returns:
+            True if an open store was refreshed
+        """
+        with self._lock:
+            store = self.stores.get(collection_name)
+        if store is None or not store.reload():
+            return False
+        with self._lock:
+            self._update_metrics(collection_name)
+        return True
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the reference count and memory held for each open collection.
+        
+        Returns:
+            Dictionary of collection name to its stats
+        """
+        with self._lock:
+            return {
+                collection_name: {
+                    "references": self.ref_counts[collection_name],
+                    "memory_bytes": store.memory_bytes()
+                }
+                for collection_name, store in self.stores.items()
+            }
+    
+    def _update_metrics(self, collection_name: str) -> None:
+        """Publish a collection's reference count and memory as gauges."""
+        store = self.stores.get(collection_name)
+        metrics.set_gauge(f"vector_store.references.{collection_name}", self.ref_counts.get(collection_name, 0))
+        metrics.set_gauge(f"vector_store.memory_bytes.{collection_name}", store.memory_bytes() if store else 0)
+
+# Registry shared by all knowledge enhancers in the process
+vector_store_registry = VectorStoreRegistry()
@@ -3,8 +3,11 @@ Wikipedia knowledge source implementation using LangChain.
 """
 
 from typing import List, Dict, Any, Optional
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
+import asyncio
+
+from ..config import KNOWLEDGE_SOURCES
+from ..utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from ..utils.hedging import get_hedger
 
 class WikipediaSource:
     """
@@ -13,7 +16,36 @@ class WikipediaSource:
     
     def __init__(self):
         """Initialize the Wikipedia knowledge source."""
+        # Imported here so the Wikipedia tooling is only loaded when the source is enabled
+        import wikipedia.wikipedia as wikipedia_api
+        from langchain_community.tools import WikipediaQueryRun
+        from langchain_community.utilities import WikipediaAPIWrapper
+        
         self.wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
+        
+        # Point the client at another endpoint if configured (set after the
+        # wrapper, which resets the endpoint when it sets the language)
+        api_url = KNOWLEDGE_SOURCES.get("wikipedia", {}).get("api_url")
+        if api_url:
+            wikipedia_api.API_URL = api_url
+        
+        # Shared by all Wikipedia sources so failures anywhere open it for everyone
+        self.breaker = get_circuit_breaker("wikipedia")
+        # Slow lookups are duplicated when hedging is enabled (HEDGED_REQUESTS)
+        self.hedger = get_hedger("wikipedia")
+    
+    async def _run(self, query: str) -> str:
+        """
+        Run a Wikipedia tool query off the event loop, through the circuit breaker,
+        hedging it if it is slow.
+        
+        Args:
+            query: The tool query
+            
+        Returns:
+            The tool output
+        """
+        return await self.hedger.call(lambda: self.breaker.call(asyncio.to_thread, self.wikipedia.run, query))
     
     async def search(self, query: str, results_limit: int = 5) -> List[str]:
         """
@@ -27,8 +59,8 @@ class WikipediaSource:
             List of page titles
         """
         try:
-            # Use LangChain's Wikipedia tool to search
-            results = self.wikipedia.run(query)
+            # Use LangChain's Wikipedia tool to search, off the event loop
+            results = await self._run(query)
             # Extract titles from the results
             titles = []
             for line in results.split('\n'):
@@ -37,6 +69,9 @@ class WikipediaSource:
                 if len(titles) >= results_limit:
                     break
             return titles
+        except CircuitOpenError:
+            # Answer without Wikipedia until the breaker lets a probe through
+            return []
         except Exception as e:
             print(f"Error searching Wikipedia: {e}")
             return []
@@ -55,7 +90,7 @@ class WikipediaSource:
         try:
             # Use LangChain's Wikipedia tool to get summary
             query = f"Give me a {sentences} sentence summary of the Wikipedia article '{title}'"
-            return self.wikipedia.run(query)
+            return await self._run(query)
         except Exception as e:
             return f"Error retrieving Wikipedia summary: {e}"
     
@@ -72,6 +107,6 @@ class WikipediaSource:
         try:
             # Use LangChain's Wikipedia tool to get full content
             query = f"Give me the full content of the Wikipedia article '{title}'"
-            return self.wikipedia.run(query)
+            return await self._run(query)
         except Exception as e:
             return f"Error retrieving Wikipedia content: {e}"
@@ -2,8 +2,39 @@
 Initialization file for the utils module.
 """
 
+import importlib
+
 from .conversation import ConversationManager
+from .conversation_backends import ConversationBackend, MemoryConversationBackend, SQLiteConversationBackend
+from .metrics import MetricsRegistry, metrics
+from .deadline import Deadline, DeadlineExceeded
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+
+# Submodules are imported on first access, so importing the package does not
+# load LangChain for components that are not used
+_LAZY_IMPORTS = {
+    'ConversationSummarizer': '.summarizer'
+}
 
 __all__ = [
-    'ConversationManager'
+    'ConversationManager',
+    'ConversationBackend',
+    'MemoryConversationBackend',
+    'SQLiteConversationBackend',
+    'MetricsRegistry',
+    'metrics',
+    'ConversationSummarizer',
+    'Deadline',
+    'DeadlineExceeded',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'get_circuit_breaker'
 ]
+
+def __getattr__(name):
+    """Import a re-exported name from its submodule on first access."""
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,139 @@
+"""
+Benchmark API throughput as the number of worker processes increases.
+
+For each worker count, starts main.py with API_WORKERS set, sends a fixed
+number of concurrent chat requests over HTTP and reports throughput and
+latency. Use CONVERSATION_BACKEND=sqlite to include shared conversation state.
+
+Usage (from the demo directory, with Ollama running):
+    python -m src.utils.benchmark_workers --workers 1 2 4 --requests 200 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Any
+
+import httpx
+
+from .metrics import Summary
+
+DEMO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = [
+    "What is the GPA requirement for the Concordia computer science program?",
+    "How does a neural network learn during training?",
+    "What is the capital of France?",
+    "When is the application deadline for international students?",
+]
+
+
+async def wait_until_ready(base_url: str, timeout: float) -> None:
+    """
+    Wait for the API to answer requests.
+
+    Args:
+        base_url: Base URL of the API
+        timeout: Maximum seconds to wait
+    """
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/agents")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"API at {base_url} did not start within {timeout} seconds")
+
+
+async def run_load(base_url: str, n_requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Send chat requests and measure throughput and latency.
+
+    Args:
+        base_url: Base URL of the API
+        n_requests: Total number of requests
+        concurrency: Requests in flight at once
+
+    Returns:
+        Dictionary of measurements
+    """
+    latencies = Summary(window=n_requests)
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=300) as client:
+        async def one_request(i: int) -> None:
+            """Send the i-th chat request and record its latency."""
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(f"{base_url}/api/chat", json={"message": QUERIES[i % len(QUERIES)]})
+                latencies.observe((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": n_requests / elapsed,
+        "p50_ms": latencies.percentile(50),
+        "p99_ms": latencies.percentile(99),
+        "errors": errors,
+    }
+
+
+def benchmark_worker_count(workers: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Start the API with a number of workers and run the load against it.
+
+    Args:
+        workers: Number of worker processes
+        args: Parsed command line arguments
+
+    Returns:
+        Dictionary of measurements
+    """
+    env = dict(os.environ, API_WORKERS=str(workers), API_HOST="127.0.0.1", API_PORT=str(args.port))
+    server = subprocess.Popen([sys.executable, "main.py"], cwd=DEMO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        start = time.perf_counter()
+        asyncio.run(wait_until_ready(base_url, args.startup_timeout))
+        startup_seconds = time.perf_counter() - start
+        result = asyncio.run(run_load(base_url, args.requests, args.concurrency))
+        result["startup_s"] = startup_seconds
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    """Parse arguments, run the benchmark and print a report."""
+    parser = argparse.ArgumentParser(description="Benchmark API throughput against worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--requests", type=int, default=200, help="Chat requests per worker count")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--port", type=int, default=8100, help="Port for the benchmarked server")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for the server to start")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'workers':>7} {'startup s':>10} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for workers in args.workers:
+        result = benchmark_worker_count(workers, args)
+        print(f"{workers:>7} {result['startup_s']:>10.1f} {result['throughput']:>9.2f} "
+              f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
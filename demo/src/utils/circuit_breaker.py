@@ -0,0 +1,261 @@
+"""
+Circuit breakers around external dependencies (Wikipedia, Ollama).
+
+A breaker tracks the outcome of recent calls to a dependency. Once the
+failure rate passes its threshold the breaker opens and calls fail fast
+with CircuitOpenError instead of waiting on a dependency that is down.
+After a cool-down it lets a probe call through (half-open) and closes
+again if the probe succeeds.
+"""
+
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable, Optional
+import asyncio
+import re
+import threading
+import time
+
+from ..config import CIRCUIT_BREAKERS
+from .metrics import metrics
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Values of the circuit_breaker.state.* gauges
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the dependency's circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        """
+        Initialize the error.
+
+        Args:
+            name: Name of the dependency
+            retry_after: Seconds until the breaker lets a call through again
+        """
+        super().__init__(f"{name} is unavailable, retry in {retry_after:.0f} seconds")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker with half-open probing.
+    """
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, window: int = 20, min_calls: int = 5, open_seconds: float = 30, half_open_calls: int = 1, call_timeout_seconds: Optional[float] = None):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: Name of the dependency, used (with punctuation replaced) in metric names
+            failure_rate_threshold: Failure rate over the window that opens the breaker
+            window: Number of most recent calls the failure rate is computed over
+            min_calls: Calls needed in the window before the breaker can open
+            open_seconds: How long the breaker stays open before probing
+            half_open_calls: Probe calls allowed at once while half-open
+            call_timeout_seconds: Calls slower than this fail and count as failures
+        """
+        self.name = name
+        self.label = re.sub(r"\W+", "_", name)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.call_timeout_seconds = call_timeout_seconds
+
+        self.results = deque(maxlen=window)  # True for each failed call
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self._lock = threading.Lock()
+        self._set_state(CLOSED)
+
+    def retry_after(self) -> float:
+        """Get the seconds until an open breaker lets a probe through."""
+        return max(self.opened_at + self.open_seconds - time.monotonic(), 0.0)
+
+    def admission_delay(self) -> float:
+        """
+        Check whether a call would get through the breaker, without admitting it.
+
+        Returns:
+            0 if a call would be admitted now, otherwise the seconds until the breaker admits one
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return self.retry_after()
+            if self.state == HALF_OPEN and self.probes_in_flight >= self.half_open_calls:
+                return self.open_seconds
+            return 0.0
+
+    def before_call(self) -> bool:
+        """
+        Admit a call through the breaker.
+
+        Returns:
+            True if the call is a half-open probe
+
+        Raises:
+            CircuitOpenError: If the breaker is open or its probe slots are taken
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    metrics.increment(f"circuit_breaker.rejected.{self.label}")
+                    raise CircuitOpenError(self.name, self.retry_after())
+                self._set_state(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self.probes_in_flight >= self.half_open_calls:
+                    metrics.increment(f"circuit_breaker.rejected.{self.label}")
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self.probes_in_flight += 1
+                return True
+
+            return False
+
+    def record_success(self, probe: bool) -> None:
+        """
+        Record a successful call.
+
+        Args:
+            probe: Whether the call was a half-open probe
+        """
+        with self._lock:
+            if probe:
+                self.probes_in_flight -= 1
+                if self.state == HALF_OPEN:
+                    self.results.clear()
+                    self._set_state(CLOSED)
+            elif self.state == CLOSED:
+                self.results.append(False)
+
+    def record_failure(self, probe: bool) -> None:
+        """
+        Record a failed call, opening the breaker if the failure rate is too high.
+
+        Args:
+            probe: Whether the call was a half-open probe
+        """
+        metrics.increment(f"circuit_breaker.failures.{self.label}")
+        with self._lock:
+            if probe:
+                self.probes_in_flight -= 1
+                if self.state == HALF_OPEN:
+                    self._open()
+            elif self.state == CLOSED:
+                self.results.append(True)
+                failures = sum(self.results)
+                if len(self.results) >= self.min_calls and failures / len(self.results) >= self.failure_rate_threshold:
+                    self._open()
+
+    def release(self, probe: bool) -> None:
+        """
+        Release a call that was cancelled before it completed, without recording an outcome.
+
+        Args:
+            probe: Whether the call was a half-open probe
+        """
+        if probe:
+            with self._lock:
+                self.probes_in_flight -= 1
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Await a call to the dependency through the breaker.
+
+        Args:
+            func: Coroutine function calling the dependency
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The result of the call
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+        """
+        probe = self.before_call()
+        try:
+            if self.call_timeout_seconds:
+                result = await asyncio.wait_for(func(*args, **kwargs), timeout=self.call_timeout_seconds)
+            else:
+                result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            # The caller gave up (e.g. its deadline passed); that says nothing about the dependency
+            self.release(probe)
+            raise
+        except Exception:
+            self.record_failure(probe)
+            raise
+
+        self.record_success(probe)
+        return result
+
+    def call_sync(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Make a blocking call to the dependency through the breaker.
+
+        Args:
+            func: Function calling the dependency
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The result of the call
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+        """
+        probe = self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure(probe)
+            raise
+
+        self.record_success(probe)
+        return result
+
+    def _open(self) -> None:
+        """Open the breaker. Must be called with the lock held."""
+        self.opened_at = time.monotonic()
+        self.results.clear()
+        self._set_state(OPEN)
+        metrics.increment(f"circuit_breaker.opened.{self.label}")
+        print(f"Circuit breaker for {self.name} opened for {self.open_seconds} seconds")
+
+    def _set_state(self, state: str) -> None:
+        """Set the breaker state and its gauge."""
+        self.state = state
+        metrics.set_gauge(f"circuit_breaker.state.{self.label}", STATE_VALUES[state])
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    Get the shared circuit breaker for a dependency, creating it from CIRCUIT_BREAKERS.
+
+    Breakers for one instance of a dependency ("ollama:<url>") take the
+    settings of the dependency ("ollama").
+
+    Args:
+        name: Name of the dependency (e.g. "wikipedia" or "ollama:http://localhost:11434")
+
+    Returns:
+        The circuit breaker shared by all callers of the dependency
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            params = dict(CIRCUIT_BREAKERS["default"])
+            params.update(CIRCUIT_BREAKERS.get(name.split(":", 1)[0], {}))
+            params.update(CIRCUIT_BREAKERS.get(name, {}))
+            _breakers[name] = CircuitBreaker(name, **params)
+        return _breakers[name]
@@ -2,18 +2,198 @@
 Conversation management utility for tracking multi-turn conversations.
 """
 
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Optional, Tuple, Callable
+import asyncio
 import uuid
-from ..config import MAX_HISTORY_LENGTH
+from ..config import (
+    MAX_HISTORY_LENGTH,
+    CONVERSATION_BACKEND,
+    CONVERSATION_DB_PATH,
+    CONVERSATION_VIEW_CACHE_SIZE,
+    CONVERSATION_COLD_STORAGE,
+    CONVERSATION_COLD_AFTER_SECONDS,
+    CONVERSATION_COLD_SWEEP_SECONDS,
+    ROUTING_TOPIC_DECAY
+)
+from .conversation_backends import ConversationBackend, MemoryConversationBackend, create_conversation_backend
+from .memory import TURN_DICT_BYTES, LANGCHAIN_MESSAGE_BYTES, text_bytes
+
+# Scores a lowercased message by topic (e.g. routing keyword matches per agent type)
+TopicScorer = Callable[[str], Dict[str, int]]
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text (roughly four characters per token).
+    
+    Args:
+        text: The text to measure
+        
+    Returns:
+        Approximate token count
+    """
+    return len(text) // 4 + 1
+
+class TurnHistory(list):
+    """
+    Agent-ready conversation history: an optional {"summary"} entry followed by
+    {"user", "agent"} turns, the last one possibly unanswered.
+    
+    It also carries the completed turns as LangChain messages and the last
+    answer, so agents do not have to rebuild them on every request.
+    """
+    
+    def __init__(self):
+        """Initialize an empty history."""
+        super().__init__()
+        self.messages: List[Any] = []
+        self.last_response: Optional[str] = None
+
+class ConversationView:
+    """
+    Representations of one conversation derived from its messages, kept up to
+    date as messages are appended instead of being rebuilt on every request.
+    """
+    
+    def __init__(self, summary: Optional[str], messages: List[Dict[str, Any]], topic_scorer: Optional[TopicScorer] = None, topic_decay: float = ROUTING_TOPIC_DECAY, routed_agent: Optional[str] = None):
+        """
+        Build the view of a conversation.
+        
+        Args:
+            summary: Rolling summary of the compacted turns, if any
+            messages: Messages of the conversation, oldest first
+            topic_scorer: Optional function scoring each message by topic
+            topic_decay: Factor applied to the topic scores at each new message
+            routed_agent: Agent type the latest query was routed to, as stored with the conversation
+        """
+        from langchain_core.messages import SystemMessage
+        
+        self.summary = summary
+        self.turns = TurnHistory()
+        self.roles = deque()  # (role, estimated tokens, text bytes) of each message
+        self.tokens = estimate_tokens(summary or "")
+        
+        # Approximate memory held by the view's own objects and by the message
+        # texts it references (the latter shared with an in-memory backend)
+        self.object_bytes = LANGCHAIN_MESSAGE_BYTES if summary else 0
+        self.text_bytes = text_bytes(summary)
+        self.last_seq: Optional[int] = None
+        
+        # Routing state: decayed topic scores of the messages so far, and the
+        # agent type the last query was routed to (stored by the backend)
+        self.topic_scorer = topic_scorer
+        self.topic_decay = topic_decay
+        self.topic_scores: Dict[str, float] = {}
+        self.routed_agent = routed_agent
+        
+        if summary:
+            self.turns.append({"summary": summary})
+            self.turns.messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+        for message in messages:
+            self.append(message["role"], message["content"], message["seq"])
+    
+    @property
+    def state(self) -> Tuple[Optional[int], int, Optional[str], Optional[str]]:
+        """The backend state this view reflects (see ConversationBackend.get_state)."""
+        return self.last_seq, len(self.roles), self.summary, self.routed_agent
+    
+    def append(self, role: str, content: str, seq: int) -> None:
+        """
+        Add a message to the view.
+        
+        Args:
+            role: Role of the message sender (user or assistant)
+            content: Message content
+            seq: Sequence number of the message
+        """
+        from langchain_core.messages import HumanMessage, AIMessage
+        
+        tokens = estimate_tokens(content)
+        size = text_bytes(content)
+        self.roles.append((role, tokens, size))
+        self.tokens += tokens
+        self.text_bytes += size
+        # A user message's turn dict, and the LangChain message each side gets once answered
+        self.object_bytes += LANGCHAIN_MESSAGE_BYTES + (TURN_DICT_BYTES if role == "user" else 0)
+        self.last_seq = seq
+        
+        # Older messages count for less with each new one
+        if self.topic_scorer is not None:
+            for topic in self.topic_scores:
+                self.topic_scores[topic] *= self.topic_decay
+            for topic, score in self.topic_scorer(content.lower()).items():
+                self.topic_scores[topic] = self.topic_scores.get(topic, 0.0) + score
+        
+        # Each user message opens a turn; an answer closes the open turn and
+        # is ignored if there is none
+        if role == "user":
+            self.turns.append({"user": content, "agent": ""})
+        elif role == "assistant" and self._open_turn() is not None:
+            turn = self._open_turn()
+            turn["agent"] = content
+            self.turns.messages.append(HumanMessage(content=turn["user"]))
+            self.turns.messages.append(AIMessage(content=content))
+            self.turns.last_response = content
+    
+    def trim(self, max_messages: int) -> None:
+        """
+        Drop the oldest messages the backend trimmed.
+        
+        Args:
+            max_messages: Number of most recent messages the backend keeps
+        """
+        first_turn = 1 if self.summary else 0
+        while len(self.roles) > max_messages:
+            role, tokens, size = self.roles.popleft()
+            self.tokens -= tokens
+            self.text_bytes -= size
+            self.object_bytes -= LANGCHAIN_MESSAGE_BYTES + (TURN_DICT_BYTES if role == "user" else 0)
+            # Dropping a user message drops its turn; its answer, if any, is
+            # dropped with it, and an answer left without a turn was never shown
+            if role == "user":
+                turn = self.turns.pop(first_turn)
+                if turn["agent"]:
+                    del self.turns.messages[first_turn:first_turn + 2]
+                    if len(self.turns.messages) == first_turn:
+                        self.turns.last_response = None
+    
+    def _open_turn(self) -> Optional[Dict[str, str]]:
+        """Get the last turn if it is waiting for an answer."""
+        if self.turns and "user" in self.turns[-1] and not self.turns[-1]["agent"]:
+            return self.turns[-1]
+        return None
 
 class ConversationManager:
     """
     Manages conversation history across multiple sessions.
     """
     
-    def __init__(self):
-        """Initialize the conversation manager."""
-        self.conversations: Dict[str, List[Dict[str, str]]] = {}
+    def __init__(self, backend: Optional[ConversationBackend] = None, topic_scorer: Optional[TopicScorer] = None):
+        """
+        Initialize the conversation manager.
+        
+        Args:
+            backend: Optional storage backend (defaults to the configured CONVERSATION_BACKEND)
+            topic_scorer: Optional function scoring messages by topic, for routing follow-ups
+        """
+        self.backend = backend or create_conversation_backend(CONVERSATION_BACKEND, CONVERSATION_DB_PATH)
+        self.topic_scorer = topic_scorer
+        
+        # Derived views of recently used conversations, least recently used first
+        self._views: "OrderedDict[str, ConversationView]" = OrderedDict()
+        self._cold_storage_task: Optional[asyncio.Task] = None
+    
+    def has_conversation(self, conversation_id: str) -> bool:
+        """
+        Check whether a conversation exists.
+        
+        Args:
+            conversation_id: ID of the conversation
+            
+        Returns:
+            True if the conversation exists
+        """
+        return self.backend.has_conversation(conversation_id)
     
     def create_conversation(self, conversation_id: Optional[str] = None) -> str:
         """
@@ -30,8 +210,7 @@ class ConversationManager:
             conversation_id = str(uuid.uuid4())
         
         # Initialize conversation history if not exists
-        if conversation_id not in self.conversations:
-            self.conversations[conversation_id] = []
+        self.backend.create_conversation(conversation_id)
         
         return conversation_id
     
@@ -44,19 +223,22 @@ class ConversationManager:
             role: Role of the message sender (user or assistant)
             content: Message content
         """
-        # Create conversation if it doesn't exist
-        if conversation_id not in self.conversations:
-            self.create_conversation(conversation_id)
+        # Add message to conversation (creating it if needed), trimming history
+        # to the maximum length; *2 because each turn has user and assistant messages
+        max_messages = MAX_HISTORY_LENGTH * 2
         
-        # Add message to conversation
-        self.conversations[conversation_id].append({
-            "role": role,
-            "content": content
-        })
+        # A view that missed a change made elsewhere is rebuilt when next read
+        # rather than updated in place
+        view = self._views.get(conversation_id)
+        if view is not None and view.state != tuple(self.backend.get_state(conversation_id)):
+            del self._views[conversation_id]
+            view = None
         
-        # Trim history if it exceeds maximum length
-        if len(self.conversations[conversation_id]) > MAX_HISTORY_LENGTH * 2:  # *2 because each turn has user and assistant messages
-            self.conversations[conversation_id] = self.conversations[conversation_id][-MAX_HISTORY_LENGTH * 2:]
+        seq = self.backend.append_message(conversation_id, role, content, max_messages)
+        
+        if view is not None:
+            view.append(role, content, seq)
+            view.trim(max_messages)
     
     def get_history(self, conversation_id: str) -> List[Dict[str, str]]:
         """
@@ -68,11 +250,124 @@ class ConversationManager:
         Returns:
             List of messages in the conversation
         """
-        # Return empty list if conversation doesn't exist
-        if conversation_id not in self.conversations:
-            return []
+        return self.backend.get_messages(conversation_id)
+    
+    def get_view(self, conversation_id: str) -> ConversationView:
+        """
+        Get the up-to-date derived view of a conversation.
+        
+        The cached view is checked against the backend's state, so messages
+        added and routing recorded by other worker processes are picked up.
+        
+        Args:
+            conversation_id: ID of the conversation
+            
+        Returns:
+            The conversation view
+        """
+        state = self.backend.get_state(conversation_id)
+        view = self._views.get(conversation_id)
+        if view is None or view.state != tuple(state):
+            view = ConversationView(
+                self.backend.get_summary(conversation_id),
+                self.backend.get_messages(conversation_id),
+                self.topic_scorer,
+                routed_agent=state[3]
+            )
+            self._views[conversation_id] = view
         
-        return self.conversations[conversation_id]
+        self._views.move_to_end(conversation_id)
+        while len(self._views) > CONVERSATION_VIEW_CACHE_SIZE:
+            self._views.popitem(last=False)
+        return view
+    
+    def get_turns(self, conversation_id: str) -> TurnHistory:
+        """
+        Get a conversation's history as agent-ready turns.
+        
+        Args:
+            conversation_id: ID of the conversation
+            
+        Returns:
+            The summary (if any) and turns, carrying the completed turns as LangChain messages
+        """
+        return self.get_view(conversation_id).turns
+    
+    def get_topic_state(self, conversation_id: str) -> Tuple[Dict[str, float], Optional[str]]:
+        """
+        Get a conversation's routing state.
+        
+        The topic scores are updated as each message is added, so this does
+        not depend on the length of the conversation or its messages.
+        
+        Args:
+            conversation_id: ID of the conversation
+            
+        Returns:
+            Tuple of (decayed topic scores, agent type of the last routed query or None)
+        """
+        view = self.get_view(conversation_id)
+        return view.topic_scores, view.routed_agent
+    
+    def set_routed_agent(self, conversation_id: str, agent_type: str) -> None:
+        """
+        Record the agent type a conversation's latest query was routed to.
+        
+        It is stored with the conversation, so it survives the view being
+        evicted or rebuilt, and other worker processes see it.
+        
+        Args:
+            conversation_id: ID of the conversation
+            agent_type: The agent type
+        """
+        view = self.get_view(conversation_id)
+        if view.routed_agent != agent_type:
+            self.backend.set_routed_agent(conversation_id, agent_type)
+            view.routed_agent = agent_type
+    
+    def get_summary(self, conversation_id: str) -> Optional[str]:
+        """
+        Get the rolling summary of a conversation's compacted turns.
+        
+        Args:
+            conversation_id: ID of the conversation
+            
+        Returns:
+            Summary text, or None if the conversation has not been compacted
+        """
+        return self.backend.get_summary(conversation_id)
+    
+    def estimate_history_tokens(self, conversation_id: str) -> int:
+        """
+        Estimate the prompt tokens taken by a conversation's summary and messages.
+        
+        Args:
+            conversation_id: ID of the conversation
+            
+        Returns:
+            Approximate token count
+        """
+        return self.get_view(conversation_id).tokens
+    
+    def apply_summary(self, conversation_id: str, summary: str, summarized_messages: List[Dict[str, str]]) -> None:
+        """
+        Replace compacted messages with a rolling summary.
+        
+        Messages may have been appended or trimmed while the summary was being
+        generated, so the summarized messages are removed by sequence number
+        rather than by position.
+        
+        Args:
+            conversation_id: ID of the conversation
+            summary: Summary covering the previous summary and the summarized messages
+            summarized_messages: The messages the summary replaces (oldest first)
+        """
+        if not summarized_messages or not self.has_conversation(conversation_id):
+            return
+        
+        self.backend.remove_messages_through(conversation_id, summarized_messages[-1]["seq"])
+        self.backend.set_summary(conversation_id, summary)
+        self._views.pop(conversation_id, None)
     
     def clear_history(self, conversation_id: str) -> None:
         """
@@ -81,8 +376,8 @@ class ConversationManager:
         Args:
             conversation_id: ID of the conversation
         """
-        if conversation_id in self.conversations:
-            self.conversations[conversation_id] = []
+        self.backend.clear_conversation(conversation_id)
+        self._views.pop(conversation_id, None)
     
     def delete_conversation(self, conversation_id: str) -> None:
         """
@@ -91,8 +386,8 @@ class ConversationManager:
         Args:
             conversation_id: ID of the conversation
         """
-        if conversation_id in self.conversations:
-            del self.conversations[conversation_id]
+        self.backend.delete_conversation(conversation_id)
+        self._views.pop(conversation_id, None)
     
     def get_all_conversations(self) -> Dict[str, List[Dict[str, str]]]:
         """
@@ -101,4 +396,61 @@ class ConversationManager:
         Returns:
             Dictionary of conversation IDs and their histories
         """
-        return self.conversations
+        return self.backend.get_all_conversations()
+    
+    def compress_idle(self, idle_seconds: float = CONVERSATION_COLD_AFTER_SECONDS, max_conversations: Optional[int] = None) -> int:
+        """
+        Move conversations not accessed for a while to compressed cold storage.
+        
+        Their views are dropped too, since they reference the message texts;
+        they are rebuilt, decompressing the messages, on the next access.
+        
+        Args:
+            idle_seconds: Time since the last access after which a conversation is compressed
+            max_conversations: Optional maximum number of conversations compressed in this call
+            
+        Returns:
+            Number of conversations compressed
+        """
+        compressed = self.backend.compress_idle(idle_seconds, max_conversations)
+        for conversation_id in compressed:
+            self._views.pop(conversation_id, None)
+        return len(compressed)
+    
+    async def _cold_storage_loop(self) -> None:
+        """Compress idle conversations periodically until cancelled."""
+        while True:
+            await asyncio.sleep(CONVERSATION_COLD_SWEEP_SECONDS)
+            # Compress in small batches so requests are not held up behind a large sweep
+            while self.compress_idle(max_conversations=100) == 100:
+                await asyncio.sleep(0)
+    
+    async def start(self) -> None:
+        """Start the periodic cold storage sweep, if enabled."""
+        if CONVERSATION_COLD_STORAGE and self._cold_storage_task is None:
+            self._cold_storage_task = asyncio.create_task(self._cold_storage_loop())
+    
+    async def stop(self) -> None:
+        """Stop the periodic cold storage sweep."""
+        if self._cold_storage_task is not None:
+            self._cold_storage_task.cancel()
+            await asyncio.gather(self._cold_storage_task, return_exceptions=True)
+            self._cold_storage_task = None
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        Get the approximate memory held by the conversations and their cached views.
+        
+        Returns:
+            Dictionary with the backend's and the views' entry and byte counts
+        """
+        # Views reference the in-memory backend's message texts rather than copies
+        shares_text = isinstance(self.backend, MemoryConversationBackend)
+        views = list(self._views.values())
+        return {
+            "backend": self.backend.memory_stats(),
+            "views": {
+                "entries": len(views),
+                "bytes": sum(view.object_bytes + (0 if shares_text else view.text_bytes) for view in views)
+            }
+        }
@@ -0,0 +1,483 @@
+"""
+Storage backends for conversation state.
+
+The in-memory backend keeps conversations in the process; the SQLite backend
+keeps them in a database file so several API worker processes on one host
+share the same conversations.
+
+Idle conversations in the in-memory backend are kept zstd-compressed (their
+summaries stay as they are, being short) until they are accessed again.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import zstandard
+
+from ..config import CONVERSATION_COMPRESSION_LEVEL
+from .memory import MESSAGE_DICT_BYTES, text_bytes
+from .metrics import metrics
+
+class ConversationBackend(ABC):
+    """
+    Abstract storage for conversation messages and summaries.
+
+    Messages are dicts with "role", "content" and a "seq" number that
+    increases with every message added to the backend.
+    """
+
+    @abstractmethod
+    def has_conversation(self, conversation_id: str) -> bool:
+        """Check whether a conversation exists."""
+
+    @abstractmethod
+    def create_conversation(self, conversation_id: str) -> None:
+        """Create an empty conversation if it does not exist."""
+
+    @abstractmethod
+    def append_message(self, conversation_id: str, role: str, content: str, max_messages: int) -> int:
+        """Append a message, keeping at most max_messages of the most recent ones, and return its seq."""
+
+    @abstractmethod
+    def get_messages(self, conversation_id: str) -> List[Dict[str, str]]:
+        """Get the messages of a conversation, oldest first."""
+
+    @abstractmethod
+    def get_state(self, conversation_id: str) -> Tuple[Optional[int], int, Optional[str], Optional[str]]:
+        """Get the last seq, number of messages, summary and routed agent of a conversation, to detect changes."""
+
+    @abstractmethod
+    def remove_messages_through(self, conversation_id: str, seq: int) -> None:
+        """Remove all messages up to and including the given sequence number."""
+
+    @abstractmethod
+    def get_summary(self, conversation_id: str) -> Optional[str]:
+        """Get the rolling summary of a conversation."""
+
+    @abstractmethod
+    def set_summary(self, conversation_id: str, summary: Optional[str]) -> None:
+        """Set or clear the rolling summary of a conversation."""
+
+    @abstractmethod
+    def get_routed_agent(self, conversation_id: str) -> Optional[str]:
+        """Get the agent type the latest query of a conversation was routed to."""
+
+    @abstractmethod
+    def set_routed_agent(self, conversation_id: str, agent_type: Optional[str]) -> None:
+        """Set or clear the agent type the latest query of a conversation was routed to."""
+
+    @abstractmethod
+    def clear_conversation(self, conversation_id: str) -> None:
+        """Remove the messages, summary and routing of a conversation but keep it."""
+
+    @abstractmethod
+    def delete_conversation(self, conversation_id: str) -> None:
+        """Delete a conversation."""
+
+    @abstractmethod
+    def get_all_conversations(self) -> Dict[str, List[Dict[str, str]]]:
+        """Get all conversations and their messages."""
+
+    def compress_idle(self, idle_seconds: float, max_conversations: Optional[int] = None) -> List[str]:
+        """
+        Compress the messages of conversations not accessed for a while.
+
+        Backends storing conversations outside the process have nothing to compress.
+
+        Args:
+            idle_seconds: Time since the last access after which a conversation is compressed
+            max_conversations: Optional maximum number of conversations compressed in this call
+
+        Returns:
+            IDs of the conversations compressed
+        """
+        return []
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Get the approximate memory held in the process (none for backends storing conversations elsewhere)."""
+        return {"bytes": 0}
+
+class ColdConversation:
+    """
+    Messages of an idle conversation, zstd-compressed, with the state needed
+    to answer get_state without decompressing them.
+    """
+
+    def __init__(self, blob: bytes, raw_size: int, last_seq: Optional[int], message_count: int):
+        """
+        Initialize a cold conversation.
+
+        Args:
+            blob: Compressed messages
+            raw_size: Size of the messages before compression
+            last_seq: Sequence number of the last message
+            message_count: Number of messages
+        """
+        self.blob = blob
+        self.raw_size = raw_size
+        self.last_seq = last_seq
+        self.message_count = message_count
+
+class MemoryConversationBackend(ConversationBackend):
+    """
+    Conversation storage in process memory.
+
+    Conversations are hot (messages as dicts) or cold: compress_idle turns
+    conversations idle for a while into compressed buffers, and the next
+    access to one decompresses it transparently.
+    """
+
+    def __init__(self, compression_level: int = CONVERSATION_COMPRESSION_LEVEL):
+        """
+        Initialize the in-memory backend.
+
+        Args:
+            compression_level: zstd level of cold conversations
+        """
+        self.conversations: Dict[str, List[Dict[str, str]]] = {}
+        self.summaries: Dict[str, str] = {}
+        self.routed_agents: Dict[str, str] = {}  # Kept hot; agent types are short shared strings
+        self._seq = itertools.count(1)
+
+        # Cold conversations, and when each hot one was last accessed, least recent first
+        self.cold: Dict[str, ColdConversation] = {}
+        self.last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+        # Running totals for memory accounting
+        self.message_count = 0
+        self.bytes = 0
+        self.cold_bytes = 0
+        self.cold_raw_bytes = 0
+
+    def has_conversation(self, conversation_id: str) -> bool:
+        """Check whether a conversation exists, hot or cold."""
+        return conversation_id in self.conversations or conversation_id in self.cold
+
+    def create_conversation(self, conversation_id: str) -> None:
+        """Create an empty conversation if it does not exist, and mark it accessed."""
+        if not self.has_conversation(conversation_id):
+            self.conversations[conversation_id] = []
+        self._access(conversation_id)
+
+    def append_message(self, conversation_id: str, role: str, content: str, max_messages: int) -> int:
+        """Append a message, dropping the oldest ones beyond max_messages, and return its seq."""
+        self.create_conversation(conversation_id)
+        messages = self.conversations[conversation_id]
+        seq = next(self._seq)
+        messages.append({"role": role, "content": content, "seq": seq})
+        self._count_messages([messages[-1]], 1)
+        if len(messages) > max_messages:
+            self._count_messages(messages[:-max_messages], -1)
+            del messages[:-max_messages]
+        return seq
+
+    def get_messages(self, conversation_id: str) -> List[Dict[str, str]]:
+        """Get the messages of a conversation, decompressing them if it is cold."""
+        if not self.has_conversation(conversation_id):
+            return []
+        self._access(conversation_id)
+        return self.conversations[conversation_id]
+
+    def get_state(self, conversation_id: str) -> Tuple[Optional[int], int, Optional[str], Optional[str]]:
+        """Get the state of a conversation; cold ones are answered without decompressing them."""
+        # Answered without decompressing, since views check it on every access
+        cold = self.cold.get(conversation_id)
+        if cold is not None:
+            return cold.last_seq, cold.message_count, self.summaries.get(conversation_id), self.routed_agents.get(conversation_id)
+        messages = self.conversations.get(conversation_id, [])
+        return (messages[-1]["seq"] if messages else None), len(messages), self.summaries.get(conversation_id), self.routed_agents.get(conversation_id)
+
+    def remove_messages_through(self, conversation_id: str, seq: int) -> None:
+        """Remove all messages up to and including the given sequence number."""
+        if self.has_conversation(conversation_id):
+            self._access(conversation_id)
+            self._count_messages([message for message in self.conversations[conversation_id] if message["seq"] <= seq], -1)
+            self.conversations[conversation_id] = [
+                message for message in self.conversations[conversation_id] if message["seq"] > seq
+            ]
+
+    def get_summary(self, conversation_id: str) -> Optional[str]:
+        """Get the rolling summary of a conversation."""
+        return self.summaries.get(conversation_id)
+
+    def set_summary(self, conversation_id: str, summary: Optional[str]) -> None:
+        """Set or clear the rolling summary of a conversation."""
+        self.bytes -= text_bytes(self.summaries.get(conversation_id))
+        if summary is None:
+            self.summaries.pop(conversation_id, None)
+        else:
+            self.summaries[conversation_id] = summary
+            self.bytes += text_bytes(summary)
+
+    def get_routed_agent(self, conversation_id: str) -> Optional[str]:
+        """Get the agent type the latest query of a conversation was routed to."""
+        return self.routed_agents.get(conversation_id)
+
+    def set_routed_agent(self, conversation_id: str, agent_type: Optional[str]) -> None:
+        """Set or clear the agent type the latest query of a conversation was routed to."""
+        if agent_type is None:
+            self.routed_agents.pop(conversation_id, None)
+        else:
+            self.routed_agents[conversation_id] = agent_type
+
+    def clear_conversation(self, conversation_id: str) -> None:
+        """Remove the messages, summary and routing of a conversation but keep it, hot and empty."""
+        if self.has_conversation(conversation_id):
+            self._drop_cold(conversation_id)
+            self._count_messages(self.conversations.get(conversation_id, []), -1)
+            self.conversations[conversation_id] = []
+            self._access(conversation_id)
+        self.set_summary(conversation_id, None)
+        self.set_routed_agent(conversation_id, None)
+
+    def delete_conversation(self, conversation_id: str) -> None:
+        """Delete a conversation, hot or cold."""
+        self._drop_cold(conversation_id)
+        self._count_messages(self.conversations.pop(conversation_id, []), -1)
+        self.last_access.pop(conversation_id, None)
+        self.set_summary(conversation_id, None)
+        self.set_routed_agent(conversation_id, None)
+
+    def get_all_conversations(self) -> Dict[str, List[Dict[str, str]]]:
+        """Get all conversations and their messages, decoding cold ones without decompressing them in place."""
+        # Cold conversations are decoded for the copy but stay compressed
+        conversations = dict(self.conversations)
+        for conversation_id, cold in self.cold.items():
+            conversations[conversation_id] = self._decode(cold)
+        return conversations
+
+    def compress_idle(self, idle_seconds: float, max_conversations: Optional[int] = None) -> List[str]:
+        """Compress the messages of conversations idle for idle_seconds, least recently accessed first."""
+        now = time.monotonic()
+        compressed = []
+        for conversation_id, last_access in list(self.last_access.items()):
+            if now - last_access < idle_seconds or (max_conversations is not None and len(compressed) >= max_conversations):
+                break
+            del self.last_access[conversation_id]
+            messages = self.conversations.get(conversation_id)
+            if not messages:
+                continue
+
+            # Messages are stored as compact JSON rows before compression
+            raw = json.dumps([[message["role"], message["content"], message["seq"]] for message in messages], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            cold = ColdConversation(self._compressor.compress(raw), len(raw), messages[-1]["seq"], len(messages))
+            self.cold[conversation_id] = cold
+            del self.conversations[conversation_id]
+            self._count_messages(messages, -1)
+            self.cold_bytes += len(cold.blob)
+            self.cold_raw_bytes += cold.raw_size
+            compressed.append(conversation_id)
+
+            metrics.increment("conversations.compressed")
+            metrics.observe("conversations.compression_ratio", cold.raw_size / len(cold.blob))
+
+        if compressed:
+            self._update_cold_metrics()
+        return compressed
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Get the hot and cold conversation counts, messages and approximate memory."""
+        return {
+            "conversations": len(self.conversations) + len(self.cold),
+            "messages": self.message_count,
+            "bytes": self.bytes,
+            "cold": {
+                "entries": len(self.cold),
+                "messages": sum(cold.message_count for cold in self.cold.values()),
+                "bytes": self.cold_bytes,
+                "raw_bytes": self.cold_raw_bytes,
+                "compression_ratio": self.cold_raw_bytes / self.cold_bytes if self.cold_bytes else None
+            }
+        }
+
+    def _access(self, conversation_id: str) -> None:
+        """Mark a conversation as accessed, decompressing it if it is cold."""
+        cold = self.cold.get(conversation_id)
+        if cold is not None:
+            start = time.perf_counter()
+            messages = self._decode(cold)
+            self._drop_cold(conversation_id)
+            self.conversations[conversation_id] = messages
+            self._count_messages(messages, 1)
+            metrics.increment("conversations.decompressed")
+            metrics.observe("conversations.decompress_ms", (time.perf_counter() - start) * 1000)
+        self.last_access[conversation_id] = time.monotonic()
+        self.last_access.move_to_end(conversation_id)
+
+    def _decode(self, cold: ColdConversation) -> List[Dict[str, str]]:
+        """Decompress the messages of a cold conversation."""
+        rows = json.loads(self._decompressor.decompress(cold.blob, max_output_size=cold.raw_size))
+        return [{"role": role, "content": content, "seq": seq} for role, content, seq in rows]
+
+    def _drop_cold(self, conversation_id: str) -> None:
+        """Forget the compressed buffer of a conversation, if any."""
+        cold = self.cold.pop(conversation_id, None)
+        if cold is not None:
+            self.cold_bytes -= len(cold.blob)
+            self.cold_raw_bytes -= cold.raw_size
+            self._update_cold_metrics()
+
+    def _update_cold_metrics(self) -> None:
+        """Publish the number and size of cold conversations as gauges."""
+        metrics.set_gauge("conversations.cold", len(self.cold))
+        metrics.set_gauge("conversations.cold_bytes", self.cold_bytes)
+
+    def _count_messages(self, messages: List[Dict[str, str]], sign: int) -> None:
+        """Add messages to (sign 1) or remove them from (sign -1) the memory totals."""
+        self.message_count += sign * len(messages)
+        self.bytes += sign * sum(MESSAGE_DICT_BYTES + text_bytes(message["content"]) for message in messages)
+
+class SQLiteConversationBackend(ConversationBackend):
+    """
+    Conversation storage in a SQLite database shared by all worker processes.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the SQLite backend.
+
+        Args:
+            path: Path of the database file
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+
+        # WAL lets readers in other processes proceed while one process writes
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS conversations (id TEXT PRIMARY KEY, summary TEXT, routed_agent TEXT)")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, seq)")
+
+        # Databases created before routing was stored lack its column
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(conversations)").fetchall()]
+        if "routed_agent" not in columns:
+            try:
+                with self.db:
+                    self.db.execute("ALTER TABLE conversations ADD COLUMN routed_agent TEXT")
+            except sqlite3.OperationalError:
+                # Another worker process added it first
+                pass
+
+    def has_conversation(self, conversation_id: str) -> bool:
+        """Check whether a conversation exists."""
+        with self._lock:
+            row = self.db.execute("SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        return row is not None
+
+    def create_conversation(self, conversation_id: str) -> None:
+        """Create an empty conversation if it does not exist."""
+        with self._lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO conversations (id) VALUES (?)", (conversation_id,))
+
+    def append_message(self, conversation_id: str, role: str, content: str, max_messages: int) -> int:
+        """Append a message, deleting the oldest ones beyond max_messages, and return its seq."""
+        with self._lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO conversations (id) VALUES (?)", (conversation_id,))
+            cursor = self.db.execute(
+                "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
+                (conversation_id, role, content)
+            )
+            self.db.execute(
+                "DELETE FROM messages WHERE conversation_id = ? AND seq NOT IN "
+                "(SELECT seq FROM messages WHERE conversation_id = ? ORDER BY seq DESC LIMIT ?)",
+                (conversation_id, conversation_id, max_messages)
+            )
+        return cursor.lastrowid
+
+    def get_messages(self, conversation_id: str) -> List[Dict[str, str]]:
+        """Get the messages of a conversation, oldest first."""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT role, content, seq FROM messages WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,)
+            ).fetchall()
+        return [{"role": role, "content": content, "seq": seq} for role, content, seq in rows]
+
+    def get_state(self, conversation_id: str) -> Tuple[Optional[int], int, Optional[str], Optional[str]]:
+        """Get the state of a conversation in one query, without reading its messages."""
+        with self._lock:
+            return self.db.execute(
+                "SELECT MAX(seq), COUNT(*), (SELECT summary FROM conversations WHERE id = ?), "
+                "(SELECT routed_agent FROM conversations WHERE id = ?) "
+                "FROM messages WHERE conversation_id = ?",
+                (conversation_id, conversation_id, conversation_id)
+            ).fetchone()
+
+    def remove_messages_through(self, conversation_id: str, seq: int) -> None:
+        """Remove all messages up to and including the given sequence number."""
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM messages WHERE conversation_id = ? AND seq <= ?", (conversation_id, seq))
+
+    def get_summary(self, conversation_id: str) -> Optional[str]:
+        """Get the rolling summary of a conversation."""
+        with self._lock:
+            row = self.db.execute("SELECT summary FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_summary(self, conversation_id: str, summary: Optional[str]) -> None:
+        """Set or clear the rolling summary of a conversation."""
+        with self._lock, self.db:
+            self.db.execute("UPDATE conversations SET summary = ? WHERE id = ?", (summary, conversation_id))
+
+    def get_routed_agent(self, conversation_id: str) -> Optional[str]:
+        """Get the agent type the latest query of a conversation was routed to."""
+        with self._lock:
+            row = self.db.execute("SELECT routed_agent FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_routed_agent(self, conversation_id: str, agent_type: Optional[str]) -> None:
+        """Set or clear the agent type the latest query of a conversation was routed to."""
+        with self._lock, self.db:
+            self.db.execute("UPDATE conversations SET routed_agent = ? WHERE id = ?", (agent_type, conversation_id))
+
+    def clear_conversation(self, conversation_id: str) -> None:
+        """Remove the messages, summary and routing of a conversation but keep it."""
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self.db.execute("UPDATE conversations SET summary = NULL, routed_agent = NULL WHERE id = ?", (conversation_id,))
+
+    def delete_conversation(self, conversation_id: str) -> None:
+        """Delete a conversation and its messages."""
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self.db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def get_all_conversations(self) -> Dict[str, List[Dict[str, str]]]:
+        """Get all conversations and their messages."""
+        with self._lock:
+            ids = [row[0] for row in self.db.execute("SELECT id FROM conversations").fetchall()]
+        return {conversation_id: self.get_messages(conversation_id) for conversation_id in ids}
+
+def create_conversation_backend(backend_type: str, path: str) -> ConversationBackend:
+    """
+    Create the configured conversation backend.
+
+    Args:
+        backend_type: "memory" or "sqlite"
+        path: Database path for the SQLite backend
+
+    Returns:
+        The conversation backend
+    """
+    if backend_type.lower() == "memory":
+        return MemoryConversationBackend()
+    elif backend_type.lower() == "sqlite":
+        return SQLiteConversationBackend(path)
+    else:
+        raise ValueError(f"Unsupported conversation backend: {backend_type}")
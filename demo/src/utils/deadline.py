@@ -0,0 +1,69 @@
+"""
+Per-request deadlines carried through the agent pipeline.
+"""
+
+from typing import List, Optional
+import math
+import time
+
+from ..config import REQUEST_DEADLINE_SECONDS
+from .metrics import metrics
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of time before a response is generated."""
+
+class Deadline:
+    """
+    Time budget for one request, with a record of the degradations applied to stay within it.
+    """
+
+    def __init__(self, seconds: float = REQUEST_DEADLINE_SECONDS):
+        """
+        Initialize the deadline.
+
+        Args:
+            seconds: Time budget from now, in seconds
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.degradations: List[str] = []
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "Deadline":
+        """
+        Create a deadline from a request header value in seconds.
+
+        Clients can only shorten the configured deadline, not extend it.
+
+        Args:
+            value: Header value, or None to use the configured default
+
+        Returns:
+            The deadline (the configured default if the value is missing or invalid)
+        """
+        try:
+            seconds = float(value) if value else REQUEST_DEADLINE_SECONDS
+        except ValueError:
+            seconds = REQUEST_DEADLINE_SECONDS
+        if not math.isfinite(seconds) or seconds <= 0:
+            seconds = REQUEST_DEADLINE_SECONDS
+        return cls(min(seconds, REQUEST_DEADLINE_SECONDS))
+
+    def remaining(self) -> float:
+        """Get the seconds left before the deadline (never negative)."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """Check whether the deadline has passed."""
+        return self.remaining() <= 0
+
+    def degrade(self, degradation: str) -> None:
+        """
+        Record a degradation applied to meet the deadline.
+
+        Args:
+            degradation: Name of the degradation (e.g. "skip_wikipedia")
+        """
+        if degradation not in self.degradations:
+            self.degradations.append(degradation)
+            metrics.increment(f"deadline.degradations.{degradation}")
@@ -0,0 +1,229 @@
+"""
+Local fake Ollama and Wikipedia servers for exercising failure handling.
+
+The fakes answer just enough of the Ollama API (/api/generate, /api/embed,
+/api/tags, /api/ps) and the MediaWiki API (search, page info, extracts) for the
+chatbot to run against them. Each fake has a mode that can be switched
+while it runs:
+
+    ok     answer normally
+    error  answer every request with HTTP 500
+    hang   never answer (until the mode changes)
+    slow   answer after --delay seconds
+
+Usage (from the demo directory):
+    python -m src.utils.fake_backends --ollama-port 11435 --wikipedia-port 8089
+
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 \\
+    WIKIPEDIA_API_URL=http://127.0.0.1:8089/w/api.php python main.py
+
+    # Take Wikipedia down, then watch circuit_breaker.* in /api/metrics
+    curl -X POST "http://127.0.0.1:8089/fake/mode?mode=error"
+
+Several fake Ollama servers exercise the backend pool:
+    python -m src.utils.fake_backends --ollama-port 11435 11436 11437
+
+    OLLAMA_BASE_URLS=http://127.0.0.1:11435,http://127.0.0.1:11436,http://127.0.0.1:11437 python main.py
+
+    # Slow one down or take it out, then watch ollama.* in /api/metrics
+    curl -X POST "http://127.0.0.1:11436/fake/mode?mode=slow"
+"""
+
+from abc import ABC, abstractmethod
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any
+from urllib.parse import urlparse, parse_qs
+
+MODES = ["ok", "error", "hang", "slow"]
+
+
+class FakeBackendHandler(BaseHTTPRequestHandler, ABC):
+    """
+    Request handler shared by the fakes; subclasses implement answer().
+    """
+
+    # Set on the subclass created for each server
+    state: Dict[str, Any] = {}
+
+    def log_message(self, format: str, *args) -> None:
+        """Keep the fakes quiet."""
+
+    def do_GET(self) -> None:
+        """Handle a GET request."""
+        self._handle()
+
+    def do_POST(self) -> None:
+        """Handle a POST request."""
+        self._handle()
+
+    def _handle(self) -> None:
+        """Apply the current mode, then answer the request."""
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+
+        # Mode switching is always answered, whatever the mode
+        if url.path == "/fake/mode":
+            mode = query.get("mode", "")
+            if mode not in MODES:
+                self._send_json({"error": f"mode must be one of {MODES}"}, status=400)
+                return
+            self.state["mode"] = mode
+            self.state["changed"].set()
+            self.state["changed"] = threading.Event()
+            self._send_json({"mode": mode})
+            return
+
+        self.state["requests"] += 1
+        self.started = time.perf_counter()
+        mode = self.state["mode"]
+        if mode == "error":
+            self._send_json({"error": "fake backend failure"}, status=500)
+            return
+        if mode == "hang":
+            # Hold the request until the mode is switched, then drop it
+            self.state["changed"].wait()
+            return
+        if mode == "slow":
+            time.sleep(self.state["delay"])
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        self.answer(url.path, query, body)
+
+    @abstractmethod
+    def answer(self, path: str, query: Dict[str, str], body: Dict[str, Any]) -> None:
+        """
+        Answer a request in "ok" mode.
+
+        Args:
+            path: Path of the request URL
+            query: Query string parameters
+            body: Parsed JSON body (empty for GET requests)
+        """
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        """Send a JSON response."""
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeOllamaHandler(FakeBackendHandler):
+    """
+    Fake Ollama API with deterministic embeddings and echo generations.
+
+    Models count as loaded once they have generated, as reported by /api/ps.
+    """
+
+    def answer(self, path: str, query: Dict[str, str], body: Dict[str, Any]) -> None:
+        """Answer an Ollama API request with a fake generation, embedding or model list."""
+        if path == "/api/generate":
+            model = body.get("model") or ""
+            self.state["models"].add(model if ":" in model else f"{model}:latest")
+            prompt = body.get("prompt", "")
+            prompt_tokens = len(prompt.split())
+            response = f"Fake answer to: {prompt[-60:]}"
+            eval_count = len(response.split())
+            final = {
+                "model": body.get("model"),
+                "created_at": "1970-01-01T00:00:00Z",
+                "response": "",
+                "done": True,
+                "done_reason": "stop",
+                "context": list(body.get("context") or []) + list(range(prompt_tokens + eval_count)),
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": eval_count,
+                "eval_duration": max(int((time.perf_counter() - self.started) * 1e9), 1),
+            }
+            if not body.get("stream", True):
+                final["response"] = response
+                self._send_json(final)
+                return
+            chunk = dict(final, response=response, done=False)
+            data = (json.dumps(chunk) + "\n" + json.dumps(final) + "\n").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif path == "/api/embed":
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            embeddings = [[(byte - 128) / 128 for byte in hashlib.sha256(text.encode()).digest()] for text in texts]
+            self._send_json({"model": body.get("model"), "embeddings": embeddings})
+        elif path in ("/api/tags", "/api/ps"):
+            self._send_json({"models": [{"name": name, "model": name} for name in sorted(self.state["models"])]})
+        else:
+            self._send_json({"error": f"unknown endpoint {path}"}, status=404)
+
+
+class FakeWikipediaHandler(FakeBackendHandler):
+    """
+    Fake MediaWiki API returning one made-up article per search.
+    """
+
+    def answer(self, path: str, query: Dict[str, str], body: Dict[str, Any]) -> None:
+        """Answer a MediaWiki API search or page query with a made-up article."""
+        if "srsearch" in query:
+            self._send_json({"query": {"search": [{"title": f"Fake article about {query['srsearch'][:40]}"}]}})
+            return
+
+        title = query.get("titles", "Fake article")
+        page = {"pageid": 1, "title": title, "fullurl": "http://127.0.0.1/wiki/Fake"}
+        if query.get("prop") == "extracts":
+            page["extract"] = f"{title} is a fake article served by the local Wikipedia fake."
+        self._send_json({"query": {"pages": {"1": page}}})
+
+
+def start_fake_server(handler: type, port: int, mode: str = "ok", delay: float = 5.0) -> ThreadingHTTPServer:
+    """
+    Start a fake backend server on a background thread.
+
+    Args:
+        handler: FakeOllamaHandler or FakeWikipediaHandler
+        port: Port to listen on (127.0.0.1)
+        mode: Initial mode
+        delay: Response delay in "slow" mode, in seconds
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    state = {"mode": mode, "delay": delay, "requests": 0, "changed": threading.Event(), "models": set()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), type(handler.__name__, (handler,), {"state": state}))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """Parse arguments and run the fake servers until interrupted."""
+    parser = argparse.ArgumentParser(description="Run fake Ollama and Wikipedia servers")
+    parser.add_argument("--ollama-port", type=int, nargs="+", default=[11435], help="Ports for the fake Ollama APIs (one server per port)")
+    parser.add_argument("--wikipedia-port", type=int, default=8089, help="Port for the fake Wikipedia API")
+    parser.add_argument("--mode", choices=MODES, default="ok", help="Initial mode of both fakes")
+    parser.add_argument("--delay", type=float, default=5.0, help="Response delay in slow mode, in seconds")
+    args = parser.parse_args()
+
+    servers = [start_fake_server(FakeOllamaHandler, port, args.mode, args.delay) for port in args.ollama_port]
+    servers.append(start_fake_server(FakeWikipediaHandler, args.wikipedia_port, args.mode, args.delay))
+    for port in args.ollama_port:
+        print(f"Fake Ollama on http://127.0.0.1:{port}")
+    print(f"Fake Wikipedia on http://127.0.0.1:{args.wikipedia_port}/w/api.php")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
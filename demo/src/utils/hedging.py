@@ -0,0 +1,268 @@
+"""
+Hedged requests against dependencies with heavy latency tails.
+
+A hedger tracks the recent latency of calls to a dependency. When a call
+has not returned by a percentile of that latency, it issues a duplicate
+and takes whichever attempt succeeds first, cancelling the other. Only
+idempotent reads should be hedged.
+
+A budget caps the extra load: every call earns `budget` hedge tokens (up to
+`burst`), and a hedge spends one, so at most about `budget` of the calls are
+duplicated over time.
+
+Metrics per dependency:
+    hedging.calls / hedging.hedged / hedging.hedge_wins / hedging.budget_exhausted
+    hedging.failed               calls whose attempts all failed (not counted as wins)
+    hedging.rate                 share of calls hedged (gauge)
+    hedging.latency_ms           latency seen by callers
+    hedging.unhedged_latency_ms  latency of the first attempt; for attempts
+                                 cancelled once the hedge won, the time they
+                                 had run, so the p99 improvement shown by
+                                 the two summaries is understated
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable, Optional, TypeVar
+import asyncio
+import threading
+import time
+
+from ..config import HEDGED_REQUESTS, HEDGING
+from .metrics import metrics
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    Issues a duplicate of calls that are slower than usual.
+    """
+
+    def __init__(self, name: str, percentile: float = 95, budget: float = 0.05, burst: float = 10, min_samples: int = 20, window: int = 200, min_delay_ms: float = 0, enabled: bool = True):
+        """
+        Initialize the hedger.
+
+        Args:
+            name: Name of the dependency, used in metric names
+            percentile: Percentile of recent latency after which a call is hedged
+            budget: Hedge tokens earned per call, i.e. the long-run share of calls hedged at most
+            burst: Maximum hedge tokens saved up
+            min_samples: Calls observed before hedging starts
+            window: Number of recent latencies the percentile is computed over
+            min_delay_ms: Lower bound on the delay before hedging
+            enabled: Whether calls are hedged at all (latency is tracked either way)
+        """
+        self.name = name
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.min_samples = min_samples
+        self.min_delay_ms = min_delay_ms
+        self.enabled = enabled
+
+        self.latencies = deque(maxlen=window)  # Unhedged latencies in milliseconds
+        self.tokens = burst
+        self.calls = 0
+        self.hedged = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Get how long to wait for a call before hedging it.
+
+        Returns:
+            Delay in seconds, or None if the call should not be hedged
+        """
+        with self._lock:
+            if not self.enabled or len(self.latencies) < self.min_samples:
+                return None
+            values = sorted(self.latencies)
+        delay_ms = values[min(len(values) - 1, int(round(self.percentile / 100 * (len(values) - 1))))]
+        return max(delay_ms, self.min_delay_ms) / 1000
+
+    def _start_call(self) -> None:
+        """Count a call and earn its share of the hedge budget."""
+        with self._lock:
+            self.calls += 1
+            self.tokens = min(self.tokens + self.budget, self.burst)
+        metrics.increment(f"hedging.calls.{self.name}")
+
+    def _take_token(self) -> bool:
+        """Spend a hedge token, if one is left."""
+        with self._lock:
+            if self.tokens < 1:
+                metrics.increment(f"hedging.budget_exhausted.{self.name}")
+                return False
+            self.tokens -= 1
+            self.hedged += 1
+            rate = self.hedged / self.calls
+        metrics.increment(f"hedging.hedged.{self.name}")
+        metrics.set_gauge(f"hedging.rate.{self.name}", rate)
+        return True
+
+    def _finish_call(self, latency_ms: float, unhedged_latency_ms: float, hedge_won: bool, failed: bool) -> None:
+        """
+        Record the outcome and latencies of a finished call.
+
+        Args:
+            latency_ms: Time until the call returned or failed
+            unhedged_latency_ms: Time the first attempt took (or the call, if it did not finish)
+            hedge_won: Whether the hedge returned the result
+            failed: Whether every attempt failed
+        """
+        with self._lock:
+            self.latencies.append(unhedged_latency_ms)
+            if failed:
+                self.failed += 1
+            if not self.hedged:
+                metrics.set_gauge(f"hedging.rate.{self.name}", 0)
+        metrics.observe(f"hedging.latency_ms.{self.name}", latency_ms)
+        metrics.observe(f"hedging.unhedged_latency_ms.{self.name}", unhedged_latency_ms)
+        if failed:
+            metrics.increment(f"hedging.failed.{self.name}")
+        elif hedge_won:
+            metrics.increment(f"hedging.hedge_wins.{self.name}")
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await a call, hedging it if it is slow.
+
+        Args:
+            func: Function starting an attempt of the call (called once per attempt)
+
+        Returns:
+            The result of the first attempt to succeed
+
+        Raises:
+            Exception: The error of the last attempt, if all attempts fail
+        """
+        self._start_call()
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(func())
+        pending = {primary}
+        winner = None  # The attempt that succeeded
+        failed = False
+        primary_ms: Optional[float] = None
+        try:
+            # Hedge if the first attempt has not returned by the usual latency
+            delay = self.hedge_delay()
+            if delay is not None:
+                await asyncio.wait(pending, timeout=delay)
+                if not primary.done() and self._take_token():
+                    pending.add(asyncio.ensure_future(func()))
+
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if primary in done:
+                    primary_ms = (time.perf_counter() - start) * 1000
+                # Take the first success; if an attempt fails, wait for the other
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    winner = succeeded[0]
+                    return winner.result()
+                if not pending:
+                    failed = True
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._finish_call(elapsed_ms, primary_ms if primary_ms is not None else elapsed_ms, winner is not None and winner is not primary, failed)
+
+    def call_sync(self, func: Callable[[], T]) -> T:
+        """
+        Make a blocking call, hedging it if it is slow.
+
+        Attempts run on the hedger's own threads; a losing attempt cannot be
+        interrupted, so it finishes in the background and its result is dropped.
+
+        Args:
+            func: Function making one attempt of the call
+
+        Returns:
+            The result of the first attempt to succeed
+
+        Raises:
+            Exception: The error of the last attempt, if all attempts fail
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            # Nothing to hedge with yet: call directly, only tracking latency
+            self._start_call()
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = func()
+                failed = False
+                return result
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self._finish_call(elapsed_ms, elapsed_ms, False, failed)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix=f"hedge-{self.name}")
+        self._start_call()
+        start = time.perf_counter()
+        primary = self._executor.submit(func)
+        pending = {primary}
+        winner = None  # The attempt that succeeded
+        failed = False
+        primary_ms: Optional[float] = None
+        try:
+            done, _ = wait(pending, timeout=delay)
+            if not done and self._take_token():
+                pending.add(self._executor.submit(func))
+
+            while True:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if primary in done:
+                    primary_ms = (time.perf_counter() - start) * 1000
+                succeeded = [future for future in done if future.exception() is None]
+                if succeeded:
+                    winner = succeeded[0]
+                    return winner.result()
+                if not pending:
+                    failed = True
+                    return done.pop().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._finish_call(elapsed_ms, primary_ms if primary_ms is not None else elapsed_ms, winner is not None and winner is not primary, failed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the hedger's call counts and current hedge delay."""
+        delay = self.hedge_delay()
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "failed": self.failed,
+            "rate": self.hedged / self.calls if self.calls else 0.0,
+            "hedge_delay_ms": delay * 1000 if delay is not None else None
+        }
+
+
+_hedgers: Dict[str, Hedger] = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(name: str) -> Hedger:
+    """
+    Get the shared hedger for a dependency, creating it from HEDGING.
+
+    Args:
+        name: Name of the dependency (e.g. "wikipedia" or "embeddings")
+
+    Returns:
+        The hedger shared by all callers of the dependency
+    """
+    with _hedgers_lock:
+        if name not in _hedgers:
+            params = dict(HEDGING["default"])
+            params.update(HEDGING.get(name, {}))
+            _hedgers[name] = Hedger(name, enabled=HEDGED_REQUESTS, **params)
+        return _hedgers[name]
@@ -0,0 +1,170 @@
+"""
+Approximate memory accounting of the in-process stores, and tracemalloc
+snapshot diffs for tracking down leaks.
+
+Stores keep running byte and entry counts, updated as entries are added and
+removed, so reporting them costs next to nothing and never walks the heap.
+Sizes are estimates of the Python objects involved (measured with
+tracemalloc on CPython 3), not exact figures; compare their total with the
+process RSS to see how much memory is unaccounted for.
+
+Tracemalloc slows every allocation down while it traces, so it is only
+started by the first diff request and stays off otherwise.
+"""
+
+from typing import Dict, List, Any, Optional
+import resource
+import threading
+import tracemalloc
+
+from ..config import TRACEMALLOC_FRAMES, TRACEMALLOC_TOP_STATS
+
+# Approximate footprints of the objects the stores hold
+STR_OVERHEAD = 50  # A str object on top of its (ASCII) text
+MESSAGE_DICT_BYTES = 220  # A {"role", "content", "seq"} message dict, excluding its text
+TURN_DICT_BYTES = 185  # A {"user", "agent"} turn dict, excluding its texts
+LANGCHAIN_MESSAGE_BYTES = 770  # A LangChain HumanMessage/AIMessage, excluding its text
+CONTEXT_TOKEN_BYTES = 40  # One token of an Ollama context (list slot plus int object)
+SUMMARY_VALUE_BYTES = 32  # One value in a metrics summary window (deque slot plus float)
+
+
+def text_bytes(text: Optional[str]) -> int:
+    """
+    Approximate the memory held by a string.
+
+    Args:
+        text: The string (None counts as nothing)
+
+    Returns:
+        Approximate size in bytes
+    """
+    return len(text) + STR_OVERHEAD if text is not None else 0
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """
+    Get the resident memory of the process.
+
+    Returns:
+        Dictionary with the current and peak resident set size in bytes
+        (current is None where /proc is not available)
+    """
+    rss_bytes = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss_bytes = int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        pass
+
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        "rss_bytes": rss_bytes,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    }
+
+
+def total_bytes(stats: Any) -> int:
+    """
+    Add up the byte counts in a nested stats dictionary.
+
+    Args:
+        stats: Stats as returned by the stores' memory_stats()
+
+    Returns:
+        Sum of all "bytes" and "memory_bytes" values
+    """
+    if isinstance(stats, dict):
+        return sum(value if key in ("bytes", "memory_bytes") and isinstance(value, int) else total_bytes(value) for key, value in stats.items())
+    return 0
+
+
+class TracemallocTracker:
+    """
+    Diffs successive tracemalloc snapshots to show where memory grows.
+    """
+
+    def __init__(self, frames: int = TRACEMALLOC_FRAMES, top: int = TRACEMALLOC_TOP_STATS):
+        """
+        Initialize the tracker; tracing starts with the first diff.
+
+        Args:
+            frames: Stack frames recorded per allocation (more frames cost more memory)
+            top: Number of allocation sites reported per diff
+        """
+        self.frames = frames
+        self.top = top
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        """Take a snapshot without tracemalloc's and the import system's own allocations."""
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+        ])
+
+    def diff(self) -> Dict[str, Any]:
+        """
+        Compare the allocations now with those at the previous diff.
+
+        The first call starts tracing and only takes the baseline snapshot.
+
+        Returns:
+            Dictionary with the traced totals and the allocation sites that
+            grew or shrank the most since the previous diff
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._previous = None
+
+            current = self._snapshot()
+            previous, self._previous = self._previous, current
+            traced_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            result: Dict[str, Any] = {
+                "tracing": True,
+                "traced_bytes": traced_bytes,
+                "peak_traced_bytes": peak_bytes,
+                "top": []
+            }
+            if previous is None:
+                result["status"] = "baseline taken; diff again to see what grew"
+                return result
+
+            key_type = "traceback" if self.frames > 1 else "lineno"
+            top: List[Dict[str, Any]] = []
+            for stat in current.compare_to(previous, key_type)[:self.top]:
+                top.append({
+                    "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size_diff_bytes": stat.size_diff,
+                    "size_bytes": stat.size,
+                    "count_diff": stat.count_diff,
+                    "count": stat.count
+                })
+            result["status"] = "diff since the previous snapshot"
+            result["top"] = top
+            return result
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        Stop tracing and drop the snapshot.
+
+        Returns:
+            Dictionary with the tracing status
+        """
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+        return {"tracing": False, "status": "stopped"}
+
+    def status(self) -> Dict[str, Any]:
+        """Get whether tracing is on and the memory traced so far."""
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        traced_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        return {"tracing": True, "traced_bytes": traced_bytes, "peak_traced_bytes": peak_bytes}
+
+
+# Tracker shared by the admin API in the process
+memory_tracker = TracemallocTracker()
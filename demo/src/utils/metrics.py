@@ -0,0 +1,143 @@
+"""
+In-process metrics registry for counters, gauges and value summaries.
+"""
+
+from typing import Dict, Any, Optional
+from collections import deque
+import threading
+
+class Summary:
+    """
+    Running summary of observed values with percentiles over a recent window.
+    """
+
+    def __init__(self, window: int = 1024):
+        """
+        Initialize the summary.
+
+        Args:
+            window: Number of most recent observations kept for percentiles
+        """
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.recent.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Get a percentile over the recent window.
+
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            The percentile value, or None if nothing was observed
+        """
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the summary as a dictionary."""
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99)
+        }
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of named metrics.
+
+    Metric names are dotted strings; labels such as the agent type are
+    appended as the last component (e.g. "llm.prefill_tokens_saved.general").
+    """
+
+    def __init__(self):
+        """Initialize the metrics registry."""
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.summaries: Dict[str, Summary] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name: Name of the counter
+            value: Amount to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Set a gauge to a value.
+
+        Args:
+            name: Name of the gauge
+            value: Current value
+        """
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record a value in a summary.
+
+        Args:
+            name: Name of the summary
+            value: Observed value
+        """
+        with self._lock:
+            if name not in self.summaries:
+                self.summaries[name] = Summary()
+            self.summaries[name].observe(value)
+
+    def memory_stats(self) -> Dict[str, int]:
+        """
+        Get the number of metrics and the approximate memory held by their recent values.
+
+        Returns:
+            Dictionary with the entry and byte counts
+        """
+        from .memory import SUMMARY_VALUE_BYTES
+
+        with self._lock:
+            recent_values = sum(len(summary.recent) for summary in self.summaries.values())
+            return {
+                "entries": len(self.counters) + len(self.gauges) + len(self.summaries),
+                "bytes": recent_values * SUMMARY_VALUE_BYTES
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a point-in-time copy of all metrics.
+
+        Returns:
+            Dictionary with counters, gauges and summaries
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "summaries": {name: summary.to_dict() for name, summary in self.summaries.items()}
+            }
+
+# Process-wide registry shared by all components
+metrics = MetricsRegistry()
@@ -0,0 +1,259 @@
+"""
+Pool of Ollama backends that generations are balanced across.
+
+Each generation leases the least-loaded healthy backend: the one expected to
+finish it first, given its requests in flight (plus OLLAMA_MODEL_LOAD_PENALTY
+requests if it does not have the model loaded yet, since loading a model on
+a CPU box costs more than waiting for a request) and its observed token
+rate. Active health checks poll each backend's /api/ps, which also
+tells which models it has loaded; a backend that refuses connections is
+taken out of rotation until its next successful check. Each backend has its
+own circuit breaker ("ollama:<url>"), so one failing server does not make
+the others fail fast; backends whose breaker is open are skipped, and calls
+are only rejected once every backend's breaker is open.
+
+With a single backend (the default, OLLAMA_BASE_URL) there is nothing to
+choose and no health checks run.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional, Set, AsyncIterator
+from urllib.parse import urlparse
+import asyncio
+import time
+
+import httpx
+
+from ..config import OLLAMA_BASE_URLS, OLLAMA_HEALTH_CHECK_INTERVAL, OLLAMA_HEALTH_CHECK_TIMEOUT, OLLAMA_MODEL_LOAD_PENALTY
+from .circuit_breaker import CircuitOpenError, get_circuit_breaker
+from .metrics import metrics
+
+# Weight of the latest generation in a backend's running token rate
+TOKEN_RATE_SMOOTHING = 0.2
+
+# Errors meaning the backend itself is unreachable, not that the request was bad
+CONNECTION_ERRORS = (ConnectionError, httpx.TransportError)
+
+
+def model_key(model: str) -> str:
+    """Normalize a model name the way Ollama reports it ("llama3" -> "llama3:latest")."""
+    return model if ":" in model else f"{model}:latest"
+
+
+def with_base_url(llm: Any, base_url: str) -> Any:
+    """
+    Create a copy of a LangChain Ollama model that talks to another backend.
+
+    model_copy() would keep the original's HTTP clients, so the model is
+    rebuilt instead; callers should cache the result.
+
+    Args:
+        llm: OllamaLLM (or another LangChain Ollama model)
+        base_url: URL of the backend
+
+    Returns:
+        The model bound to the backend
+    """
+    if llm.base_url == base_url:
+        return llm
+    return type(llm)(**dict(llm.model_dump(), base_url=base_url))
+
+
+class OllamaBackend:
+    """
+    Load and health of one Ollama server.
+    """
+
+    def __init__(self, url: str):
+        """
+        Initialize the backend.
+
+        Args:
+            url: Base URL of the Ollama server
+        """
+        self.url = url
+        parsed = urlparse(url)
+        self.label = f"{parsed.hostname}_{parsed.port or 11434}".replace(".", "_")
+        self.breaker = get_circuit_breaker(f"ollama:{url}")
+        self.in_flight = 0
+        self.healthy = True
+        self.loaded_models: Set[str] = set()
+        self.tokens_per_second: Optional[float] = None
+        self.last_check: Optional[float] = None
+
+    def load(self, model: str, model_load_penalty: float, default_tokens_per_second: float) -> float:
+        """
+        Get the load used to compare backends for a model.
+
+        Args:
+            model: Model to generate with
+            model_load_penalty: Requests added when the model is not loaded
+            default_tokens_per_second: Token rate assumed until one is observed
+
+        Returns:
+            Requests ahead of and including a new one, plus the penalty if the
+            model has to be loaded, over the token rate
+        """
+        requests = self.in_flight + 1 + (0.0 if model_key(model) in self.loaded_models else model_load_penalty)
+        return requests / (self.tokens_per_second or default_tokens_per_second)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the backend's state."""
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "circuit_breaker": self.breaker.state,
+            "in_flight": self.in_flight,
+            "loaded_models": sorted(self.loaded_models),
+            "tokens_per_second": self.tokens_per_second,
+            "last_check": self.last_check
+        }
+
+
+class OllamaPool:
+    """
+    Balances generations across Ollama backends.
+    """
+
+    def __init__(self, urls: List[str] = OLLAMA_BASE_URLS, health_check_interval: float = OLLAMA_HEALTH_CHECK_INTERVAL, health_check_timeout: float = OLLAMA_HEALTH_CHECK_TIMEOUT, model_load_penalty: float = OLLAMA_MODEL_LOAD_PENALTY):
+        """
+        Initialize the pool.
+
+        Args:
+            urls: Base URLs of the Ollama servers
+            health_check_interval: Seconds between active health checks
+            health_check_timeout: Seconds before a health check counts as failed
+            model_load_penalty: In-flight requests a backend without the model loaded counts as having in addition
+        """
+        if not urls:
+            raise ValueError("At least one Ollama backend is required")
+        self.backends = [OllamaBackend(url) for url in urls]
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.model_load_penalty = model_load_penalty
+        self._health_task: Optional[asyncio.Task] = None
+
+    def choose(self, model: str) -> OllamaBackend:
+        """
+        Choose the backend for a generation.
+
+        Args:
+            model: Model to generate with
+
+        Returns:
+            The least-loaded healthy backend whose breaker admits calls, or the
+            least-loaded one whose breaker admits calls if none is healthy
+
+        Raises:
+            CircuitOpenError: If every backend's breaker is open
+        """
+        delays = [backend.breaker.admission_delay() for backend in self.backends]
+        available = [backend for backend, delay in zip(self.backends, delays) if delay == 0]
+        if not available:
+            raise CircuitOpenError("ollama", min(delays))
+
+        # If every backend looks down, still try one rather than failing outright
+        candidates = [backend for backend in available if backend.healthy] or available
+
+        # Backends that have not generated yet are assumed as fast as the average
+        rates = [backend.tokens_per_second for backend in candidates if backend.tokens_per_second]
+        default_rate = sum(rates) / len(rates) if rates else 1.0
+        return min(candidates, key=lambda backend: backend.load(model, self.model_load_penalty, default_rate))
+
+    @asynccontextmanager
+    async def lease(self, model: str) -> AsyncIterator[OllamaBackend]:
+        """
+        Choose a backend and count a generation in flight on it until the block exits.
+
+        A backend that cannot be connected to is taken out of rotation until
+        its next successful health check.
+
+        Args:
+            model: Model to generate with
+
+        Yields:
+            The chosen backend, whose breaker calls to it should go through
+
+        Raises:
+            CircuitOpenError: If every backend's breaker is open
+        """
+        backend = self.choose(model)
+        backend.in_flight += 1
+        metrics.increment(f"ollama.requests.{backend.label}")
+        metrics.set_gauge(f"ollama.in_flight.{backend.label}", backend.in_flight)
+        try:
+            yield backend
+        except CONNECTION_ERRORS:
+            metrics.increment(f"ollama.failures.{backend.label}")
+            self._set_health(backend, False)
+            raise
+        finally:
+            backend.in_flight -= 1
+            metrics.set_gauge(f"ollama.in_flight.{backend.label}", backend.in_flight)
+
+    def record_generation(self, backend: OllamaBackend, model: str, generation_info: Dict[str, Any]) -> None:
+        """
+        Update a backend's token rate and loaded models after a generation.
+
+        Args:
+            backend: Backend that generated
+            model: Model it generated with
+            generation_info: Final response fields returned by Ollama
+        """
+        backend.loaded_models.add(model_key(model))
+        eval_count = generation_info.get("eval_count") or 0
+        eval_duration = generation_info.get("eval_duration") or 0
+        if eval_count and eval_duration:
+            rate = eval_count / (eval_duration / 1e9)
+            previous = backend.tokens_per_second
+            backend.tokens_per_second = rate if previous is None else (1 - TOKEN_RATE_SMOOTHING) * previous + TOKEN_RATE_SMOOTHING * rate
+            metrics.set_gauge(f"ollama.tokens_per_second.{backend.label}", backend.tokens_per_second)
+
+    async def check_health(self) -> None:
+        """Poll every backend's /api/ps for its health and loaded models."""
+        async with httpx.AsyncClient(timeout=self.health_check_timeout) as client:
+            await asyncio.gather(*(self._check_backend(client, backend) for backend in self.backends))
+
+    async def _check_backend(self, client: httpx.AsyncClient, backend: OllamaBackend) -> None:
+        """Check one backend."""
+        try:
+            response = await client.get(f"{backend.url.rstrip('/')}/api/ps")
+            response.raise_for_status()
+            backend.loaded_models = {model_key(model["name"]) for model in response.json().get("models", [])}
+            self._set_health(backend, True)
+        except (httpx.HTTPError, ValueError) as e:
+            if backend.healthy:
+                print(f"Ollama backend {backend.url} failed its health check: {e}")
+            self._set_health(backend, False)
+        backend.last_check = time.time()
+
+    def _set_health(self, backend: OllamaBackend, healthy: bool) -> None:
+        """Mark a backend healthy or unhealthy."""
+        backend.healthy = healthy
+        metrics.set_gauge(f"ollama.healthy.{backend.label}", 1 if healthy else 0)
+
+    async def _health_check_loop(self) -> None:
+        """Run health checks until cancelled."""
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_check_interval)
+
+    async def start(self) -> None:
+        """Start the periodic health checks, if there are backends to choose between."""
+        if len(self.backends) > 1 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_check_loop())
+
+    async def stop(self) -> None:
+        """Stop the periodic health checks."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Get the state of each backend."""
+        return [backend.to_dict() for backend in self.backends]
+
+
+# Pool shared by all agents in the process
+ollama_pool = OllamaPool()
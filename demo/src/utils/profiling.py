@@ -0,0 +1,256 @@
+"""
+Opt-in profiling of individual chat requests.
+
+A profiled request runs its route_query call under a profiler and saves the
+profile, tagged with the conversation ID and the timing of each pipeline
+stage, to a bounded on-disk spool that the admin endpoints list and serve.
+
+Profiling modes:
+    deterministic  cProfile; the .prof file opens with pstats or snakeviz
+    sampling       pyinstrument in async mode (if installed); saved as HTML
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Iterator, Tuple
+import asyncio
+import glob
+import importlib.util
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from ..config import PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_DIR, PROFILE_SPOOL_MAX_FILES, PROFILE_SPOOL_MAX_BYTES
+from .metrics import metrics
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Stage timings of the request being profiled in the current task, if any
+_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a stage of the request pipeline.
+
+    The duration is observed as request.stage_ms.<name> and, when the request
+    is being profiled, added to the profile's stage timings.
+
+    Args:
+        name: Stage name (e.g. "retrieval")
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        metrics.observe(f"request.stage_ms.{name}", elapsed_ms)
+        timings = _stage_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed_ms
+
+
+class ProfileSpool:
+    """
+    Bounded directory of saved profiles with a JSON metadata file per profile.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_SPOOL_MAX_FILES, max_bytes: int = PROFILE_SPOOL_MAX_BYTES):
+        """
+        Initialize the spool.
+
+        Args:
+            directory: Directory holding the profiles
+            max_files: Maximum number of profiles kept
+            max_bytes: Maximum total size of the profile files
+        """
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    def save(self, profile_id: str, extension: str, write: Callable[[str], None], metadata: Dict[str, Any]) -> None:
+        """
+        Save a profile and evict the oldest ones beyond the bounds.
+
+        Args:
+            profile_id: ID of the profile
+            extension: File extension of the profile format
+            write: Function writing the profile to the given path
+            metadata: Tags stored alongside the profile
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile_id}.{extension}")
+        write(path)
+
+        metadata = dict(metadata, id=profile_id, file=os.path.basename(path), bytes=os.path.getsize(path))
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(metadata, f)
+
+        self._evict()
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Get the metadata of the saved profiles, newest first."""
+        profiles = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                # Evicted or being written by another worker
+                continue
+        return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+    def get_path(self, profile_id: str) -> Optional[str]:
+        """
+        Get the path of a saved profile.
+
+        Args:
+            profile_id: ID of the profile
+
+        Returns:
+            The file path, or None if there is no such profile
+        """
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        for path in glob.glob(os.path.join(self.directory, f"{profile_id}.*")):
+            if not path.endswith(".json"):
+                return path
+        return None
+
+    def _evict(self) -> None:
+        """Remove the oldest profiles until the spool is within its bounds."""
+        profiles = self.list()
+        total_bytes = sum(profile["bytes"] for profile in profiles)
+        while profiles and (len(profiles) > self.max_files or total_bytes > self.max_bytes):
+            oldest = profiles.pop()
+            total_bytes -= oldest["bytes"]
+            for name in (oldest["file"], f"{oldest['id']}.json"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+class RequestProfiler:
+    """
+    Profiles selected route_query calls into a ProfileSpool.
+    """
+
+    def __init__(self, spool: ProfileSpool, mode: str = PROFILE_MODE, sample_rate: float = PROFILE_SAMPLE_RATE):
+        """
+        Initialize the request profiler.
+
+        Args:
+            spool: Spool receiving the profiles
+            mode: "deterministic" or "sampling"
+            sample_rate: Share of requests profiled without being asked
+        """
+        self.spool = spool
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self._active = False
+
+        # Checked without importing, so pyinstrument loads with the first profile
+        if mode == "sampling" and importlib.util.find_spec("pyinstrument") is None:
+            print("pyinstrument is not installed; profiling requests with cProfile instead")
+            self.mode = "deterministic"
+
+    def should_profile(self, requested: bool) -> bool:
+        """
+        Decide whether to profile a request.
+
+        Args:
+            requested: Whether the client asked for a profile
+
+        Returns:
+            True if the request should be profiled
+        """
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    async def profile(self, route_query: Callable[..., Awaitable[Dict[str, Any]]], *args) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Run a route_query call under the profiler and save the profile.
+
+        Only one request is profiled at a time, since a deterministic profiler
+        traces the whole event loop thread; other requests are run unprofiled
+        meanwhile.
+
+        Args:
+            route_query: The coordinator's route_query method
+            *args: Arguments for route_query (query, conversation ID, ...)
+
+        Returns:
+            Tuple of (route_query result, profile ID or None if not profiled)
+        """
+        if self._active:
+            metrics.increment("profiling.skipped")
+            return await route_query(*args), None
+
+        self._active = True
+        profiler = self._start_profiler()
+        timings: Dict[str, float] = {}
+        token = _stage_timings.set(timings)
+        start = time.perf_counter()
+        result: Dict[str, Any] = {}
+        error: Optional[Exception] = None
+        try:
+            result = await route_query(*args)
+        except Exception as e:
+            # Failed requests (e.g. past their deadline) are profiled too
+            error = e
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            _stage_timings.reset(token)
+            if self.mode == "sampling":
+                profiler.stop()
+            else:
+                profiler.disable()
+            self._active = False
+
+        profile_id = uuid.uuid4().hex
+        metadata = {
+            "created_at": time.time(),
+            "conversation_id": result.get("conversation_id", args[1] if len(args) > 1 else None),
+            "agent_type": result.get("agent_type"),
+            "mode": self.mode,
+            "duration_ms": duration_ms,
+            "stage_ms": timings,
+            "degradations": result.get("degradations", []),
+            "error": repr(error) if error else None
+        }
+        extension, write = self._writer(profiler)
+        await asyncio.to_thread(self.spool.save, profile_id, extension, write, metadata)
+        metrics.increment("profiling.saved")
+
+        if error:
+            raise error
+        return result, profile_id
+
+    def _start_profiler(self) -> Any:
+        """Create and start a profiler for the configured mode."""
+        if self.mode == "sampling":
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _writer(self, profiler: Any) -> Tuple[str, Callable[[str], None]]:
+        """Get the file extension and writer function for a stopped profiler."""
+        if self.mode == "sampling":
+            def write_html(path: str) -> None:
+                """Write the profile as an HTML report."""
+                with open(path, "w") as f:
+                    f.write(profiler.output_html())
+            return "html", write_html
+        return "prof", profiler.dump_stats
+
+
+request_profiler = RequestProfiler(ProfileSpool())
@@ -0,0 +1,312 @@
+"""
+Replay captured chat traffic against builds of the API and compare their performance.
+
+Each build (a demo directory, e.g. a git worktree of another revision) is
+started with main.py against local fake Ollama and Wikipedia servers, so
+runs do not depend on models or the network and differences come from the
+builds themselves. The captured requests are sent with their original
+timing, optionally sped up; the requests of a conversation are still sent
+one after the other, each once the previous one has been answered, as a
+user would. The report compares latency and throughput with the first build.
+
+Usage (from the demo directory):
+    # Capture production traffic (see src/utils/traffic_capture.py)
+    TRAFFIC_CAPTURE=true python main.py
+
+    # Compare the previous revision with the working tree at 4x speed
+    git worktree add /tmp/baseline HEAD~1
+    python -m src.utils.replay src/data/capture/chat.jsonl \\
+        --build baseline=/tmp/baseline/demo --build candidate=. --speed 4
+
+    # Add 0.5 s to every fake backend call to approximate model latency
+    python -m src.utils.replay chat.jsonl --build candidate=. --fake-delay 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Any, Optional, Tuple
+
+import httpx
+
+from .benchmark_workers import wait_until_ready
+from .fake_backends import FakeOllamaHandler, FakeWikipediaHandler, start_fake_server
+from .metrics import Summary
+
+# Latency percentiles reported for each build
+PERCENTILES = [50, 90, 99]
+
+
+def load_capture(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Load a traffic capture log.
+
+    Args:
+        path: Path of the JSONL log
+        limit: Optional maximum number of requests, from the start of the log
+
+    Returns:
+        Captured requests in time order
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit is not None else records
+
+
+async def replay(base_url: str, records: List[Dict[str, Any]], speed: float, timeout: float) -> Dict[str, Any]:
+    """
+    Send captured requests with their original timing and measure the responses.
+
+    Args:
+        base_url: Base URL of the API
+        records: Captured requests in time order
+        speed: Factor the original timing is sped up by
+        timeout: Seconds before a request counts as failed
+
+    Returns:
+        Dictionary of measurements
+    """
+    latencies = Summary(window=max(len(records), 1))
+    statuses: Dict[str, int] = {}
+    # Captured conversations are replayed as new ones, so runs do not share state
+    conversation_ids: Dict[str, str] = {}
+    previous: Dict[str, asyncio.Task] = {}
+    lag = Summary(window=max(len(records), 1))
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=None, max_keepalive_connections=100)) as client:
+        start = time.perf_counter()
+        first_ts = records[0]["ts"] if records else 0.0
+
+        async def one_request(record: Dict[str, Any], after: Optional[asyncio.Task]) -> None:
+            """Send one recorded request at its time, after the conversation's previous turn."""
+            due = start + (record["ts"] - first_ts) / speed
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            if after is not None:
+                await asyncio.gather(after, return_exceptions=True)
+            lag.observe(max(0.0, time.perf_counter() - due) * 1000)
+
+            body = {"message": record["message"]}
+            if record.get("conversation_id") is not None:
+                body["conversation_id"] = conversation_ids.setdefault(record["conversation_id"], f"replay-{uuid.uuid4()}")
+            headers = {"X-Request-Timeout": record["timeout"]} if record.get("timeout") else {}
+
+            sent = time.perf_counter()
+            try:
+                response = await client.post(f"{base_url}/api/chat", json=body, headers=headers)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.observe((time.perf_counter() - sent) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        tasks = []
+        for record in records:
+            conversation_id = record.get("conversation_id")
+            task = asyncio.create_task(one_request(record, previous.get(conversation_id) if conversation_id else None))
+            if conversation_id:
+                previous[conversation_id] = task
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    result = {
+        "requests": len(records),
+        "errors": sum(count for status, count in statuses.items() if status != "200"),
+        "statuses": statuses,
+        "duration_s": elapsed,
+        "throughput": len(records) / elapsed if elapsed else 0.0,
+        "mean_ms": latencies.total / latencies.count if latencies.count else None,
+        "max_ms": latencies.max,
+        # How far behind the captured schedule requests were sent (the client or
+        # earlier turns of the same conversation holding them up)
+        "p99_send_lag_ms": lag.percentile(99)
+    }
+    for q in PERCENTILES:
+        result[f"p{q}_ms"] = latencies.percentile(q)
+    return result
+
+
+def captured_baseline(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summarize the latency of the captured requests as originally served.
+
+    Args:
+        records: Captured requests
+
+    Returns:
+        Dictionary of measurements (production latency, for reference)
+    """
+    latencies = Summary(window=max(len(records), 1))
+    for record in records:
+        if record.get("latency_ms") is not None:
+            latencies.observe(record["latency_ms"])
+    duration = records[-1]["ts"] - records[0]["ts"] if len(records) > 1 else 0.0
+    result = {
+        "requests": len(records),
+        "errors": sum(1 for record in records if record.get("status") != 200),
+        "duration_s": duration,
+        "throughput": len(records) / duration if duration else None,
+        "mean_ms": latencies.total / latencies.count if latencies.count else None,
+        "max_ms": latencies.max
+    }
+    for q in PERCENTILES:
+        result[f"p{q}_ms"] = latencies.percentile(q)
+    return result
+
+
+def run_build(name: str, directory: str, records: List[Dict[str, Any]], fake_urls: Tuple[str, str], args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Start a build against the fake backends and replay the traffic against it.
+
+    Args:
+        name: Name of the build in the report
+        directory: Demo directory of the build (containing main.py)
+        records: Captured requests in time order
+        fake_urls: URLs of the fake Ollama API and the fake Wikipedia API
+        args: Parsed command line arguments
+
+    Returns:
+        Dictionary of measurements
+    """
+    ollama_url, wikipedia_url = fake_urls
+    env = dict(
+        os.environ,
+        API_HOST="127.0.0.1",
+        API_PORT=str(args.port),
+        OLLAMA_BASE_URL=ollama_url,
+        OLLAMA_BASE_URLS=ollama_url,
+        WIKIPEDIA_API_URL=wikipedia_url,
+        WIKIPEDIA_MODE="online",
+        TRAFFIC_CAPTURE="false"
+    )
+    log = open(os.path.join(os.path.abspath(args.log_dir), f"replay-{name}.log"), "w") if args.log_dir else subprocess.DEVNULL
+    server = subprocess.Popen([sys.executable, "main.py"], cwd=directory, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        start = time.perf_counter()
+        asyncio.run(wait_until_ready(base_url, args.startup_timeout))
+        startup_seconds = time.perf_counter() - start
+
+        # Warm up the build's lazily loaded parts outside the measurement
+        if args.warmup:
+            warmup = [dict(record, conversation_id=None, ts=0.0) for record in records[:args.warmup]]
+            asyncio.run(replay(base_url, warmup, 1.0, args.request_timeout))
+
+        result = asyncio.run(replay(base_url, records, args.speed, args.request_timeout))
+        result["startup_s"] = startup_seconds
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+
+def compare(baseline: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """
+    Get the relative change of each measurement from the baseline.
+
+    Args:
+        baseline: Measurements of the baseline build
+        result: Measurements of the compared build
+
+    Returns:
+        Change in percent per measurement (positive means higher)
+    """
+    keys = ["throughput", "mean_ms"] + [f"p{q}_ms" for q in PERCENTILES] + ["max_ms"]
+    return {
+        key: (result[key] - baseline[key]) / baseline[key] * 100 if result.get(key) is not None and baseline.get(key) else None
+        for key in keys
+    }
+
+
+def print_report(results: Dict[str, Dict[str, Any]], comparisons: Dict[str, Dict[str, Optional[float]]]) -> None:
+    """Print the measurements of each build and their change from the first one."""
+    columns = ["throughput", "mean_ms"] + [f"p{q}_ms" for q in PERCENTILES] + ["max_ms"]
+    baseline_name = next(iter(results))
+    print(f"{'build':>24} {'requests':>9} {'errors':>7} {'req/s':>9} {'mean ms':>9} " + " ".join(f"{f'p{q} ms':>9}" for q in PERCENTILES) + f" {'max ms':>9}")
+    for name, result in results.items():
+        values = " ".join(f"{result[column]:>9.2f}" if result.get(column) is not None else f"{'-':>9}" for column in columns)
+        print(f"{name:>24} {result['requests']:>9} {result['errors']:>7} {values}")
+
+    for name, changes in comparisons.items():
+        values = " ".join(f"{changes[column]:>+8.1f}%" if changes[column] is not None else f"{'-':>9}" for column in columns)
+        print(f"{name + ' vs ' + baseline_name:>24} {'':>9} {'':>7} {values}")
+
+
+def main():
+    """Parse arguments, replay the capture against each build and print a comparison."""
+    parser = argparse.ArgumentParser(description="Replay captured chat traffic against builds and compare their performance")
+    parser.add_argument("capture", help="Traffic capture log (JSONL)")
+    parser.add_argument("--build", action="append", required=True, metavar="NAME=DIR", help="Build to replay against, as name=demo directory (repeatable; the first is the baseline)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay N times faster than captured")
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument("--warmup", type=int, default=5, help="Requests sent before measuring, to warm up each build")
+    parser.add_argument("--fake-delay", type=float, default=0.0, help="Seconds every fake backend call takes (0 answers immediately)")
+    parser.add_argument("--port", type=int, default=8100, help="Port for the replayed builds")
+    parser.add_argument("--ollama-port", type=int, default=11535, help="Port for the fake Ollama API")
+    parser.add_argument("--wikipedia-port", type=int, default=8189, help="Port for the fake Wikipedia API")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for a build to start")
+    parser.add_argument("--request-timeout", type=float, default=300, help="Seconds before a request counts as failed")
+    parser.add_argument("--log-dir", help="Directory for the builds' server logs (discarded if not set)")
+    parser.add_argument("--report", help="Write the measurements and comparison to this JSON file")
+    args = parser.parse_args()
+
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    builds = []
+    for build in args.build:
+        name, separator, directory = build.partition("=")
+        if not separator or not os.path.exists(os.path.join(directory, "main.py")):
+            parser.error(f"--build {build!r} must be name=directory containing main.py")
+        builds.append((name, os.path.abspath(directory)))
+
+    records = load_capture(args.capture, args.limit)
+    if not records:
+        parser.error(f"{args.capture} has no requests")
+
+    # Both fakes answer after --fake-delay in "slow" mode
+    mode = "slow" if args.fake_delay > 0 else "ok"
+    servers = [
+        start_fake_server(FakeOllamaHandler, args.ollama_port, mode, args.fake_delay),
+        start_fake_server(FakeWikipediaHandler, args.wikipedia_port, mode, args.fake_delay)
+    ]
+    fake_urls = (f"http://127.0.0.1:{args.ollama_port}", f"http://127.0.0.1:{args.wikipedia_port}/w/api.php")
+
+    print(f"Replaying {len(records)} requests at {args.speed}x against {len(builds)} build(s)")
+    results = {"captured": captured_baseline(records)}
+    try:
+        for name, directory in builds:
+            print(f"Running {name} ({directory})")
+            results[name] = run_build(name, directory, records, fake_urls, args)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    # The first build is the baseline; the captured latency is only for reference
+    baseline_name = builds[0][0]
+    comparisons = {name: compare(results[baseline_name], results[name]) for name, _ in builds[1:]}
+    print_report({name: results[name] for name, _ in builds}, comparisons)
+    captured = results["captured"]
+    if captured["p50_ms"] is not None:
+        print(f"Captured (production) latency: p50 {captured['p50_ms']:.1f} ms, p99 {captured['p99_ms']:.1f} ms over {captured['requests']} requests")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"speed": args.speed, "fake_delay": args.fake_delay, "builds": results, "comparison": comparisons}, f, indent=2)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Startup tasks coordinated across API worker processes.
+
+When the server runs with several workers, main.py sets CHATBOT_LAUNCH_ID for
+the launch. Each one-time task then runs in the first worker that takes its
+file lock, and the other workers skip it instead of repeating the work.
+"""
+
+from typing import Callable
+import glob
+import os
+
+from filelock import FileLock
+
+from ..config import AGENTS, MODEL_CASCADE, OLLAMA_BASE_URLS, VECTOR_DB_PATH, STARTUP_DIR
+from .startup_profile import startup_profiler
+
+LAUNCH_ID_ENV = "CHATBOT_LAUNCH_ID"
+
+def reset_startup_markers() -> None:
+    """Remove the completion markers left by previous launches."""
+    os.makedirs(STARTUP_DIR, exist_ok=True)
+    for marker in glob.glob(os.path.join(STARTUP_DIR, "*.done")):
+        os.remove(marker)
+
+def run_once_per_launch(task_name: str, task: Callable[[], None]) -> bool:
+    """
+    Run a startup task once per server launch, whatever the number of workers.
+
+    Args:
+        task_name: Name identifying the task
+        task: The task to run
+
+    Returns:
+        True if this process ran the task
+    """
+    launch_id = os.environ.get(LAUNCH_ID_ENV)
+    if launch_id is None:
+        # Single process: nothing to coordinate with
+        with startup_profiler.component(f"startup.{task_name}"):
+            task()
+        return True
+
+    os.makedirs(STARTUP_DIR, exist_ok=True)
+    marker = os.path.join(STARTUP_DIR, f"{launch_id}.{task_name}.done")
+
+    with FileLock(os.path.join(STARTUP_DIR, f"{task_name}.lock")):
+        if os.path.exists(marker):
+            return False
+        with startup_profiler.component(f"startup.{task_name}"):
+            task()
+        open(marker, "w").close()
+
+    print(f"Startup task {task_name} completed by worker {os.getpid()}")
+    return True
+
+def warm_models() -> None:
+    """Load each configured model into every Ollama backend so the first request does not pay for it."""
+    from ollama import Client
+    
+    models = {agent["model"] for agent in AGENTS.values()}
+    if MODEL_CASCADE:
+        models.update(agent["small_model"] for agent in AGENTS.values() if agent.get("small_model"))
+    for base_url in OLLAMA_BASE_URLS:
+        client = Client(host=base_url)
+        for model in sorted(models):
+            try:
+                # An empty prompt loads the model without generating anything
+                client.generate(model=model, prompt="", keep_alive="30m")
+            except Exception as e:
+                print(f"Error warming model {model} on {base_url}: {e}")
+
+def warm_index_files() -> None:
+    """Read the vector index files once so every worker maps them from the page cache."""
+    for path in glob.glob(os.path.join(VECTOR_DB_PATH, "faiss", "*")):
+        # A collection's snapshot is a directory (linking to its current version)
+        for file_path in glob.glob(os.path.join(path, "*")) if os.path.isdir(path) else [path]:
+            with open(file_path, "rb") as f:
+                while f.read(1 << 20):
+                    pass
+
+def run_startup_tasks() -> None:
+    """Run the one-time startup tasks."""
+    run_once_per_launch("warm_index_files", warm_index_files)
+    run_once_per_launch("warm_models", warm_models)
@@ -0,0 +1,139 @@
+"""
+Startup-time profile of the API process.
+
+Two breakdowns keep cold-start regressions visible:
+
+- import time per package, measured in a fresh interpreter with
+  ``python -X importtime`` so that nothing is already cached;
+- init time per component (conversation manager, knowledge sources,
+  each agent, startup tasks), recorded in-process as the components are
+  built and published as ``startup.init_ms.*`` gauges.
+
+Usage (from the demo directory):
+    python -m src.utils.startup_profile --top 20
+"""
+
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterator
+import argparse
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from .metrics import metrics
+
+DEMO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# What the API process imports before it builds the coordinator
+API_IMPORTS = ["uvicorn", "fastapi", "src.agents.coordinator", "src.utils.startup"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+class StartupProfiler:
+    """
+    Records how long each component of the process takes to initialize.
+    """
+
+    def __init__(self):
+        """Initialize the profiler."""
+        self._lock = threading.Lock()
+        self.init_ms: Dict[str, float] = {}
+
+    @contextmanager
+    def component(self, name: str) -> Iterator[None]:
+        """
+        Time the initialization of a component.
+
+        Args:
+            name: Dotted component name (e.g. "coordinator.agent.general")
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.init_ms[name] = self.init_ms.get(name, 0.0) + elapsed_ms
+            metrics.set_gauge(f"startup.init_ms.{name}", self.init_ms[name])
+
+    def report(self) -> Dict[str, float]:
+        """Get the init time of each component in milliseconds, in initialization order."""
+        with self._lock:
+            return dict(self.init_ms)
+
+
+startup_profiler = StartupProfiler()
+
+
+def profile_imports(modules: List[str]) -> List[Dict[str, Any]]:
+    """
+    Measure the import time of modules in a fresh interpreter, per package.
+
+    Third-party packages are grouped by top-level name and this project's
+    modules by subpackage (e.g. "src.knowledge").
+
+    Args:
+        modules: Modules to import
+
+    Returns:
+        List of {"package", "ms", "modules"} dictionaries, slowest first
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {module}" for module in modules)],
+        cwd=DEMO_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}")
+
+    packages: Dict[str, Dict[str, Any]] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        parts = name.split(".")
+        package = ".".join(parts[:2]) if parts[0] == "src" else parts[0]
+        entry = packages.setdefault(package, {"package": package, "ms": 0.0, "modules": 0})
+        entry["ms"] += int(match.group(1)) / 1000  # self time, so packages add up to the total
+        entry["modules"] += 1
+
+    return sorted(packages.values(), key=lambda entry: -entry["ms"])
+
+
+def main():
+    """Parse arguments, profile imports and component init, and print the report."""
+    parser = argparse.ArgumentParser(description="Profile API process startup")
+    parser.add_argument("--module", action="append", help="Module to profile the import of (repeatable; defaults to the API imports)")
+    parser.add_argument("--top", type=int, default=15, help="Packages to list in the import breakdown")
+    args = parser.parse_args()
+
+    modules = args.module or API_IMPORTS
+    imports = profile_imports(modules)
+    total_ms = sum(entry["ms"] for entry in imports)
+
+    print(f"Import time of {', '.join(modules)}: {total_ms:.0f} ms")
+    print(f"  {'package':<32} {'ms':>9} {'share':>7} {'modules':>8}")
+    for entry in imports[:args.top]:
+        print(f"  {entry['package']:<32} {entry['ms']:>9.1f} {entry['ms'] / total_ms:>7.1%} {entry['modules']:>8}")
+
+    # Build the coordinator the way the API does, recording each component. When
+    # run with -m this module is __main__, so read the profiler the components use.
+    start = time.perf_counter()
+    from ..agents import MultiAgentCoordinator
+    from .startup_profile import startup_profiler as process_profiler
+    import_ms = (time.perf_counter() - start) * 1000
+    coordinator = MultiAgentCoordinator()
+    coordinator.close()
+
+    init = process_profiler.report()
+    print(f"\nInit time of the coordinator: {sum(init.values()):.0f} ms (after {import_ms:.0f} ms of imports in this process)")
+    for name, ms in init.items():
+        print(f"  {name:<40} {ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Background summarization of older conversation turns to keep prompts bounded.
+"""
+
+from typing import Dict, List, Optional
+import asyncio
+import time
+
+from langchain_ollama import OllamaLLM
+
+from ..config import (
+    OLLAMA_BASE_URL,
+    HISTORY_SUMMARY_MODEL,
+    HISTORY_SUMMARY_TOKEN_THRESHOLD,
+    HISTORY_RECENT_TURNS
+)
+from .conversation import ConversationManager
+from .metrics import metrics
+from .circuit_breaker import CircuitOpenError
+from .ollama_pool import ollama_pool, with_base_url
+
+SUMMARY_PROMPT = """Summarize the conversation below between a user and an assistant.
+Keep the facts, names, numbers and open questions needed to continue the conversation.
+Write at most a short paragraph.
+
+{previous_summary}Conversation:
+{transcript}
+
+Summary:"""
+
+class ConversationSummarizer:
+    """
+    Compacts long conversations into a rolling summary off the request path.
+    """
+
+    def __init__(self, conversation_manager: ConversationManager, token_threshold: int = HISTORY_SUMMARY_TOKEN_THRESHOLD, recent_turns: int = HISTORY_RECENT_TURNS):
+        """
+        Initialize the summarizer.
+
+        Args:
+            conversation_manager: The conversation manager whose histories are compacted
+            token_threshold: Estimated history tokens that trigger compaction
+            recent_turns: Number of most recent turns kept verbatim
+        """
+        self.conversation_manager = conversation_manager
+        self.token_threshold = token_threshold
+        self.recent_turns = recent_turns
+        self.pending: Dict[str, asyncio.Task] = {}
+
+        self.llm = OllamaLLM(
+            base_url=OLLAMA_BASE_URL,
+            model=HISTORY_SUMMARY_MODEL,
+            temperature=0.2,
+            num_predict=256,
+            num_gpu=0
+        )
+        self.backend_llms: Dict[str, OllamaLLM] = {}
+
+    def maybe_schedule(self, conversation_id: str) -> bool:
+        """
+        Schedule compaction of a conversation if its history is over the threshold.
+
+        Args:
+            conversation_id: ID of the conversation
+
+        Returns:
+            True if a compaction job was started
+        """
+        if conversation_id in self.pending:
+            return False
+
+        if self.conversation_manager.estimate_history_tokens(conversation_id) <= self.token_threshold:
+            return False
+
+        task = asyncio.create_task(self._compact(conversation_id))
+        self.pending[conversation_id] = task
+        task.add_done_callback(lambda _: self.pending.pop(conversation_id, None))
+        return True
+
+    async def _compact(self, conversation_id: str) -> None:
+        """
+        Summarize all but the most recent turns into the conversation's summary.
+
+        Args:
+            conversation_id: ID of the conversation
+        """
+        history = list(self.conversation_manager.get_history(conversation_id))
+        older_messages = history[:-self.recent_turns * 2]
+        if not older_messages:
+            return
+
+        tokens_before = self.conversation_manager.estimate_history_tokens(conversation_id)
+        start = time.perf_counter()
+
+        try:
+            async with ollama_pool.lease(self.llm.model) as backend:
+                if backend.url not in self.backend_llms:
+                    self.backend_llms[backend.url] = with_base_url(self.llm, backend.url)
+                summary = await backend.breaker.call(self.backend_llms[backend.url].ainvoke, self._build_prompt(
+                    self.conversation_manager.get_summary(conversation_id),
+                    older_messages
+                ))
+        except CircuitOpenError:
+            # Ollama is down; compaction is retried after the next turn
+            return
+        except Exception as e:
+            print(f"Error summarizing conversation {conversation_id}: {e}")
+            metrics.increment("summarizer.errors")
+            return
+
+        self.conversation_manager.apply_summary(conversation_id, summary.strip(), older_messages)
+
+        metrics.increment("summarizer.compactions")
+        metrics.observe("summarizer.latency_ms", (time.perf_counter() - start) * 1000)
+        metrics.observe("summarizer.tokens_removed", tokens_before - self.conversation_manager.estimate_history_tokens(conversation_id))
+
+    def _build_prompt(self, previous_summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """
+        Build the summarization prompt.
+
+        Args:
+            previous_summary: The existing rolling summary, if any
+            messages: Messages to fold into the summary
+
+        Returns:
+            Prompt text
+        """
+        transcript = "\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in messages)
+        previous = f"Summary of the earlier conversation:\n{previous_summary}\n\n" if previous_summary else ""
+        return SUMMARY_PROMPT.format(previous_summary=previous, transcript=transcript)
+
+    async def wait_for_pending(self) -> None:
+        """Wait for all running compaction jobs to finish."""
+        if self.pending:
+            await asyncio.gather(*self.pending.values(), return_exceptions=True)
@@ -0,0 +1,117 @@
+"""
+OpenTelemetry tracing of the agent pipeline.
+
+Modules create spans with the shared ``tracer``; until setup_tracing() installs
+a tracer provider it is a no-op, so tracing costs nothing when disabled.
+
+Exporters (TRACING_EXPORTER):
+    none  tracing disabled
+    file  OTLP/JSON lines written to TRACE_FILE_PATH, one export batch per line
+          (the format of the OpenTelemetry Collector file exporter, readable by
+          its otlpjsonfile receiver)
+    otlp  OTLP/gRPC to OTEL_EXPORTER_OTLP_ENDPOINT (default localhost:4317)
+"""
+
+from typing import Sequence
+import os
+import threading
+
+from opentelemetry import trace
+
+from ..config import TRACING_EXPORTER, TRACE_SAMPLE_RATIO, TRACE_FILE_PATH
+
+tracer = trace.get_tracer("adaptive_chatbot")
+
+_provider = None
+
+
+def create_file_exporter(path: str):
+    """
+    Create a span exporter appending OTLP/JSON lines to a file.
+
+    Args:
+        path: Path of the JSON lines file
+
+    Returns:
+        The span exporter
+    """
+    from google.protobuf.json_format import MessageToJson
+    from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+    from opentelemetry.sdk.trace import ReadableSpan
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class OTLPJsonFileSpanExporter(SpanExporter):
+        """Writes each batch of spans as one OTLP/JSON ExportTraceServiceRequest line."""
+
+        def __init__(self):
+            """Open the span file for appending."""
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._lock = threading.Lock()
+            self._file = open(path, "a")
+
+        def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+            """Append a batch of spans to the file as one line."""
+            line = MessageToJson(encode_spans(spans), indent=None)
+            with self._lock:
+                self._file.write(line + "\n")
+                self._file.flush()
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            """Close the span file."""
+            with self._lock:
+                self._file.close()
+
+    return OTLPJsonFileSpanExporter()
+
+
+def setup_tracing(app=None, exporter: str = TRACING_EXPORTER, sample_ratio: float = TRACE_SAMPLE_RATIO) -> bool:
+    """
+    Install the tracer provider and instrument the FastAPI app.
+
+    Args:
+        app: Optional FastAPI app whose request spans become the pipeline's parents
+        exporter: "none", "file" or "otlp"
+        sample_ratio: Share of new traces that are sampled
+
+    Returns:
+        True if tracing was enabled
+    """
+    global _provider
+    if exporter == "none":
+        return False
+
+    # The SDK is only imported when tracing is enabled
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if _provider is None:
+        if exporter == "file":
+            span_exporter = create_file_exporter(TRACE_FILE_PATH)
+        elif exporter == "otlp":
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            span_exporter = OTLPSpanExporter()
+        else:
+            raise ValueError(f"Unsupported tracing exporter: {exporter}")
+
+        # Follow the caller's sampling decision, otherwise sample a share of new traces
+        _provider = TracerProvider(
+            resource=Resource.create({"service.name": "adaptive-chatbot", "process.pid": os.getpid()}),
+            sampler=ParentBased(TraceIdRatioBased(sample_ratio))
+        )
+        _provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        trace.set_tracer_provider(_provider)
+
+    if app is not None:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        FastAPIInstrumentor.instrument_app(app, tracer_provider=_provider)
+
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop the span exporter."""
+    if _provider is not None:
+        _provider.shutdown()
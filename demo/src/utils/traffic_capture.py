@@ -0,0 +1,230 @@
+"""
+Capture of chat traffic for replaying against other builds.
+
+With TRAFFIC_CAPTURE on, the middleware appends each /api/chat request to a
+JSONL log, one compact line per request:
+
+    {"ts":1760000000.123,"conversation_id":"9f2c...","message":"...","status":200,"latency_ms":812.4}
+
+Messages are sanitized (email addresses and long numbers such as phone or
+student numbers are replaced by placeholders) and conversation IDs are
+replaced by a hash, which keeps the turns of a conversation together without
+recording the ID itself. New conversations get their ID from the response,
+so their first message is grouped with the follow-ups. Conversations are
+sampled as a whole at TRAFFIC_CAPTURE_SAMPLE_RATE.
+
+Each line is appended with a single write, so several worker processes can
+share one log. See src/utils/replay.py for playing a log back.
+"""
+
+from typing import Dict, Any, Optional
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from ..config import TRAFFIC_CAPTURE_PATH, TRAFFIC_CAPTURE_SAMPLE_RATE, TRAFFIC_CAPTURE_MAX_BYTES
+from .metrics import metrics
+
+CHAT_PATH = "/api/chat"
+
+# Request bodies larger than this are passed through but not captured
+MAX_CAPTURED_BODY_BYTES = 64 * 1024
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# Phone and card numbers (ten or more digits, possibly separated) and student
+# or other ID numbers (seven or more digits in a row); years are kept
+NUMBER_PATTERN = re.compile(r"\+?\d(?:[\s().-]*\d){9,}|\b\d{7,}\b")
+
+
+def sanitize(message: str) -> str:
+    """
+    Remove personal data from a chat message.
+
+    Args:
+        message: The message as sent by the user
+
+    Returns:
+        The message with email addresses and long numbers replaced by placeholders
+    """
+    message = EMAIL_PATTERN.sub("<email>", message)
+    return NUMBER_PATTERN.sub("<number>", message)
+
+
+def pseudonymize(conversation_id: str) -> str:
+    """
+    Replace a conversation ID with a stable hash of it.
+
+    Args:
+        conversation_id: The conversation ID
+
+    Returns:
+        The same 16 hex digits for the same ID, in every worker process
+    """
+    return hashlib.sha256(conversation_id.encode("utf-8")).hexdigest()[:16]
+
+
+class TrafficCapture:
+    """
+    Appends sanitized chat requests to a JSONL log.
+    """
+
+    def __init__(self, path: str = TRAFFIC_CAPTURE_PATH, sample_rate: float = TRAFFIC_CAPTURE_SAMPLE_RATE, max_bytes: int = TRAFFIC_CAPTURE_MAX_BYTES):
+        """
+        Initialize the capture; the log is opened with the first request.
+
+        Args:
+            path: Path of the JSONL log
+            sample_rate: Share of conversations captured
+            max_bytes: Size of the log at which capture stops
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.full = False
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _sampled(self, conversation_id: str) -> bool:
+        """Decide, the same way for every request of a conversation, whether it is captured."""
+        if self.sample_rate >= 1:
+            return True
+        return int(conversation_id[:8], 16) / 0xFFFFFFFF < self.sample_rate
+
+    def record(self, request_body: bytes, response_body: bytes, status: Optional[int], timestamp: float, latency_ms: float, timeout: Optional[str] = None) -> bool:
+        """
+        Append a chat request to the log.
+
+        Args:
+            request_body: JSON body of the chat request
+            response_body: JSON body of the response (for the ID of new conversations)
+            status: HTTP status of the response
+            timestamp: Time the request arrived (seconds since the epoch)
+            latency_ms: Time taken to answer it
+            timeout: X-Request-Timeout header of the request, if any
+
+        Returns:
+            True if the request was recorded
+        """
+        if self.full:
+            return False
+
+        try:
+            request = json.loads(request_body)
+            message = request["message"]
+            conversation_id = request.get("conversation_id")
+            if conversation_id is None and status == 200:
+                conversation_id = json.loads(response_body)["conversation_id"]
+        except (ValueError, KeyError, TypeError):
+            # Not a chat request the API could parse; nothing to replay
+            return False
+        if not isinstance(message, str):
+            return False
+
+        # Requests that failed before a conversation existed are kept as one-offs
+        conversation_id = pseudonymize(str(conversation_id)) if conversation_id is not None else None
+        if conversation_id is not None and not self._sampled(conversation_id):
+            return False
+
+        record: Dict[str, Any] = {
+            "ts": round(timestamp, 3),
+            "conversation_id": conversation_id,
+            "message": sanitize(message),
+            "status": status,
+            "latency_ms": round(latency_ms, 1)
+        }
+        if timeout is not None:
+            record["timeout"] = timeout
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+        with self._lock:
+            if self._fd is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size + len(line) > self.max_bytes:
+                self.full = True
+                print(f"Traffic capture log {self.path} reached {self.max_bytes} bytes; capture stopped")
+                return False
+            # One write per line, so lines from several processes do not interleave
+            os.write(self._fd, line)
+
+        metrics.increment("traffic_capture.recorded")
+        return True
+
+    def close(self) -> None:
+        """Close the log."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class TrafficCaptureMiddleware:
+    """
+    ASGI middleware recording chat requests and their outcome, passing
+    everything through unchanged.
+    """
+
+    def __init__(self, app: Any, capture: Optional[TrafficCapture] = None):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI application
+            capture: Capture to record to (the shared traffic_capture by default)
+        """
+        self.app = app
+        self.capture = capture or traffic_capture
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        """
+        Pass a request to the application, recording it if it is a chat request.
+
+        Args:
+            scope: ASGI connection scope
+            receive: ASGI receive callable
+            send: ASGI send callable
+        """
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != CHAT_PATH or self.capture.full:
+            await self.app(scope, receive, send)
+            return
+
+        timestamp = time.time()
+        start = time.perf_counter()
+        request_body = bytearray()
+        response_body = bytearray()
+        status = None
+
+        async def receive_and_copy() -> Dict[str, Any]:
+            """Receive a message, keeping a copy of the request body."""
+            message = await receive()
+            if message["type"] == "http.request" and len(request_body) <= MAX_CAPTURED_BODY_BYTES:
+                request_body.extend(message.get("body", b""))
+            return message
+
+        async def send_and_copy(message: Dict[str, Any]) -> None:
+            """Send a message, keeping the status and a copy of the response body."""
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_body.extend(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_copy, send_and_copy)
+        finally:
+            if len(request_body) <= MAX_CAPTURED_BODY_BYTES:
+                headers = dict(scope.get("headers") or [])
+                timeout = headers.get(b"x-request-timeout")
+                self.capture.record(
+                    bytes(request_body), bytes(response_body), status, timestamp,
+                    (time.perf_counter() - start) * 1000,
+                    timeout.decode("latin-1") if timeout is not None else None
+                )
+
+
+# Capture shared by the API in the process
+traffic_capture = TrafficCapture()